@@ -1,3 +1,49 @@
-from django.test import TestCase
+import json
+import os
+import subprocess
+import sys
 
-# Create your tests here.
+from django.conf import settings
+from django.test import SimpleTestCase
+
+# Модули, которые не должны попадать в граф импорта веб-процесса
+WEB_FORBIDDEN_MODULES = ('torch', 'transformers', 'apps.processing.tasks')
+# Бюджет суммарного времени импорта веб-стека (python -X importtime), мс
+WEB_IMPORT_BUDGET_MS = int(os.environ.get('WEB_IMPORT_BUDGET_MS', 2000))
+
+
+def parse_importtime(stderr):
+    total_us = 0
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        self_us = line.split(':', 1)[1].split('|')[0].strip()
+        if self_us.isdigit():
+            total_us += int(self_us)
+    return total_us / 1000
+
+
+class WebImportTimeTests(SimpleTestCase):
+    def run_web_imports(self):
+        code = (
+            "import sys, json\n"
+            "import config.wsgi, config.urls\n"
+            f"print(json.dumps([m for m in {WEB_FORBIDDEN_MODULES!r} if m in sys.modules]))\n"
+        )
+        env = dict(os.environ, OPENROUTER_API_KEY='')
+        return subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, timeout=120,
+        )
+
+    def test_web_stack_import_graph_and_budget(self):
+        proc = self.run_web_imports()
+        self.assertEqual(proc.returncode, 0, proc.stderr[-2000:])
+        # импорт не падает без OPENROUTER_API_KEY и не тянет ML-стек
+        self.assertEqual(json.loads(proc.stdout.strip().splitlines()[-1]), [])
+
+        total_ms = parse_importtime(proc.stderr)
+        self.assertLess(
+            total_ms, WEB_IMPORT_BUDGET_MS,
+            f"Импорт веб-стека занял {total_ms:.0f} мс при бюджете {WEB_IMPORT_BUDGET_MS} мс"
+        )
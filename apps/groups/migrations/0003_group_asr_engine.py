@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 21:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='asr_engine',
+            field=models.CharField(blank=True, choices=[('whisper', 'Whisper (transformers)'), ('nemo_ctc', 'NeMo Conformer-CTC')], max_length=20),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.conf import settings
 
+from apps.processing.models import ASR_ENGINE_CHOICES
+
 class Group(models.Model):
     title = models.CharField(max_length=100)
     owner = models.ForeignKey(
@@ -9,6 +11,8 @@ class Group(models.Model):
     members = models.ManyToManyField(
         settings.AUTH_USER_MODEL, related_name='member_groups', blank=True
     )
+    # движок ASR для записей группы; пусто — ASR_ENGINE из настроек
+    asr_engine = models.CharField(max_length=20, choices=ASR_ENGINE_CHOICES, blank=True)
 
     def __str__(self):
         return self.title
@@ -6,7 +6,7 @@ from apps.users.models import CustomUser
 class GroupCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Group
-        fields = ['id', 'title']
+        fields = ['id', 'title', 'asr_engine']
 
     def create(self, validated_data):
         request = self.context.get('request')
@@ -25,5 +25,5 @@ class GroupDetailSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Group
-        fields = ['id', 'title', 'owner', 'members']
+        fields = ['id', 'title', 'owner', 'members', 'asr_engine']
         read_only_fields = ['owner', 'members']
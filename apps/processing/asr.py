@@ -0,0 +1,220 @@
+import functools
+import gc
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+CHUNK_LENGTH_S = 30
+
+# Режимы точности: имя dtype torch либо int8 (динамическая квантизация линейных слоёв)
+PRECISION_ALIASES = {
+    'fp32': 'float32',
+    'fp16': 'float16',
+    'bf16': 'bfloat16',
+    'int8': 'int8',
+}
+
+
+def resolve_device(device=None):
+    if device in (None, '', 'auto'):
+        import torch
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    return device
+
+
+@functools.lru_cache(maxsize=None)
+def cpu_supports_bf16():
+    # Без AVX512-BF16/AMX bfloat16 на CPU эмулируется и медленнее float32
+    try:
+        with open('/proc/cpuinfo') as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return 'avx512_bf16' in flags or 'amx_bf16' in flags
+
+
+def resolve_dtype(device, dtype=None):
+    # dtype храним строкой, чтобы ключ реестра был хешируемым и сериализуемым
+    if dtype in (None, '', 'auto'):
+        return "float16" if device.startswith("cuda") else "float32"
+    dtype = str(dtype).replace("torch.", "")
+    dtype = PRECISION_ALIASES.get(dtype, dtype)
+    if dtype == "bfloat16" and device == "cpu" and not cpu_supports_bf16():
+        logger.warning("ASR: процессор без поддержки bfloat16, используется float32")
+        return "float32"
+    if dtype == "int8" and device != "cpu":
+        raise ValueError("int8-квантизация Whisper поддерживается только на CPU")
+    return dtype
+
+
+def quantize_int8(model):
+    # Веса линейных слоёв хранятся в int8, активации квантуются на лету:
+    # модель в ~2 раза меньше в памяти и быстрее на CPU при небольшой потере точности
+    import torch
+
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def build_whisper_pipeline(model_id, dtype, device):
+    import torch
+    from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
+
+    # int8 собирается из float32-весов квантизацией после загрузки
+    torch_dtype = torch.float32 if dtype == "int8" else getattr(torch, dtype)
+    whisper_model = AutoModelForSpeechSeq2Seq.from_pretrained(
+        model_id,
+        torch_dtype=torch_dtype,
+        low_cpu_mem_usage=True,
+        use_safetensors=True,
+        attn_implementation="eager",
+    ).to(device)
+    if dtype == "int8":
+        whisper_model = quantize_int8(whisper_model.eval())
+    whisper_processor = AutoProcessor.from_pretrained(model_id)
+    return pipeline(
+        "automatic-speech-recognition",
+        model=whisper_model,
+        tokenizer=whisper_processor.tokenizer,
+        feature_extractor=whisper_processor.feature_extractor,
+        torch_dtype=torch_dtype,
+        device=device,
+        chunk_length_s=CHUNK_LENGTH_S,
+        batch_size=1
+    )
+
+
+def available_cores():
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def available_memory_mb(device):
+    if device.startswith("cuda"):
+        import torch
+        free, _total = torch.cuda.mem_get_info()
+        return free // (1024 * 1024)
+    import psutil
+    return psutil.virtual_memory().available // (1024 * 1024)
+
+
+def auto_batch_size(device, item_mb=None, max_batch=None):
+    # Сколько 30-секундных чанков декодировать за один forward:
+    # на CPU ограничено ядрами, везде — свободной памятью под активации
+    item_mb = item_mb or settings.ASR_BATCH_ITEM_MB
+    max_batch = max_batch or settings.ASR_MAX_BATCH_SIZE
+    by_memory = available_memory_mb(device) // item_mb
+    if device.startswith("cuda"):
+        limit = by_memory
+    else:
+        limit = min(by_memory, max(1, available_cores() // 2))
+    return int(max(1, min(limit, max_batch)))
+
+
+class ASRModelRegistry:
+    """
+    Процессный реестр ASR-моделей: модель загружается один раз на процесс воркера
+    и переиспользуется между задачами. Ключ — (model_id, dtype, device); запрос
+    другого ключа выгружает текущую модель. model_setting — имя настройки с моделью
+    по умолчанию: у каждого движка ASR свой реестр.
+    """
+    EMPTY = 'empty'
+    LOADING = 'loading'
+    READY = 'ready'
+    FAILED = 'failed'
+
+    def __init__(self, loader=build_whisper_pipeline, model_setting='ASR_MODEL_ID'):
+        self._loader = loader
+        self._model_setting = model_setting
+        self._lock = threading.RLock()
+        self._pipe = None
+        self.key = None
+        self.state = self.EMPTY
+        self.error = None
+        self.loaded_at = None
+        self.load_seconds = None
+
+    def make_key(self, model_id=None, dtype=None, device=None):
+        model_id = model_id or getattr(settings, self._model_setting)
+        device = resolve_device(device or settings.ASR_DEVICE)
+        dtype = resolve_dtype(device, dtype or settings.ASR_DTYPE)
+        return (model_id, dtype, device)
+
+    def get(self, model_id=None, dtype=None, device=None):
+        key = self.make_key(model_id, dtype, device)
+        with self._lock:
+            if self._pipe is not None and self.key == key:
+                return self._pipe
+            if self._pipe is not None:
+                logger.info("ASR: выгрузка модели %s ради %s", self.key, key)
+                self.evict()
+
+            self.key = key
+            self.state = self.LOADING
+            self.error = None
+            started = time.monotonic()
+            try:
+                self._pipe = self._loader(*key)
+            except Exception as e:
+                self.state = self.FAILED
+                self.error = str(e)
+                raise
+            self.load_seconds = time.monotonic() - started
+            self.loaded_at = time.time()
+            self.state = self.READY
+            logger.info("ASR: модель %s загружена за %.1f с", key, self.load_seconds)
+            return self._pipe
+
+    def warmup(self, model_id=None, dtype=None, device=None):
+        # Прогон секунды тишины: инициализирует ядра и кеши до первой реальной задачи
+        import numpy as np
+
+        pipe = self.get(model_id, dtype, device)
+        pipe({"raw": np.zeros(SAMPLE_RATE, dtype=np.float32), "sampling_rate": SAMPLE_RATE})
+        return pipe
+
+    def evict(self):
+        with self._lock:
+            device = self.key[2] if self.key else None
+            self._pipe = None
+            self.key = None
+            self.state = self.EMPTY
+            self.loaded_at = None
+            self.load_seconds = None
+            gc.collect()
+            if device and device.startswith("cuda"):
+                import torch
+                torch.cuda.empty_cache()
+
+    def is_ready(self, model_id=None, dtype=None, device=None):
+        if self.state != self.READY:
+            return False
+        if model_id is None and dtype is None and device is None:
+            return True
+        return self.key == self.make_key(model_id, dtype, device)
+
+    def batch_size(self):
+        if settings.ASR_BATCH_SIZE != 'auto':
+            return max(1, int(settings.ASR_BATCH_SIZE))
+        device = self.key[2] if self.key else resolve_device(settings.ASR_DEVICE)
+        return auto_batch_size(device)
+
+    def status(self):
+        return {
+            'state': self.state,
+            'model_id': self.key[0] if self.key else None,
+            'dtype': self.key[1] if self.key else None,
+            'device': self.key[2] if self.key else None,
+            'loaded_at': self.loaded_at,
+            'load_seconds': self.load_seconds,
+            'error': self.error,
+        }
+
+
+registry = ASRModelRegistry()
@@ -0,0 +1,117 @@
+import subprocess
+import tempfile
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+BYTES_PER_SAMPLE = 2  # pcm_s16le
+READ_BLOCK = 1 << 16
+# Из лога ffmpeg в текст ошибки попадает только хвост: при битом файле он пишет строку на кадр
+STDERR_TAIL_BYTES = 4096
+
+
+def ffmpeg_pcm_command(input_path, sample_rate=SAMPLE_RATE, start_s=0):
+    # 16 кГц моно PCM в stdout, без промежуточного WAV на диске; -ss перед -i — быстрый переход по контейнеру
+    seek = ['-ss', f'{start_s:.3f}'] if start_s else []
+    return [
+        'ffmpeg', '-nostdin', '-loglevel', 'error', *seek, '-i', input_path, '-vn',
+        '-f', 's16le', '-acodec', 'pcm_s16le', '-ar', str(sample_rate), '-ac', '1', 'pipe:1'
+    ]
+
+
+def media_duration(input_path):
+    """Длительность файла в секундах по ffprobe или None, если контейнер её не сообщает."""
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', input_path],
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe завершился с кодом {result.returncode}: {result.stderr.strip()}")
+    try:
+        return float(result.stdout.strip())
+    except ValueError:
+        return None
+
+
+def pcm16_to_float32(buf):
+    usable = len(buf) - len(buf) % BYTES_PER_SAMPLE
+    return np.frombuffer(buf[:usable], dtype='<i2').astype(np.float32) / 32768.0
+
+
+def float32_to_pcm16(samples):
+    return np.clip(np.round(np.asarray(samples) * 32768.0), -32768, 32767).astype('<i2').tobytes()
+
+
+def write_pcm_pieces(pieces, path):
+    """
+    Сохраняет фрагменты (offset, samples) подряд в один s16le-файл и возвращает
+    индекс [[offset, first_sample, sample_count], ...] для read_pcm_pieces.
+    """
+    index = []
+    position = 0
+    with open(path, 'wb') as f:
+        for offset, samples in pieces:
+            f.write(float32_to_pcm16(samples))
+            index.append([offset, position, len(samples)])
+            position += len(samples)
+    return index
+
+
+def read_pcm_pieces(path, index):
+    if not index:
+        return
+    data = np.memmap(path, dtype='<i2', mode='r')
+    for offset, start, count in index:
+        yield offset, data[start:start + count].astype(np.float32) / 32768.0
+
+
+def _read_exact(stream, size):
+    parts = []
+    remaining = size
+    while remaining > 0:
+        block = stream.read(min(remaining, READ_BLOCK))
+        if not block:
+            break
+        parts.append(block)
+        remaining -= len(block)
+    return b''.join(parts)
+
+
+def stream_pcm_windows(input_path, window_s, sample_rate=SAMPLE_RATE, start_s=0):
+    """
+    Читает аудиодорожку через пайп ffmpeg и отдаёт окна (offset_seconds, float32 ndarray)
+    длиной не более window_s секунд. В памяти одновременно держится только одно окно.
+    start_s — с какой секунды читать; смещения окон отсчитываются от начала файла.
+    """
+    window_bytes = int(window_s * sample_rate) * BYTES_PER_SAMPLE
+    # stderr — во временный файл, а не в пайп: переполнив буфер пайпа, который никто не читает
+    # до конца stdout, ffmpeg остановился бы на записи лога и перестал отдавать аудио
+    stderr_file = tempfile.TemporaryFile()
+    proc = subprocess.Popen(
+        ffmpeg_pcm_command(input_path, sample_rate, start_s),
+        stdout=subprocess.PIPE, stderr=stderr_file,
+    )
+    completed = False
+    try:
+        offset = 0
+        while True:
+            buf = _read_exact(proc.stdout, window_bytes)
+            if not buf:
+                break
+            samples = pcm16_to_float32(buf)
+            if samples.size:
+                yield start_s + offset / sample_rate, samples
+                offset += samples.size
+        completed = True
+    finally:
+        if not completed:
+            proc.kill()
+        proc.stdout.close()
+        returncode = proc.wait()
+        stderr_file.seek(max(0, stderr_file.seek(0, 2) - STDERR_TAIL_BYTES))
+        stderr = stderr_file.read()
+        stderr_file.close()
+
+    if returncode != 0:
+        message = stderr.decode('utf-8', 'replace').strip()
+        raise RuntimeError(f"ffmpeg завершился с кодом {returncode}: {message}")
@@ -0,0 +1,82 @@
+import multiprocessing
+import re
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+AUDIO_SUFFIXES = {'.wav', '.mp3', '.m4a', '.ogg', '.flac', '.webm', '.mp4', '.mkv'}
+
+
+def normalize_text(text):
+    # WER считается без учёта регистра, пунктуации и ё/е
+    text = text.lower().replace('ё', 'е')
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+
+def load_corpus(corpus_dir):
+    """Пары (аудио, эталонный текст): рядом с каждым аудиофайлом лежит .txt с тем же именем."""
+    corpus = []
+    for path in sorted(Path(corpus_dir).iterdir()):
+        reference = path.with_suffix('.txt')
+        if path.suffix.lower() in AUDIO_SUFFIXES and reference.exists():
+            corpus.append((str(path), reference.read_text(encoding='utf-8')))
+    return corpus
+
+
+def setup_django():
+    import django
+    django.setup()
+
+
+def run_engine(engine_name, dtype, corpus, window_s):
+    """Прогоняет корпус через движок: RTF, пиковый RSS процесса, WER и время загрузки модели."""
+    import jiwer
+    from django.test import override_settings
+
+    from .audio import stream_pcm_windows
+    from .engines import get_engine
+
+    # Движок берёт точность из настроек; в отдельном процессе её можно просто переопределить
+    override_settings(ASR_DTYPE=dtype).enable()
+    engine = get_engine(engine_name)
+    started = time.monotonic()
+    engine.warmup()
+    load_seconds = time.monotonic() - started
+    batch_size = engine.batch_size()
+
+    references = []
+    hypotheses = []
+    audio_seconds = 0.0
+    started = time.monotonic()
+    for path, reference in corpus:
+        text, _timestamps, seconds = engine.transcribe_stream(stream_pcm_windows(path, window_s),
+                                                              batch_size=batch_size)
+        references.append(normalize_text(reference))
+        hypotheses.append(normalize_text(text))
+        audio_seconds += seconds
+    wall_seconds = time.monotonic() - started
+
+    return {
+        'engine': engine_name,
+        'dtype': engine.registry.key[1],
+        'load_seconds': load_seconds,
+        'rtf': wall_seconds / audio_seconds if audio_seconds else 0.0,
+        'audio_seconds': audio_seconds,
+        # ru_maxrss на Linux — в килобайтах
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'wer': jiwer.wer(references, hypotheses),
+    }
+
+
+def run_isolated(engine_name, dtype, corpus, window_s):
+    # Каждый прогон — в свежем процессе: пиковый RSS и загруженные модели не смешиваются
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=setup_django) as executor:
+        return executor.submit(run_engine, engine_name, dtype, corpus, window_s).result()
+
+
+def format_result(label, result):
+    return (f"{label:>8} ({result['engine']}, {result['dtype']}): RTF {result['rtf']:.3f}, "
+            f"пиковый RSS {result['peak_rss_mb']:.0f} МБ, WER {result['wer']:.2%}, "
+            f"загрузка {result['load_seconds']:.1f} с, аудио {result['audio_seconds']:.0f} с")
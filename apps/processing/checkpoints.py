@@ -0,0 +1,67 @@
+from django.conf import settings
+
+from .models import Notes, StageCheckpoint, Summary, Transcript
+
+# Стадии конвейера по порядку и их шаги; стадия выполнена, когда выполнены все её шаги
+STAGE_STEPS = [
+    ('extract', ['extract']),
+    ('transcribe', ['transcribe']),
+    ('summarize', ['prompts', 'summary', 'notes']),
+]
+STEP_OUTPUTS = {'transcribe': Transcript, 'summary': Summary, 'notes': Notes}
+
+
+def pipeline_version(asr_engine=None):
+    # Результат определяется версией обработки и используемыми моделями
+    asr_engine = asr_engine or settings.ASR_ENGINE
+    asr_model = settings.ASR_NEMO_MODEL_ID if asr_engine == 'nemo_ctc' else settings.ASR_MODEL_ID
+    return f"{settings.PROCESSING_PIPELINE_VERSION}/{asr_engine}:{asr_model}/{settings.LLM_MODEL_ID}"
+
+
+def save_checkpoint(job, step, data=None):
+    StageCheckpoint.objects.update_or_create(
+        job=job, step=step, defaults={'pipeline_version': job.pipeline_version, 'data': data or {}})
+
+
+def load_checkpoint(job, step):
+    """Данные шага или None, если шаг не выполнен этой версией конвейера."""
+    checkpoint = StageCheckpoint.objects.filter(job=job, step=step, pipeline_version=job.pipeline_version).first()
+    return None if checkpoint is None else checkpoint.data
+
+
+def completed_steps(job):
+    return set(StageCheckpoint.objects.filter(job=job, pipeline_version=job.pipeline_version)
+               .values_list('step', flat=True))
+
+
+def resume_stage(job, stages, has_extracted_audio):
+    """
+    Стадия из stages, следующая за последней выполненной, или None, если выполнены все.
+    Аудио стадии extract лежит в PROCESSING_SCRATCH_ROOT и удаляется после распознавания,
+    поэтому её чекпоинт годен, лишь пока файл на месте.
+    """
+    done = completed_steps(job)
+    if not has_extracted_audio:
+        done.discard('extract')
+    resume = stages[0]
+    for stage, steps in STAGE_STEPS:
+        if stage in stages and done.issuperset(steps):
+            following = stages[stages.index(stage) + 1:]
+            resume = following[0] if following else None
+    return resume
+
+
+def reset_from(job, stage):
+    """
+    Готовит задачу к запуску со стадии stage: шаги этой и следующих стадий и их результаты
+    удаляются. В самой stage остаются шаги, выполненные текущей версией конвейера, —
+    если упал только конспект, пересказ не запрашивается заново.
+    """
+    done = completed_steps(job)
+    names = [name for name, _steps in STAGE_STEPS]
+    for name, steps in STAGE_STEPS[names.index(stage):]:
+        redo = [step for step in steps if name != stage or step not in done]
+        StageCheckpoint.objects.filter(job=job, step__in=redo).delete()
+        for step in redo:
+            if step in STEP_OUTPUTS:
+                STEP_OUTPUTS[step].objects.filter(job=job).delete()
@@ -0,0 +1,109 @@
+import numpy as np
+from django.conf import settings
+
+from .asr import ASRModelRegistry, quantize_int8, registry as asr_registry
+from .audio import SAMPLE_RATE
+from .transcription import collect_stream, split_chunks, transcribe_windows
+
+
+def build_nemo_ctc(model_id, dtype, device):
+    import torch
+    from nemo.collections.asr.models import ASRModel
+
+    model = ASRModel.from_pretrained(model_id, map_location=device)
+    model.eval()
+    if dtype == "int8":
+        model = quantize_int8(model)
+    elif dtype != "float32":
+        model = model.to(dtype=getattr(torch, dtype))
+    return model
+
+
+nemo_registry = ASRModelRegistry(loader=build_nemo_ctc, model_setting='ASR_NEMO_MODEL_ID')
+
+
+class ASREngine:
+    """
+    Движок ASR: transcribe(windows) принимает окна (offset, samples) и возвращает
+    для каждого {'text', 'segments'}, где segments — [{'start', 'end', 'text'}]
+    в секундах от начала записи. Модель живёт в реестре процесса (см. asr.py).
+    """
+    name = None
+
+    @property
+    def registry(self):
+        raise NotImplementedError
+
+    def transcribe(self, windows, batch_size=1, stats=None):
+        raise NotImplementedError
+
+    def transcribe_stream(self, windows, batch_size=1, stats=None):
+        return collect_stream(lambda group: self.transcribe(group, batch_size, stats), windows, batch_size, stats)
+
+    def batch_size(self):
+        return self.registry.batch_size()
+
+    def warmup(self):
+        # Прогон секунды тишины: модель загружается и прогревается до первой задачи
+        self.transcribe([(0.0, np.zeros(SAMPLE_RATE, dtype=np.float32))])
+
+    def status(self):
+        return self.registry.status()
+
+
+class WhisperEngine(ASREngine):
+    # transformers Whisper: лучшее качество, тяжёлый на CPU
+    name = 'whisper'
+
+    @property
+    def registry(self):
+        return asr_registry
+
+    def transcribe(self, windows, batch_size=1, stats=None):
+        return transcribe_windows(self.registry.get(), windows, batch_size, stats)
+
+
+def nemo_result(hypothesis, offset):
+    text = getattr(hypothesis, 'text', hypothesis)
+    words = (getattr(hypothesis, 'timestamp', None) or {}).get('word', [])
+    segments = [{
+        "start": offset + word['start'],
+        "end": offset + word['end'],
+        "text": word.get('word', ''),
+    } for word in words if word.get('start') is not None]
+    return {"text": (text or "").strip(), "segments": segments}
+
+
+class NemoCTCEngine(ASREngine):
+    # NeMo Conformer-CTC: без авторегрессионного декодера, в разы быстрее Whisper на CPU
+    name = 'nemo_ctc'
+
+    @property
+    def registry(self):
+        return nemo_registry
+
+    def transcribe(self, windows, batch_size=1, stats=None):
+        # Conformer считает внимание по всему входу: длинные окна режутся на куски по тихим местам
+        model = self.registry.get()
+        results = []
+        for offset, samples in windows:
+            pieces = list(split_chunks(offset, samples))
+            hypotheses = model.transcribe([piece for _, piece in pieces], batch_size=batch_size,
+                                          timestamps=True, verbose=False)
+            parts = [nemo_result(h, piece_offset) for h, (piece_offset, _) in zip(hypotheses, pieces)]
+            results.append({
+                "text": " ".join(p["text"] for p in parts if p["text"]),
+                "segments": [s for p in parts for s in p["segments"]],
+            })
+        return results
+
+
+ENGINES = {engine.name: engine for engine in (WhisperEngine(), NemoCTCEngine())}
+
+
+def get_engine(name=None):
+    name = name or settings.ASR_ENGINE
+    try:
+        return ENGINES[name]
+    except KeyError:
+        raise ValueError(f"Неизвестный движок ASR: {name}")
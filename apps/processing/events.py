@@ -0,0 +1,171 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Грубая шкала прогресса по стадиям; внутри transcribe прогресс уточняется по распознанному аудио
+STAGE_PROGRESS = {'queued': 0, 'extract': 5, 'transcribe': 15, 'summarize': 85, 'done': 100}
+CHANNEL_PREFIX = 'processing:events:group:'
+
+
+def job_event(job, event, progress=None):
+    return {
+        'event': event,
+        'job': job.id,
+        'recording': job.recording_id,
+        'status': job.status,
+        'stage': job.stage,
+        'progress': STAGE_PROGRESS.get(job.stage, 0) if progress is None else progress,
+    }
+
+
+class InMemoryEventBackend:
+    """События внутри одного процесса: для тестов и разработки с eager-задачами."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def publish(self, group_id, event):
+        with self._lock:
+            targets = list(self._subscribers.get(group_id, ()))
+        for loop, queue in targets:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # цикл подписчика уже закрыт; отписка произойдёт при выходе из subscribe
+                pass
+
+    @asynccontextmanager
+    async def subscribe(self, group_ids):
+        entry = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            for group_id in group_ids:
+                self._subscribers.setdefault(group_id, set()).add(entry)
+
+        async def next_event(timeout):
+            try:
+                return await asyncio.wait_for(entry[1].get(), timeout)
+            except asyncio.TimeoutError:
+                return None
+
+        try:
+            yield next_event
+        finally:
+            with self._lock:
+                for group_id in group_ids:
+                    self._subscribers.get(group_id, set()).discard(entry)
+
+
+class RedisEventBackend:
+    """Рассылка событий из воркеров во все веб-процессы через Redis pub/sub, канал на группу."""
+
+    def __init__(self, url):
+        import redis
+
+        self.url = url
+        self._errors = redis.RedisError
+        self._redis = redis.Redis.from_url(url)
+
+    def publish(self, group_id, event):
+        try:
+            self._redis.publish(f"{CHANNEL_PREFIX}{group_id}", json.dumps(event))
+        except self._errors as e:
+            # Без событий клиенты увидят результат позже, но задача не должна падать
+            logger.warning("События: Redis недоступен (%s)", e)
+
+    @asynccontextmanager
+    async def subscribe(self, group_ids):
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        channels = [f"{CHANNEL_PREFIX}{group_id}" for group_id in group_ids]
+        if channels:
+            await pubsub.subscribe(*channels)
+
+        async def next_event(timeout):
+            if not channels:
+                await asyncio.sleep(timeout)
+                return None
+            deadline = time.monotonic() + timeout
+            while (remaining := deadline - time.monotonic()) > 0:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+                if message is not None and message['type'] == 'message':
+                    return json.loads(message['data'])
+            return None
+
+        try:
+            yield next_event
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_event_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if settings.PROCESSING_EVENTS_BACKEND == 'redis':
+                try:
+                    _backend = RedisEventBackend(settings.PROCESSING_EVENTS_REDIS_URL)
+                except ValueError as e:
+                    logger.warning("События: неверный адрес Redis (%s), события только внутри процесса", e)
+            if _backend is None:
+                _backend = InMemoryEventBackend()
+        return _backend
+
+
+def publish_job_event(job, event, progress=None):
+    try:
+        get_event_backend().publish(job.recording.group_id, job_event(job, event, progress))
+    except Exception:
+        logger.exception("Не удалось опубликовать событие задачи %s", job.id)
+
+
+class ProgressReporter:
+    """
+    Публикует прогресс стадии transcribe по доле распознанных сэмплов: не чаще раза
+    в PROCESSING_EVENTS_PROGRESS_INTERVAL секунд и только при изменении процента.
+    Каждая публикация обновляет heartbeat_at задачи.
+    """
+
+    def __init__(self, job, total_samples, start=STAGE_PROGRESS['transcribe'], end=STAGE_PROGRESS['summarize'],
+                 clock=time.monotonic):
+        self.job = job
+        self.total = max(1, total_samples)
+        self.start = start
+        self.end = end
+        self._clock = clock
+        self._done = 0
+        self._last_progress = start
+        self._last_sent = None
+
+    def track(self, pieces):
+        for offset, samples in pieces:
+            yield offset, samples
+            self.advance(len(samples))
+
+    def advance(self, samples):
+        self._done += samples
+        progress = self.start + (self.end - self.start) * min(1.0, self._done / self.total)
+        progress = int(progress)
+        now = self._clock()
+        if progress == self._last_progress:
+            return
+        if self._last_sent is not None and now - self._last_sent < settings.PROCESSING_EVENTS_PROGRESS_INTERVAL:
+            return
+        self._last_progress = progress
+        self._last_sent = now
+        self.job.beat()
+        publish_job_event(self.job, 'progress', progress)
@@ -0,0 +1,61 @@
+from django.conf import settings
+
+from .llm_client import get_llm_client
+
+
+class LLMBackend:
+    """Интерфейс бэкенда LLM: model_id участвует в ключе кеша, complete возвращает текст ответа."""
+    name = None
+    model_id = None
+
+    def complete(self, prompt, max_tokens=1000):
+        raise NotImplementedError
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    # Любой сервер с /chat/completions в формате OpenAI: локальный стенд, vLLM, llama.cpp
+    name = 'openai'
+
+    def __init__(self, api_url, model_id, api_key=''):
+        self.api_url = api_url
+        self.model_id = model_id
+        self.api_key = api_key
+
+    def headers(self):
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    def complete(self, prompt, max_tokens=1000):
+        payload = {
+            "model": self.model_id,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": max_tokens
+        }
+        data = get_llm_client().post_json(self.api_url, payload, headers=self.headers())
+        return data["choices"][0]["message"]["content"]
+
+
+class OpenRouterBackend(OpenAICompatibleBackend):
+    name = 'openrouter'
+
+    def complete(self, prompt, max_tokens=1000):
+        # Ключ проверяется при вызове, а не при импорте: модуль не должен падать там, где LLM не нужен
+        if not self.api_key:
+            raise EnvironmentError("OPENROUTER_API_KEY is not set in environment.")
+        return super().complete(prompt, max_tokens)
+
+
+BACKENDS = {
+    OpenRouterBackend.name: OpenRouterBackend,
+    OpenAICompatibleBackend.name: OpenAICompatibleBackend,
+}
+
+
+def get_llm_backend():
+    try:
+        backend_class = BACKENDS[settings.LLM_BACKEND]
+    except KeyError:
+        raise ValueError(f"Неизвестный LLM_BACKEND: {settings.LLM_BACKEND}")
+    return backend_class(settings.LLM_API_URL, settings.LLM_MODEL_ID, settings.LLM_API_KEY)
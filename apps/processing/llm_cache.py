@@ -0,0 +1,138 @@
+import hashlib
+import json
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import LLMCacheEntry
+
+logger = logging.getLogger(__name__)
+
+
+# Размер кеша проверяется не при каждой записи, а после записи 1/EVICT_CHECK_FRACTION лимита
+EVICT_CHECK_FRACTION = 16
+
+
+class CacheStats:
+    """Счётчики попаданий и промахов: общие для процесса или одного вызова (задачи)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def as_dict(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+
+class LLMCache:
+    """
+    Персистентный кеш ответов LLM в БД. Ключ — хеш модели, промпта и параметров
+    генерации, поэтому повторная обработка записи не тратит квоту API.
+    Записи старше LLM_CACHE_TTL_SECONDS считаются промахом; при превышении
+    LLM_CACHE_MAX_MB вытесняются давно не использованные.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.totals = CacheStats()
+        self._written = 0
+
+    @staticmethod
+    def make_key(model_id, prompt, params=None):
+        payload = json.dumps([model_id, prompt, params or {}], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @property
+    def enabled(self):
+        return settings.LLM_CACHE_ENABLED
+
+    def _count(self, hit, stats=None):
+        self.totals.count(hit)
+        if stats is not None:
+            stats.count(hit)
+
+    def get(self, key, stats=None):
+        entry = LLMCacheEntry.objects.filter(key=key).first()
+        if entry is not None and self._expired(entry):
+            entry.delete()
+            entry = None
+        if entry is None:
+            self._count(False, stats)
+            return None
+        LLMCacheEntry.objects.filter(pk=entry.pk).update(hits=F('hits') + 1, last_used_at=timezone.now())
+        self._count(True, stats)
+        return entry.response
+
+    def put(self, key, model_id, response):
+        size = len(response.encode('utf-8'))
+        LLMCacheEntry.objects.update_or_create(key=key, defaults={
+            'model_id': model_id,
+            'response': response,
+            'size': size,
+            'last_used_at': timezone.now(),
+        })
+        # Агрегат по всей таблице дорог: вытеснение — только когда записано заметно много
+        with self._lock:
+            self._written += size
+            due = self._written >= settings.LLM_CACHE_MAX_MB * 1024 * 1024 // EVICT_CHECK_FRACTION
+            if due:
+                self._written = 0
+        if due:
+            self.evict()
+
+    def _expired(self, entry):
+        ttl = settings.LLM_CACHE_TTL_SECONDS
+        return bool(ttl) and entry.created_at < timezone.now() - timedelta(seconds=ttl)
+
+    def evict(self):
+        ttl = settings.LLM_CACHE_TTL_SECONDS
+        if ttl:
+            LLMCacheEntry.objects.filter(created_at__lt=timezone.now() - timedelta(seconds=ttl)).delete()
+
+        limit = settings.LLM_CACHE_MAX_MB * 1024 * 1024
+        total = LLMCacheEntry.objects.aggregate(total=Sum('size'))['total'] or 0
+        if total <= limit:
+            return
+        # Самые давно использованные записи удаляются, пока кеш не влезет в лимит
+        stale = []
+        for pk, size in LLMCacheEntry.objects.order_by('last_used_at').values_list('pk', 'size').iterator():
+            if total <= limit:
+                break
+            stale.append(pk)
+            total -= size
+        LLMCacheEntry.objects.filter(pk__in=stale).delete()
+        logger.info("LLM-кеш: вытеснено %s записей", len(stale))
+
+    def cached_call(self, model_id, prompt, params, call, use_cache=True, stats=None):
+        """stats — CacheStats вызывающего: в него, помимо общих счётчиков, считается этот вызов."""
+        if not (use_cache and self.enabled):
+            return call()
+        key = self.make_key(model_id, prompt, params)
+        response = self.get(key, stats)
+        if response is None:
+            response = call()
+            self.put(key, model_id, response)
+        return response
+
+    def stats(self):
+        return self.totals.as_dict()
+
+    def status(self):
+        totals = LLMCacheEntry.objects.aggregate(size=Sum('size'))
+        return dict(self.stats(), entries=LLMCacheEntry.objects.count(), size=totals['size'] or 0)
+
+
+llm_cache = LLMCache()
@@ -0,0 +1,233 @@
+import bisect
+import logging
+import random
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Границы корзин гистограммы задержек, секунды
+LATENCY_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+
+
+class LLMRequestError(Exception):
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self._lock = threading.Lock()
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.count += 1
+            self.total += seconds
+
+    def snapshot(self):
+        # Кумулятивные счётчики в духе Prometheus: le -> число запросов не дольше le
+        with self._lock:
+            cumulative = {}
+            running = 0
+            for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+                running += count
+                cumulative[str(bound)] = running
+            return {'buckets': cumulative, 'count': self.count, 'sum': round(self.total, 3)}
+
+
+class LocalTokenBucket:
+    # Ограничитель внутри одного процесса; используется, когда Redis не настроен
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._updated = clock()
+
+    def try_acquire(self):
+        """Возвращает 0, если токен взят, иначе сколько секунд подождать."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+
+class RedisTokenBucket:
+    """
+    Общий для всех процессов воркеров ограничитель: состояние корзины хранится
+    в Redis и обновляется атомарно Lua-скриптом.
+    """
+    SCRIPT = """
+    local rate = tonumber(ARGV[1])
+    local burst = tonumber(ARGV[2])
+    local t = redis.call('TIME')
+    local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(state[1]) or burst
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+    local wait = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        wait = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 60)
+    return tostring(wait)
+    """
+
+    def __init__(self, url, key, rate, burst):
+        import redis
+
+        self.rate = rate
+        self.burst = burst
+        self.key = key
+        self._errors = redis.RedisError
+        self._redis = redis.Redis.from_url(url)
+        self._script = self._redis.register_script(self.SCRIPT)
+        self._fallback = LocalTokenBucket(rate, burst)
+
+    def try_acquire(self):
+        try:
+            return float(self._script(keys=[self.key], args=[self.rate, self.burst]))
+        except self._errors as e:
+            # Недоступный Redis не должен ронять задачи: лимитируем хотя бы в пределах процесса
+            logger.warning("LLM: лимитер в Redis недоступен (%s), локальный лимит", e)
+            return self._fallback.try_acquire()
+
+
+def build_rate_limiter():
+    rate = settings.LLM_RATE_PER_SECOND
+    if not rate:
+        return None
+    burst = max(1, settings.LLM_RATE_BURST)
+    if settings.LLM_RATE_LIMIT_REDIS_URL:
+        return RedisTokenBucket(settings.LLM_RATE_LIMIT_REDIS_URL, 'processing:llm:bucket', rate, burst)
+    return LocalTokenBucket(rate, burst)
+
+
+def backoff_delay(attempt, base, cap):
+    # Экспоненциальная задержка с полным джиттером, чтобы воркеры не повторяли запросы синхронно
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def retry_after_seconds(response):
+    value = response.headers.get('Retry-After')
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+class LLMClient:
+    """
+    HTTP-клиент LLM: keep-alive пул соединений, общий лимит запросов в секунду,
+    повторы с джиттером на 429/5xx и сетевые ошибки, таймауты и гистограмма задержек.
+    """
+
+    def __init__(self, rate_limiter=None, sleep=time.sleep):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.LLM_HTTP_POOL_SIZE)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.rate_limiter = rate_limiter
+        self.latency = LatencyHistogram()
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.failures = 0
+
+    def _wait_for_token(self):
+        if self.rate_limiter is None:
+            return
+        while True:
+            wait = self.rate_limiter.try_acquire()
+            if not wait:
+                return
+            self._sleep(wait)
+
+    def _count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def post_json(self, url, payload, headers=None, timeout=None):
+        timeout = timeout or (settings.LLM_CONNECT_TIMEOUT, settings.LLM_READ_TIMEOUT)
+        attempts = settings.LLM_MAX_RETRIES + 1
+        for attempt in range(attempts):
+            self._wait_for_token()
+            started = time.monotonic()
+            delay = None
+            try:
+                response = self.session.post(url, json=payload, headers=headers, timeout=timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = LLMRequestError(f"LLM request failed: {e}")
+            else:
+                self.latency.observe(time.monotonic() - started)
+                if response.status_code == 200:
+                    try:
+                        return response.json()
+                    except ValueError:
+                        # Страница ошибки прокси или обрезанный ответ с кодом 200 — повторяется, как 5xx
+                        error = LLMRequestError(f"LLM returned a non-JSON response: {response.text[:200]}",
+                                                status_code=200)
+                else:
+                    error = LLMRequestError(
+                        f"LLaMA request failed with status {response.status_code}: {response.text}",
+                        status_code=response.status_code,
+                    )
+                    if response.status_code not in RETRY_STATUSES:
+                        break
+                    delay = retry_after_seconds(response)
+                    if delay is not None and delay > settings.LLM_RETRY_BACKOFF_MAX:
+                        # Ждать дольше LLM_RETRY_BACKOFF_MAX — держать воркер очереди llm; повтор раньше
+                        # срока бесполезен, поэтому запрос сразу считается неудачным
+                        logger.warning("%s; Retry-After %.0f с больше LLM_RETRY_BACKOFF_MAX, без повтора",
+                                       error, delay)
+                        break
+
+            if attempt + 1 < attempts:
+                if delay is None:
+                    delay = backoff_delay(attempt, settings.LLM_RETRY_BACKOFF, settings.LLM_RETRY_BACKOFF_MAX)
+                logger.warning("%s; повтор %s/%s через %.1f с", error, attempt + 1, attempts - 1, delay)
+                self._count('retries')
+                self._sleep(delay)
+
+        self._count('failures')
+        raise error
+
+    def status(self):
+        return {
+            'latency': self.latency.snapshot(),
+            'retries': self.retries,
+            'failures': self.failures,
+        }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client():
+    # Один клиент на процесс: соединения переиспользуются между задачами
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LLMClient(rate_limiter=build_rate_limiter())
+        return _client
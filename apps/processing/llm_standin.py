@@ -0,0 +1,72 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STANDIN_MODEL_ID = 'standin'
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Имитация OpenAI-совместимого /chat/completions: ждёт latency + max_tokens / tokens_per_second
+    и возвращает max_tokens «слов». Нужна для прогона конвейера без внешнего API и нагрузочных замеров.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return self.reply(400, {'error': 'invalid json'})
+
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            fail = server.fail_every and server.requests % server.fail_every == 0
+        if fail:
+            return self.reply(503, {'error': 'stand-in overloaded'})
+
+        max_tokens = int(payload.get('max_tokens') or 256)
+        time.sleep(server.latency + max_tokens / server.tokens_per_second)
+        prompt = payload.get('messages', [{}])[-1].get('content', '')
+        self.reply(200, {
+            'id': f"standin-{server.requests}",
+            'object': 'chat.completion',
+            'model': payload.get('model', STANDIN_MODEL_ID),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': " ".join(["токен"] * max_tokens)},
+                'finish_reason': 'length',
+            }],
+            'usage': {'prompt_tokens': len(prompt.split()), 'completion_tokens': max_tokens},
+        })
+
+    def reply(self, status_code, body):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_standin_server(host='127.0.0.1', port=0, latency=0.5, tokens_per_second=50.0, fail_every=0):
+    server = ThreadingHTTPServer((host, port), StandInHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.tokens_per_second = tokens_per_second
+    server.fail_every = fail_every
+    server.requests = 0
+    server.lock = threading.Lock()
+    return server
+
+
+def start_standin_server(**kwargs):
+    server = make_standin_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return server, f"http://{host}:{port}/v1/chat/completions"
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.processing.benchmark import format_result, load_corpus, run_isolated
+from apps.processing.engines import ENGINES
+
+
+class Command(BaseCommand):
+    help = "Сравнение движков ASR на одном корпусе: скорость (RTF), пиковый RSS и WER"
+
+    def add_arguments(self, parser):
+        parser.add_argument('corpus', help="Каталог с аудиофайлами и эталонными .txt с теми же именами")
+        parser.add_argument('--engines', default=",".join(ENGINES), help="Движки через запятую")
+        parser.add_argument('--dtype', default=settings.ASR_DTYPE, help="Точность для всех движков")
+        parser.add_argument('--window', type=int, default=settings.ASR_WINDOW_SECONDS,
+                            help="Длина окна чтения из ffmpeg, с")
+
+    def handle(self, *args, **options):
+        corpus = load_corpus(options['corpus'])
+        if not corpus:
+            raise CommandError("В каталоге нет пар аудио + .txt")
+        engines = [e.strip() for e in options['engines'].split(',') if e.strip()]
+        unknown = set(engines) - set(ENGINES)
+        if unknown:
+            raise CommandError(f"Неизвестные движки: {', '.join(sorted(unknown))}")
+        self.stdout.write(f"Корпус: {len(corpus)} файлов")
+
+        results = []
+        for engine_name in engines:
+            try:
+                result = run_isolated(engine_name, options['dtype'], corpus, options['window'])
+            except Exception as e:
+                self.stdout.write(f"{engine_name:>8}: ошибка — {e}")
+                continue
+            results.append(result)
+            self.stdout.write(format_result(engine_name, result))
+
+        if len(results) > 1:
+            fastest = min(results, key=lambda r: r['rtf'])
+            most_accurate = min(results, key=lambda r: r['wer'])
+            self.stdout.write(f"Быстрее всех: {fastest['engine']}, точнее всех: {most_accurate['engine']}")
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.processing.benchmark import format_result, load_corpus, run_isolated
+
+
+class Command(BaseCommand):
+    help = "Сравнение режимов точности ASR на корпусе: real-time factor, пиковый RSS и WER"
+
+    def add_arguments(self, parser):
+        parser.add_argument('corpus', help="Каталог с аудиофайлами и эталонными .txt с теми же именами")
+        parser.add_argument('--modes', default='fp32,bf16,int8', help="Режимы точности через запятую")
+        parser.add_argument('--engine', default=settings.ASR_ENGINE, help="Движок ASR")
+        parser.add_argument('--window', type=int, default=settings.ASR_WINDOW_SECONDS,
+                            help="Длина окна чтения из ffmpeg, с")
+
+    def handle(self, *args, **options):
+        corpus = load_corpus(options['corpus'])
+        if not corpus:
+            raise CommandError("В каталоге нет пар аудио + .txt")
+        modes = [m.strip() for m in options['modes'].split(',') if m.strip()]
+        self.stdout.write(f"Корпус: {len(corpus)} файлов, движок {options['engine']}")
+
+        for mode in modes:
+            try:
+                result = run_isolated(options['engine'], mode, corpus, options['window'])
+            except Exception as e:
+                self.stdout.write(f"{mode:>5}: ошибка — {e}")
+                continue
+            self.stdout.write(format_result(mode, result))
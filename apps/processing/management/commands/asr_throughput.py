@@ -0,0 +1,34 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.processing.audio import stream_pcm_windows
+from apps.processing.engines import get_engine
+from apps.processing.transcription import format_throughput
+
+
+class Command(BaseCommand):
+    help = "Замер пропускной способности ASR (audio-s/wall-s) для разных размеров батча"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Аудио- или видеофайл для замера")
+        parser.add_argument('--batch-sizes', default='1,2,4,8',
+                            help="Список размеров батча через запятую")
+        parser.add_argument('--window', type=int, default=settings.ASR_WINDOW_SECONDS,
+                            help="Длина окна чтения из ffmpeg, с")
+        parser.add_argument('--engine', default=settings.ASR_ENGINE, help="Движок ASR")
+
+    def handle(self, *args, **options):
+        batch_sizes = [int(b) for b in options['batch_sizes'].split(',') if b.strip()]
+        engine = get_engine(options['engine'])
+        engine.warmup()
+        self.stdout.write(f"Модель: {engine.status()}")
+
+        for batch_size in batch_sizes:
+            started = time.monotonic()
+            _text, _timestamps, audio_seconds = engine.transcribe_stream(
+                stream_pcm_windows(options['path'], options['window']),
+                batch_size=batch_size,
+            )
+            self.stdout.write(format_throughput(audio_seconds, time.monotonic() - started, batch_size))
@@ -0,0 +1,93 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.processing.llm_backends import OpenAICompatibleBackend, get_llm_backend
+from apps.processing.llm_standin import STANDIN_MODEL_ID, start_standin_server
+from apps.processing.summarization import build_llm_prompts
+from apps.processing.tasks import call_llama_concurrently
+
+WORDS_PER_MINUTE = 130
+
+
+def synthetic_transcript(minutes):
+    words = []
+    for i in range(int(minutes * WORDS_PER_MINUTE)):
+        start = i * 60.0 / WORDS_PER_MINUTE
+        text = f"слово{i}." if i % 12 == 11 else f"слово{i}"
+        words.append({"start": start, "end": start + 0.4, "text": text})
+    return " ".join(w["text"] for w in words), words
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def format_latencies(label, values):
+    return (f"{label}: n={len(values)} p50={percentile(values, 50):.2f} с "
+            f"p95={percentile(values, 95):.2f} с p99={percentile(values, 99):.2f} с "
+            f"среднее={statistics.fmean(values) if values else 0:.2f} с")
+
+
+class Command(BaseCommand):
+    help = "Нагрузочный замер LLM-стадии: N задач после ASR параллельно, пропускная способность и p50/p95/p99"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jobs', type=int, default=20, help="Сколько задач прогнать")
+        parser.add_argument('--concurrency', type=int, default=4, help="Сколько задач одновременно")
+        parser.add_argument('--minutes', type=float, default=90, help="Длина синтетической лекции, мин")
+        parser.add_argument('--standin', action='store_true',
+                            help="Поднять локальный OpenAI-совместимый стенд вместо LLM_BACKEND")
+        parser.add_argument('--latency', type=float, default=0.5, help="Стенд: задержка ответа, с")
+        parser.add_argument('--tokens-per-second', type=float, default=200.0, help="Стенд: скорость генерации")
+
+    def handle(self, *args, **options):
+        server = None
+        if options['standin']:
+            server, url = start_standin_server(latency=options['latency'],
+                                               tokens_per_second=options['tokens_per_second'])
+            backend = OpenAICompatibleBackend(url, STANDIN_MODEL_ID)
+            self.stdout.write(f"Стенд: {url}")
+        else:
+            backend = get_llm_backend()
+        self.stdout.write(f"Бэкенд: {backend.name} {backend.model_id}, лимит {settings.LLM_RATE_PER_SECOND} rps")
+
+        text, timestamps = synthetic_transcript(options['minutes'])
+        request_latencies = []
+
+        def call(prompt, max_tokens=1000):
+            # кеш обходится намеренно: меряется сам бэкенд
+            started = time.monotonic()
+            try:
+                return backend.complete(prompt, max_tokens=max_tokens)
+            finally:
+                request_latencies.append(time.monotonic() - started)
+
+        def run_job(_index):
+            started = time.monotonic()
+            prompts = build_llm_prompts(text, timestamps, call)
+            _results, errors = call_llama_concurrently(prompts, call=call)
+            return time.monotonic() - started, not errors
+
+        started = time.monotonic()
+        try:
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+                outcomes = list(executor.map(run_job, range(options['jobs'])))
+        finally:
+            if server is not None:
+                server.shutdown()
+        wall = time.monotonic() - started
+
+        job_latencies = [seconds for seconds, _ok in outcomes]
+        failed = sum(1 for _seconds, ok in outcomes if not ok)
+        self.stdout.write(f"Задач: {len(outcomes)}, ошибок: {failed}, за {wall:.1f} с — "
+                          f"{len(outcomes) / wall * 60:.1f} задач/мин")
+        self.stdout.write(format_latencies("Задача", job_latencies))
+        self.stdout.write(format_latencies("Запрос", request_latencies))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from apps.processing.models import VideoJob
+from apps.processing.search import index_job
+
+
+class Command(BaseCommand):
+    help = "Перестраивает полнотекстовый индекс для уже завершённых задач"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--job', type=int, action='append', help="Только указанные задачи (можно повторять)")
+
+    def handle(self, *args, **options):
+        jobs = VideoJob.objects.filter(status='SUCCESS').select_related('recording', 'transcript', 'summary', 'notes')
+        if options['job']:
+            jobs = jobs.filter(id__in=options['job'])
+        total = 0
+        for job in jobs.iterator(chunk_size=100):
+            total += index_job(job)
+        self.stdout.write(f"Проиндексировано задач: {jobs.count()}, отрывков: {total}")
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processing', '0002_rename_summary_text_summary_text_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videojob',
+            name='stage',
+            field=models.CharField(choices=[('queued', 'В очереди'), ('extract', 'Извлечение аудио'), ('transcribe', 'Распознавание речи'), ('summarize', 'Пересказ и конспект'), ('done', 'Завершено')], default='queued', max_length=20),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 21:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processing', '0004_llmcacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videojob',
+            name='pipeline_version',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
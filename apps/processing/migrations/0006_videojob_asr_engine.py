@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 21:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processing', '0005_videojob_pipeline_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videojob',
+            name='asr_engine',
+            field=models.CharField(blank=True, choices=[('whisper', 'Whisper (transformers)'), ('nemo_ctc', 'NeMo Conformer-CTC')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-17 21:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processing', '0006_videojob_asr_engine'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transcript',
+            name='ends',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.AddField(
+            model_name='transcript',
+            name='spans',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.AddField(
+            model_name='transcript',
+            name='starts',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.AddField(
+            model_name='transcript',
+            name='unaligned_words',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+from apps.processing.timestamps import decode_segments, encode_segments, format_segments, normalize_segments
+
+
+def timestamps_to_columns(apps, schema_editor):
+    Transcript = apps.get_model('processing', 'Transcript')
+    for transcript in Transcript.objects.exclude(timestamps__isnull=True).iterator():
+        items = transcript.timestamps
+        if not isinstance(items, list):
+            continue
+        segments = normalize_segments(items)
+        # Записи, которые не удаётся разобрать целиком, остаются в прежнем формате
+        if len(segments) != len(items):
+            continue
+        for field, value in encode_segments(transcript.text, segments).items():
+            setattr(transcript, field, value)
+        transcript.timestamps = None
+        transcript.save(update_fields=['timestamps', 'starts', 'ends', 'spans', 'unaligned_words'])
+
+
+def columns_to_timestamps(apps, schema_editor):
+    Transcript = apps.get_model('processing', 'Transcript')
+    for transcript in Transcript.objects.filter(timestamps__isnull=True).iterator():
+        segments = decode_segments(transcript.text, transcript.starts, transcript.ends,
+                                   transcript.spans, transcript.unaligned_words)
+        transcript.timestamps = format_segments(segments)
+        transcript.save(update_fields=['timestamps'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processing', '0007_transcript_compact_timestamps'),
+    ]
+
+    operations = [
+        migrations.RunPython(timestamps_to_columns, columns_to_timestamps),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-17 21:35
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0003_group_asr_engine'),
+        ('processing', '0008_transcript_timestamps_to_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('transcript', 'Транскрипт'), ('summary', 'Пересказ'), ('notes', 'Конспект')], max_length=20)),
+                ('start', models.FloatField(blank=True, null=True)),
+                ('text', models.TextField()),
+                ('search_vector', django.contrib.postgres.search.SearchVectorField(null=True)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to='groups.group')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to='processing.videojob')),
+            ],
+            options={
+                'indexes': [django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='processing__search__b7e068_gin')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-17 21:46
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_existing_dispatched(apps, schema_editor):
+    # Задачи, созданные до диспетчера, были отправлены в Celery напрямую. Незавершённые
+    # занимают слоты, пока живы; потерянные снимет диспетчер по PROCESSING_STALE_JOB_SECONDS
+    VideoJob = apps.get_model('processing', 'VideoJob')
+    VideoJob.objects.update(dispatched_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processing', '0009_searchentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videojob',
+            name='dispatched_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='videojob',
+            name='priority',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Повторный запуск пользователем'), (1, 'Новая загрузка'), (2, 'Бэклог')], default=1),
+        ),
+        migrations.RunPython(mark_existing_dispatched, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2 on 2026-10-17 21:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def checkpoint_existing_results(apps, schema_editor):
+    # Готовые транскрипты и результаты LLM старых задач засчитываются их версии конвейера.
+    # Задачи до появления pipeline_version получают версию, которую им вычислит resume,
+    # иначе он пересчитал бы всё с нуля
+    from django.conf import settings
+    from apps.processing.checkpoints import pipeline_version
+
+    VideoJob = apps.get_model('processing', 'VideoJob')
+    StageCheckpoint = apps.get_model('processing', 'StageCheckpoint')
+    checkpoints = []
+    jobs = VideoJob.objects.values_list(
+        'id', 'pipeline_version', 'asr_engine', 'recording__group__asr_engine',
+        'transcript__id', 'summary__id', 'notes__id')
+    for job_id, version, engine, group_engine, transcript_id, summary_id, notes_id in jobs.iterator():
+        version = version or pipeline_version(engine or group_engine or settings.ASR_ENGINE)
+        for step, result_id in (('transcribe', transcript_id), ('summary', summary_id), ('notes', notes_id)):
+            if result_id is not None:
+                checkpoints.append(StageCheckpoint(job_id=job_id, step=step, pipeline_version=version))
+    StageCheckpoint.objects.bulk_create(checkpoints, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processing', '0010_videojob_priority'),
+        ('groups', '0003_group_asr_engine'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StageCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('step', models.CharField(choices=[('extract', 'Аудио извлечено'), ('transcribe', 'Транскрипт готов'), ('prompts', 'Промпты LLM собраны'), ('summary', 'Пересказ готов'), ('notes', 'Конспект готов')], max_length=20)),
+                ('pipeline_version', models.CharField(max_length=255)),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now=True)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='processing.videojob')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('job', 'step'), name='unique_job_checkpoint_step')],
+            },
+        ),
+        migrations.RunPython(checkpoint_existing_results, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 22:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processing', '0011_stagecheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videojob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
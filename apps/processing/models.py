@@ -1,6 +1,20 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models.functions import Substr
+from django.utils import timezone
 from apps.recordings.models import Recording
 
+from .timestamps import (
+    decode_columns, decode_segments, encode_segments, format_segments, normalize_segments, word_range,
+)
+
+# Движки распознавания речи, см. apps.processing.engines
+ASR_ENGINE_CHOICES = [
+    ('whisper', 'Whisper (transformers)'),
+    ('nemo_ctc', 'NeMo Conformer-CTC'),
+]
+
 class VideoJob(models.Model):
     STATUS_CHOICES = [
         ('PENDING', 'Ожидает'),
@@ -8,17 +22,118 @@ class VideoJob(models.Model):
         ('SUCCESS', 'Успешно'),
         ('FAILED', 'Ошибка'),
     ]
+    STAGE_CHOICES = [
+        ('queued', 'В очереди'),
+        ('extract', 'Извлечение аудио'),
+        ('transcribe', 'Распознавание речи'),
+        ('summarize', 'Пересказ и конспект'),
+        ('done', 'Завершено'),
+    ]
+    # Меньше — важнее; см. apps.processing.scheduling
+    PRIORITY_INTERACTIVE = 0
+    PRIORITY_UPLOAD = 1
+    PRIORITY_BACKLOG = 2
+    PRIORITY_CHOICES = [
+        (PRIORITY_INTERACTIVE, 'Повторный запуск пользователем'),
+        (PRIORITY_UPLOAD, 'Новая загрузка'),
+        (PRIORITY_BACKLOG, 'Бэклог'),
+    ]
     recording = models.ForeignKey(Recording, on_delete=models.CASCADE, related_name='jobs')
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    stage = models.CharField(max_length=20, choices=STAGE_CHOICES, default='queued')
     log = models.TextField(blank=True)
+    pipeline_version = models.CharField(max_length=255, blank=True)
+    # пусто — движок группы или ASR_ENGINE
+    asr_engine = models.CharField(max_length=20, choices=ASR_ENGINE_CHOICES, blank=True)
+    priority = models.PositiveSmallIntegerField(choices=PRIORITY_CHOICES, default=PRIORITY_UPLOAD)
+    # когда диспетчер отправил задачу в Celery; пусто — ждёт своей очереди
+    dispatched_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     started_at = models.DateTimeField(null=True, blank=True)
     finished_at = models.DateTimeField(null=True, blank=True)
+    # последний признак жизни воркера: смена стадии или прогресс распознавания
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    def beat(self):
+        self.heartbeat_at = timezone.now()
+        VideoJob.objects.filter(pk=self.pk).update(heartbeat_at=self.heartbeat_at)
 
 class Transcript(models.Model):
     job = models.OneToOneField(VideoJob, on_delete=models.CASCADE, related_name='transcript', null=True, blank=True)
     text = models.TextField()
+    # Прежний формат: список {'start': 'MM:SS', 'end', 'text'}; заполнен только у старых записей
     timestamps = models.JSONField(null=True)
+    # Пословные таймкоды колонками, см. apps.processing.timestamps.encode_segments
+    starts = models.BinaryField(default=b'')
+    ends = models.BinaryField(default=b'')
+    spans = models.BinaryField(default=b'')
+    unaligned_words = models.JSONField(default=dict, blank=True)
+
+    @classmethod
+    def columns(cls, text, segments):
+        """Поля модели для текста и таймкодов [{'start', 'end', 'text'}] в секундах."""
+        return {'text': text, 'timestamps': None, **encode_segments(text, segments)}
+
+    def segments(self):
+        if self.timestamps is not None:
+            return normalize_segments(self.timestamps)
+        return decode_segments(self.text, self.starts, self.ends, self.spans, self.unaligned_words)
+
+    def legacy_timestamps(self):
+        if self.timestamps is not None:
+            return self.timestamps
+        return format_segments(self.segments())
+
+    def encoded_columns(self):
+        if self.timestamps is not None:
+            return encode_segments(self.text, normalize_segments(self.timestamps))
+        return {'starts': self.starts, 'ends': self.ends, 'spans': self.spans,
+                'unaligned_words': self.unaligned_words}
+
+    def compact_timestamps(self):
+        """Таймкоды массивами: секунды начала/конца и смещение/длина слова в text."""
+        encoded = self.encoded_columns()
+        starts, ends, offsets, lengths = decode_columns(encoded['starts'], encoded['ends'], encoded['spans'])
+        return {
+            'start': starts,
+            'end': ends,
+            'offset': offsets,
+            'length': lengths,
+            'unaligned': encoded['unaligned_words'] or {},
+        }
+
+    def text_slice(self, begin, end):
+        # Если text не загружен (defer), из базы читается только нужный кусок
+        if 'text' not in self.get_deferred_fields():
+            return self.text[begin:end]
+        return (Transcript.objects.filter(pk=self.pk)
+                .annotate(piece=Substr('text', begin + 1, end - begin))
+                .values_list('piece', flat=True).get())
+
+    def window(self, start, end, cursor=0, limit=500):
+        """
+        Слова, начинающиеся в [start, end) секунд: не больше limit, начиная с индекса
+        cursor. Возвращает (segments, next_cursor); next_cursor — None, если слов больше нет.
+        """
+        encoded = self.encoded_columns()
+        first, stop = word_range(encoded['starts'], start, end)
+        first = max(first, cursor)
+        last = min(stop, first + limit)
+        if first >= last:
+            return [], None
+
+        starts, ends, offsets, lengths = decode_columns(encoded['starts'], encoded['ends'], encoded['spans'],
+                                                        first, last)
+        aligned = [(o, o + n) for o, n in zip(offsets, lengths) if o >= 0]
+        begin = min((b for b, _ in aligned), default=0)
+        piece = self.text_slice(begin, max((e for _, e in aligned), default=0))
+        unaligned = encoded['unaligned_words'] or {}
+
+        segments = []
+        for i, (s, e, offset, length) in enumerate(zip(starts, ends, offsets, lengths), start=first):
+            word = piece[offset - begin:offset - begin + length] if offset >= 0 else unaligned.get(str(i), '')
+            segments.append({'index': i, 'start': s, 'end': e, 'text': word})
+        return segments, last if last < stop else None
 
 class Summary(models.Model):
     job = models.OneToOneField(VideoJob, on_delete=models.CASCADE, related_name='summary', null=True, blank=True)
@@ -27,3 +142,54 @@ class Summary(models.Model):
 class Notes(models.Model):
     job = models.OneToOneField(VideoJob, on_delete=models.CASCADE, related_name='notes')
     text = models.TextField()
+
+class StageCheckpoint(models.Model):
+    """
+    Результат стадии задачи, сохранённый для продолжения после сбоя, см. apps.processing.checkpoints.
+    Годен, только пока совпадает pipeline_version.
+    """
+    STEP_CHOICES = [
+        ('extract', 'Аудио извлечено'),
+        ('transcribe', 'Транскрипт готов'),
+        ('prompts', 'Промпты LLM собраны'),
+        ('summary', 'Пересказ готов'),
+        ('notes', 'Конспект готов'),
+    ]
+    job = models.ForeignKey(VideoJob, on_delete=models.CASCADE, related_name='checkpoints')
+    step = models.CharField(max_length=20, choices=STEP_CHOICES)
+    pipeline_version = models.CharField(max_length=255)
+    # выход шага, которого нет в других моделях (например, промпты после map-reduce)
+    data = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['job', 'step'], name='unique_job_checkpoint_step')]
+
+class LLMCacheEntry(models.Model):
+    # Ключ — sha256 от модели, промпта и параметров генерации
+    key = models.CharField(max_length=64, unique=True)
+    model_id = models.CharField(max_length=255)
+    response = models.TextField()
+    size = models.PositiveIntegerField(default=0)
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+class SearchEntry(models.Model):
+    """Отрывок транскрипта, абзац пересказа или конспекта в полнотекстовом индексе, см. apps.processing.search."""
+    KIND_CHOICES = [
+        ('transcript', 'Транскрипт'),
+        ('summary', 'Пересказ'),
+        ('notes', 'Конспект'),
+    ]
+    job = models.ForeignKey(VideoJob, on_delete=models.CASCADE, related_name='search_entries')
+    # группа записи дублируется, чтобы ограничивать поиск группами пользователя без лишних join
+    group = models.ForeignKey('groups.Group', on_delete=models.CASCADE, related_name='search_entries')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # начало отрывка в секундах от начала записи, если известно
+    start = models.FloatField(null=True, blank=True)
+    text = models.TextField()
+    search_vector = SearchVectorField(null=True)
+
+    class Meta:
+        indexes = [GinIndex(fields=['search_vector'])]
@@ -0,0 +1,108 @@
+import logging
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+
+from .asr import available_cores
+from .audio import SAMPLE_RATE
+from .engines import get_engine
+from .transcription import TranscriptionStats
+
+logger = logging.getLogger(__name__)
+
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def threads_per_worker(workers):
+    if settings.ASR_PARALLEL_THREADS != 'auto':
+        return max(1, int(settings.ASR_PARALLEL_THREADS))
+    return max(1, available_cores() // workers)
+
+
+def init_asr_worker(threads, preload):
+    # Лимит потоков ставится до импорта torch, иначе каждый процесс займёт все ядра
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(threads)
+    import django
+    django.setup()
+    import torch
+    torch.set_num_threads(threads)
+    if preload:
+        get_engine().warmup()
+
+
+def get_asr_pool():
+    # Пул живёт столько же, сколько процесс воркера Celery: модели в нём остаются загруженными
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            import billiard
+
+            workers = settings.ASR_PARALLEL_WORKERS
+            threads = threads_per_worker(workers)
+            logger.info("ASR: пул из %s процессов по %s потоков", workers, threads)
+            _pool = billiard.get_context('spawn').Pool(
+                processes=workers,
+                initializer=init_asr_worker,
+                initargs=(threads, settings.ASR_PRELOAD),
+            )
+        return _pool
+
+
+def plan_segments(pieces, segment_seconds, sample_rate=SAMPLE_RATE):
+    """
+    Собирает подряд идущие речевые фрагменты (offset, samples) в сегменты не короче
+    segment_seconds. Фрагменты после VAD разделены паузами, поэтому граница сегмента
+    всегда приходится на тишину и не режет слова.
+    """
+    segment = []
+    seconds = 0.0
+    for offset, samples in pieces:
+        segment.append((offset, samples))
+        seconds += len(samples) / sample_rate
+        if seconds >= segment_seconds:
+            yield segment
+            segment = []
+            seconds = 0.0
+    if segment:
+        yield segment
+
+
+def transcribe_segment(segment, batch_size, engine_name=None):
+    stats = TranscriptionStats()
+    text, timestamps, audio_seconds = get_engine(engine_name).transcribe_stream(segment, batch_size, stats)
+    return text, timestamps, audio_seconds, stats
+
+
+def merge_segments(results, stats=None):
+    texts = []
+    timestamps = []
+    audio_seconds = 0.0
+    for text, segment_timestamps, segment_seconds, segment_stats in results:
+        if text:
+            texts.append(text)
+        timestamps.extend(segment_timestamps)
+        audio_seconds += segment_seconds
+        if stats is not None:
+            stats.add(segment_stats)
+    return " ".join(texts), timestamps, audio_seconds
+
+
+def transcribe_parallel(pieces, pool, segment_seconds, batch_size=1, max_in_flight=None, engine_name=None,
+                        stats=None):
+    # В полёте не больше max_in_flight сегментов, чтобы не держать в памяти всю запись
+    max_in_flight = max_in_flight or 2 * settings.ASR_PARALLEL_WORKERS
+    in_flight = deque()
+    results = []
+    for segment in plan_segments(pieces, segment_seconds):
+        in_flight.append(pool.apply_async(transcribe_segment, (segment, batch_size, engine_name)))
+        if len(in_flight) >= max_in_flight:
+            results.append(in_flight.popleft().get())
+    while in_flight:
+        results.append(in_flight.popleft().get())
+    return merge_segments(results, stats)
@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from .models import VideoJob
+
+# Задача занимает слот с момента отправки в Celery до завершения
+ACTIVE_JOBS = Q(dispatched_at__isnull=False, status__in=['PENDING', 'RUNNING'])
+WAITING_JOBS = Q(dispatched_at__isnull=True, status='PENDING')
+DURATION_SAMPLE = 20
+EPOCH = datetime.min.replace(tzinfo=dt_timezone.utc)
+
+
+def fair_order(waiting, active_per_group, last_dispatch_per_group):
+    """
+    Порядок запуска ожидающих задач waiting = [(id, group_id, priority, created_at)].
+    Сначала приоритет; внутри него группы идут по кругу: k-я задача группы стоит в k-м
+    круге (с учётом уже запущенных задач группы), а в одном круге первой идёт группа,
+    которую обслуживали давнее всего. Одна группа с большим бэклогом не задерживает остальные.
+    """
+    taken = {}
+    keyed = []
+    for job_id, group_id, priority, created_at in sorted(waiting, key=lambda job: (job[2], job[3], job[0])):
+        turn = taken.get((group_id, priority), active_per_group.get(group_id, 0))
+        taken[(group_id, priority)] = turn + 1
+        keyed.append(((priority, turn, last_dispatch_per_group.get(group_id) or EPOCH, created_at, job_id), job_id))
+    return [job_id for _key, job_id in sorted(keyed)]
+
+
+def dispatch_order():
+    waiting = VideoJob.objects.filter(WAITING_JOBS).values_list('id', 'recording__group_id', 'priority', 'created_at')
+    active = dict(
+        VideoJob.objects.filter(ACTIVE_JOBS).values('recording__group_id')
+        .annotate(n=Count('id')).values_list('recording__group_id', 'n')
+    )
+    last_dispatch = dict(
+        VideoJob.objects.filter(dispatched_at__isnull=False).values('recording__group_id')
+        .annotate(last=Max('dispatched_at')).values_list('recording__group_id', 'last')
+    )
+    return fair_order(list(waiting), active, last_dispatch)
+
+
+def stale_filter(now=None):
+    """
+    Активные задачи без признаков жизни дольше PROCESSING_STALE_JOB_SECONDS: запущенные —
+    по heartbeat_at (у запущенных до его появления — по started_at), отправленные, но
+    не начатые — по dispatched_at. Воркер таких задач, скорее всего, убит и слот не освободит.
+    """
+    limit = settings.PROCESSING_STALE_JOB_SECONDS
+    if not limit:
+        return Q(pk__in=[])
+    cutoff = (now or timezone.now()) - timedelta(seconds=limit)
+    silent = Q(status='RUNNING', heartbeat_at__isnull=True)
+    return ACTIVE_JOBS & (
+        Q(status='RUNNING', heartbeat_at__lt=cutoff)
+        | silent & Q(started_at__lt=cutoff)
+        | silent & Q(started_at__isnull=True, dispatched_at__lt=cutoff)
+        | Q(status='PENDING', dispatched_at__lt=cutoff)
+    )
+
+
+def stale_jobs(now=None):
+    return VideoJob.objects.filter(stale_filter(now))
+
+
+def free_slots():
+    limit = settings.PROCESSING_MAX_ACTIVE_JOBS
+    if not limit:
+        return None
+    return max(0, limit - VideoJob.objects.filter(ACTIVE_JOBS).count())
+
+
+def average_duration():
+    """Средняя длительность последних успешных задач, секунды; None, если истории нет."""
+    recent = (VideoJob.objects.filter(status='SUCCESS', started_at__isnull=False, finished_at__isnull=False)
+              .order_by('-finished_at').values_list('started_at', 'finished_at')[:DURATION_SAMPLE])
+    durations = [(finished - started).total_seconds() for started, finished in recent]
+    return sum(durations) / len(durations) if durations else None
+
+
+class QueueSnapshot:
+    """Позиции ожидающих задач и оценка времени до готовности — один расчёт на запрос."""
+
+    def __init__(self):
+        self.positions = {job_id: i for i, job_id in enumerate(dispatch_order())}
+        self.duration = average_duration()
+        self.slots = settings.PROCESSING_MAX_ACTIVE_JOBS or len(self.positions) or 1
+
+    def position(self, job):
+        return self.positions.get(job.id)
+
+    def eta_seconds(self, job):
+        # Задачи стартуют волнами по числу слотов; перед задачей — position // slots волн
+        position = self.positions.get(job.id)
+        if position is None or self.duration is None:
+            return None
+        return round((position // self.slots + 1) * self.duration)
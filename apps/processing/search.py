@@ -0,0 +1,135 @@
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils.html import escape
+
+from .models import SearchEntry
+from .timestamps import parse_timestamp
+
+SEARCH_CONFIG = 'russian'
+# Пересказ размечен таймкодами в начале абзацев: «06:30 - 12:00: ...»
+LEADING_TIMESTAMP_RE = re.compile(r'^\W*(\d{1,3}:\d{2}(?::\d{2})?)')
+# ts_headline не экранирует текст, поэтому совпадения размечаются управляющими символами,
+# а <b> подставляется уже после экранирования, см. headline_html
+START_SEL = '\x02'
+STOP_SEL = '\x03'
+HEADLINE_OPTIONS = {'start_sel': START_SEL, 'stop_sel': STOP_SEL, 'min_words': 15, 'max_words': 35}
+
+
+def transcript_passages(transcript, passage_s):
+    """Отрывки транскрипта по ~passage_s секунд: [(start, text)]; без таймкодов — целиком."""
+    segments = transcript.segments()
+    if not segments:
+        return [(None, transcript.text)] if transcript.text else []
+    passages = []
+    words = []
+    start = None
+    for segment in segments:
+        if start is not None and segment['start'] - start >= passage_s and words:
+            passages.append((start, " ".join(words)))
+            words = []
+            start = None
+        if start is None:
+            start = segment['start']
+        if segment['text']:
+            words.append(segment['text'])
+    if words:
+        passages.append((start, " ".join(words)))
+    return passages
+
+
+def text_passages(text):
+    """Абзацы пересказа или конспекта: [(start, text)], start — таймкод в начале абзаца."""
+    passages = []
+    for paragraph in re.split(r'\n\s*\n', text or ''):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        match = LEADING_TIMESTAMP_RE.match(paragraph)
+        passages.append((parse_timestamp(match.group(1)) if match else None, paragraph))
+    return passages
+
+
+def index_job(job):
+    """Перестраивает поисковые записи задачи по её транскрипту, пересказу и конспекту."""
+    entries = []
+    sources = [
+        ('transcript', lambda result: transcript_passages(result, settings.SEARCH_PASSAGE_SECONDS)),
+        ('summary', lambda result: text_passages(result.text)),
+        ('notes', lambda result: text_passages(result.text)),
+    ]
+    for kind, passages in sources:
+        result = getattr(job, kind, None)
+        if result is None:
+            continue
+        for start, text in passages(result):
+            entries.append(SearchEntry(job=job, group_id=job.recording.group_id, kind=kind,
+                                       start=start, text=text))
+
+    with transaction.atomic():
+        SearchEntry.objects.filter(job=job).delete()
+        SearchEntry.objects.bulk_create(entries)
+        if connection.vendor == 'postgresql':
+            SearchEntry.objects.filter(job=job).update(search_vector=SearchVector('text', config=SEARCH_CONFIG))
+    return len(entries)
+
+
+def headline_html(marked):
+    """Фрагмент с разметкой START_SEL/STOP_SEL -> безопасный HTML с <b> вокруг совпадений."""
+    # Весь текст экранируется; маркеры, оказавшиеся в самой записи, дают лишь лишний <b>
+    parts = re.split(f'({START_SEL}|{STOP_SEL})', marked)
+    html = []
+    depth = 0
+    for part in parts:
+        if part == START_SEL:
+            depth += 1
+            html.append('<b>')
+        elif part == STOP_SEL and depth:
+            depth -= 1
+            html.append('</b>')
+        elif part != STOP_SEL:
+            html.append(escape(part))
+    html.extend('</b>' * depth)
+    return ''.join(html)
+
+
+def snippet(text, query, width=120):
+    text = text.replace(START_SEL, '').replace(STOP_SEL, '')
+    position = text.lower().find(query.lower())
+    if position < 0:
+        return escape(text[:width])
+    begin = max(0, position - width // 2)
+    end = position + len(query)
+    return headline_html(text[begin:position] + START_SEL + text[position:end] + STOP_SEL
+                         + text[end:begin + width])
+
+
+def search_entries(user, query, group_id=None, kind=None, limit=20):
+    """Записи из групп пользователя, подходящие под запрос, по убыванию релевантности."""
+    entries = SearchEntry.objects.filter(group__members=user).select_related('job')
+    if group_id is not None:
+        entries = entries.filter(group_id=group_id)
+    if kind:
+        entries = entries.filter(kind=kind)
+
+    if connection.vendor != 'postgresql':
+        # Без PostgreSQL (локальная разработка) — поиск подстроки без морфологии и ранжирования
+        found = list(entries.filter(text__icontains=query).order_by('job_id', 'id')[:limit])
+        for entry in found:
+            entry.rank = 0.0
+            entry.headline = snippet(entry.text, query)
+        return found
+
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+    found = list(
+        entries.filter(search_vector=search_query)
+        .annotate(rank=SearchRank(F('search_vector'), search_query),
+                  headline=SearchHeadline('text', search_query, config=SEARCH_CONFIG, **HEADLINE_OPTIONS))
+        .order_by('-rank', 'id')[:limit]
+    )
+    for entry in found:
+        entry.headline = headline_html(entry.headline)
+    return found
@@ -1,17 +1,50 @@
 from rest_framework import serializers
-from .models import VideoJob, Transcript, Summary, Notes
+from .models import VideoJob, Transcript, Summary, Notes, SearchEntry
+from .scheduling import QueueSnapshot
+from .timestamps import format_timestamp
 
 class VideoJobSerializer(serializers.ModelSerializer):
+    # место в очереди диспетчера (с 1) и оценка секунд до готовности; None, если задача уже запущена
+    queue_position = serializers.SerializerMethodField()
+    eta_seconds = serializers.SerializerMethodField()
+
     class Meta:
         model = VideoJob
         fields = '__all__'
-        read_only_fields = ['status', 'log', 'created_at', 'started_at', 'finished_at']
+        # приоритет выставляет сервер, см. VideoJobViewSet.create
+        read_only_fields = ['status', 'stage', 'log', 'pipeline_version', 'priority', 'dispatched_at',
+                            'created_at', 'started_at', 'finished_at']
+
+    def queue(self):
+        # Очередь считается один раз на ответ, в том числе для списка задач
+        if 'queue' not in self.context:
+            self.context['queue'] = QueueSnapshot()
+        return self.context['queue']
+
+    def get_queue_position(self, obj):
+        if obj.dispatched_at is not None or obj.status != 'PENDING':
+            return None
+        position = self.queue().position(obj)
+        return position + 1 if position is not None else None
+
+    def get_eta_seconds(self, obj):
+        if obj.dispatched_at is not None or obj.status != 'PENDING':
+            return None
+        return self.queue().eta_seconds(obj)
 
 class TranscriptSerializer(serializers.ModelSerializer):
+    # ?timestamps=compact — массивы вместо списка словарей, см. Transcript.compact_timestamps
+    timestamps = serializers.SerializerMethodField()
+
     class Meta:
         model = Transcript
         fields = ['text', 'timestamps']
 
+    def get_timestamps(self, obj):
+        if self.context.get('timestamps') == 'compact':
+            return obj.compact_timestamps()
+        return obj.legacy_timestamps()
+
 class SummarySerializer(serializers.ModelSerializer):
     class Meta:
         model = Summary
@@ -21,3 +54,16 @@ class NotesSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notes
         fields = ['text']
+
+class SearchResultSerializer(serializers.ModelSerializer):
+    recording = serializers.IntegerField(source='job.recording_id')
+    timestamp = serializers.SerializerMethodField()
+    headline = serializers.CharField()
+    rank = serializers.FloatField()
+
+    class Meta:
+        model = SearchEntry
+        fields = ['job', 'recording', 'kind', 'start', 'timestamp', 'headline', 'rank']
+
+    def get_timestamp(self, obj):
+        return format_timestamp(obj.start) if obj.start is not None else None
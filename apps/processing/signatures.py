@@ -0,0 +1,30 @@
+from importlib import import_module
+
+from celery import current_app
+
+# Лёгкие «подписи» задач для веб-процесса: отправка по имени через send_task,
+# без импорта apps.processing.tasks и его тяжёлых зависимостей (torch, transformers).
+# send_task не учитывает task_always_eager, поэтому в этом режиме (тесты, разработка
+# без брокера) задача импортируется и выполняется на месте.
+
+
+class TaskSignature:
+    def __init__(self, name):
+        self.name = name
+
+    def apply_async(self, args=None, kwargs=None, **options):
+        if current_app.conf.task_always_eager:
+            import_module(self.name.rsplit('.', 1)[0])
+            return current_app.tasks[self.name].apply_async(args, kwargs, **options)
+        return current_app.send_task(self.name, args=args, kwargs=kwargs, **options)
+
+    def delay(self, *args, **kwargs):
+        return self.apply_async(args, kwargs)
+
+    def __repr__(self):
+        return f"<TaskSignature {self.name}>"
+
+
+process_video_job = TaskSignature('apps.processing.tasks.process_video_job')
+dispatch_jobs = TaskSignature('apps.processing.tasks.dispatch_jobs')
+transcribe_session_segment = TaskSignature('apps.processing.tasks.transcribe_session_segment')
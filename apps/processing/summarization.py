@@ -0,0 +1,177 @@
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .timestamps import format_timestamp, parse_timestamp
+
+SENTENCE_END = ('.', '!', '?', '…')
+SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?…])\s+')
+MAP_MAX_TOKENS = 1500
+SUMMARY_MAX_TOKENS = 1500
+NOTES_MAX_TOKENS = 5000
+
+
+def summary_prompt(text):
+    return (
+        "Ты — ассистент, который помогает студентам. Прочитай лекцию ниже и сгенерируй краткий пересказ по таймкодам. "
+        "Формат: '00:00 - 06:30: краткий пересказ момента'. Если тайминги отсутствуют, раздели текст логически."
+        f"\n\n{text}"
+    )
+
+
+def notes_prompt(text):
+    return (
+        "Прочитай лекцию ниже и создай подробный текстовый конспект с сохранением структуры: формулы, определения, ключевые примеры и выводы. "
+        f"\n\n{text}"
+    )
+
+
+def map_prompt(chunk):
+    return (
+        f"Ниже фрагмент лекции ({chunk['start']} - {chunk['end']}), в квадратных скобках — таймкоды. "
+        "Составь подробный конспект фрагмента: определения, формулы, ключевые примеры и выводы. "
+        "Сохраняй таймкоды в формате MM:SS у соответствующих пунктов."
+        f"\n\n{chunk['text']}"
+    )
+
+
+def reduce_summary_prompt(partials_text):
+    return (
+        "Ты — ассистент, который помогает студентам. Ниже конспекты последовательных фрагментов одной лекции "
+        "с таймкодами. Сгенерируй краткий пересказ всей лекции по таймкодам. "
+        "Формат: '00:00 - 06:30: краткий пересказ момента'. Используй только таймкоды из текста."
+        f"\n\n{partials_text}"
+    )
+
+
+def reduce_notes_prompt(partials_text):
+    return (
+        "Ниже конспекты последовательных фрагментов одной лекции. Объедини их в единый подробный текстовый конспект "
+        "с сохранением структуры: формулы, определения, ключевые примеры и выводы. Убери повторы, сохрани таймкоды разделов."
+        f"\n\n{partials_text}"
+    )
+
+
+def estimate_tokens(text):
+    # Грубая оценка без токенизатора модели: для русского текста ~3 символа на токен
+    return math.ceil(len(text) / settings.LLM_CHARS_PER_TOKEN)
+
+
+def chunk_transcript(text, timestamps, max_tokens, marker_every_s=60):
+    """
+    Режет транскрипт на фрагменты не длиннее max_tokens по границам таймкодов.
+    После 80% бюджета фрагмент закрывается на ближайшем конце предложения.
+    В текст фрагмента вставляются метки [MM:SS] не реже раза в marker_every_s секунд,
+    чтобы модель могла сослаться на время. Без таймкодов режет по предложениям.
+    """
+    entries = []
+    for item in timestamps or []:
+        if not isinstance(item, dict) or not item.get('text'):
+            continue
+        start = parse_timestamp(item.get('start'))
+        end = parse_timestamp(item.get('end'))
+        entries.append((start, end if end is not None else start, item['text'].strip()))
+    if not entries:
+        entries = [(None, None, sentence) for sentence in SENTENCE_SPLIT_RE.split(text.strip()) if sentence]
+
+    chunks = []
+    parts = []
+    tokens = 0
+    chunk_start = chunk_end = None
+    last_marker = None
+
+    def close():
+        chunks.append({
+            'start': format_timestamp(chunk_start) if chunk_start is not None else None,
+            'end': format_timestamp(chunk_end) if chunk_end is not None else None,
+            'text': " ".join(parts),
+        })
+
+    for start, end, word in entries:
+        piece = word
+        if start is not None and (last_marker is None or start - last_marker >= marker_every_s):
+            piece = f"[{format_timestamp(start)}] {word}"
+            last_marker = start
+        piece_tokens = estimate_tokens(piece) + 1
+
+        if parts and tokens + piece_tokens > max_tokens:
+            close()
+            parts, tokens, chunk_start = [], 0, None
+            if start is not None:
+                piece = f"[{format_timestamp(start)}] {word}"
+                last_marker = start
+                piece_tokens = estimate_tokens(piece) + 1
+
+        if chunk_start is None:
+            chunk_start = start
+        chunk_end = end
+        parts.append(piece)
+        tokens += piece_tokens
+
+        if tokens >= 0.8 * max_tokens and word.endswith(SENTENCE_END):
+            close()
+            parts, tokens, chunk_start = [], 0, None
+            last_marker = None
+    if parts:
+        close()
+    return chunks
+
+
+def format_partials(partials):
+    return "\n\n".join(
+        f"[{p['start']} - {p['end']}]\n{p['text']}" if p['start'] is not None else p['text']
+        for p in partials
+    )
+
+
+def map_chunks(chunks, call, parallelism):
+    with ThreadPoolExecutor(max_workers=max(1, min(parallelism, len(chunks)))) as executor:
+        texts = list(executor.map(lambda chunk: call(map_prompt(chunk), max_tokens=MAP_MAX_TOKENS), chunks))
+    return [dict(chunk, text=text) for chunk, text in zip(chunks, texts)]
+
+
+def condense_partials(partials, call, max_tokens, parallelism):
+    # Если конспекты фрагментов сами не помещаются в контекст, сворачиваем их ещё раз уровнем выше
+    while len(partials) > 1 and estimate_tokens(format_partials(partials)) > max_tokens:
+        groups = []
+        group = []
+        for partial in partials:
+            if group and estimate_tokens(format_partials(group + [partial])) > max_tokens:
+                groups.append(group)
+                group = []
+            group.append(partial)
+        groups.append(group)
+        if len(groups) == len(partials):
+            # каждый конспект уже упирается в бюджет — дальше сворачивать нечего
+            break
+        merged = [{
+            'start': group[0]['start'],
+            'end': group[-1]['end'],
+            'text': format_partials(group),
+        } for group in groups]
+        partials = map_chunks(merged, call, parallelism)
+    return partials
+
+
+def build_llm_prompts(text, timestamps, call):
+    """
+    Возвращает промпты {'summary': (prompt, max_tokens), 'notes': (...)}. Короткий
+    транскрипт уходит целиком; длинный сначала режется на фрагменты, которые
+    конспектируются параллельно (map), а итоговые промпты собираются из их конспектов (reduce).
+    """
+    max_tokens = settings.LLM_CHUNK_TOKENS
+    if estimate_tokens(text) <= max_tokens:
+        return {
+            'summary': (summary_prompt(text), SUMMARY_MAX_TOKENS),
+            'notes': (notes_prompt(text), NOTES_MAX_TOKENS),
+        }
+
+    parallelism = settings.LLM_MAP_PARALLELISM
+    partials = map_chunks(chunk_transcript(text, timestamps, max_tokens), call, parallelism)
+    partials_text = format_partials(condense_partials(partials, call, max_tokens, parallelism))
+    return {
+        'summary': (reduce_summary_prompt(partials_text), SUMMARY_MAX_TOKENS),
+        'notes': (reduce_notes_prompt(partials_text), NOTES_MAX_TOKENS),
+    }
@@ -1,195 +1,552 @@
-import os
-import subprocess
 import traceback
 import json
-import torch
-from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from datetime import timedelta
+from pathlib import Path
 
-import requests
-from decouple import config
-from celery import shared_task
+from celery import chain, shared_task
+from celery.signals import worker_process_init
+from celery.worker.control import inspect_command
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
+from apps.recordings.uploadhandlers import file_content_hash
+from apps.recordingsessions.models import SessionSegment
+
+from .llm_cache import CacheStats, llm_cache
+from .llm_backends import get_llm_backend
+from .llm_client import get_llm_client
+from .checkpoints import (
+    completed_steps, load_checkpoint, pipeline_version, reset_from, resume_stage, save_checkpoint,
+)
+from .audio import SAMPLE_RATE, media_duration, read_pcm_pieces, stream_pcm_windows, write_pcm_pieces
+from .parallel import get_asr_pool, transcribe_parallel
+from .scheduling import ACTIVE_JOBS, WAITING_JOBS, dispatch_order, free_slots, stale_jobs
+from .search import index_job
+from .summarization import build_llm_prompts
+from .engines import ENGINES, get_engine
+from .events import ProgressReporter, publish_job_event
+from .timestamps import format_timestamp
+from .transcription import TranscriptionStats, format_throughput
+from .vad import VADStats, speech_windows
 from .models import VideoJob, Transcript, Summary, Notes
 
-# Константы
-OPENROUTER_API_KEY = config("OPENROUTER_API_KEY", default='')
-OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
-LLAMA_MODEL_ID = "meta-llama/llama-4-scout:free"
+logger = logging.getLogger(__name__)
 
-# Проверка наличия ключа
-if not OPENROUTER_API_KEY:
-    raise EnvironmentError("OPENROUTER_API_KEY is not set in environment.")
+SCRATCH_SUFFIXES = ('.pcm', '.json')
+SCRATCH_NAME_RE = re.compile(r'^job_(\d+)\.(pcm|json)$')
+# Недостача покрытия фрагментами сессии, после которой хвост записи распознаётся из полного файла
+SESSION_TAIL_TOLERANCE_S = 1.0
 
 
-def call_llama(prompt, max_tokens=1000):
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json"
-    }
+def call_llama(prompt, max_tokens=1000, use_cache=True, cache_stats=None):
+    # Одинаковый промпт при повторной обработке отдаётся из кеша, без запроса к API
+    backend = get_llm_backend()
+    return llm_cache.cached_call(
+        backend.model_id, prompt, {'max_tokens': max_tokens},
+        lambda: backend.complete(prompt, max_tokens=max_tokens),
+        use_cache=use_cache, stats=cache_stats,
+    )
 
-    payload = {
-        "model": LLAMA_MODEL_ID,
-        "messages": [{"role": "user", "content": prompt}],
-        "max_tokens": max_tokens
-    }
 
-    response = requests.post(OPENROUTER_API_URL, headers=headers, data=json.dumps(payload))
-    if response.status_code == 200:
-        data = response.json()
-        return data["choices"][0]["message"]["content"]
-    else:
-        raise Exception(f"LLaMA request failed with status {response.status_code}: {response.text}")
-
-
-def format_timestamp(seconds: float) -> str:
-    mins, secs = divmod(int(seconds), 60)
-    return f"{mins:02}:{secs:02}"
-
-# DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
-# TORCH_DTYPE = torch.float16 if torch.cuda.is_available() else torch.float32
-
-# MODEL_ID = "openai/whisper-large-v3-turbo"
-
-# try:
-#     whisper_model = AutoModelForSpeechSeq2Seq.from_pretrained(
-#         MODEL_ID,
-#         torch_dtype=TORCH_DTYPE,
-#         low_cpu_mem_usage=True,
-#         use_safetensors=True,
-#         attn_implementation="eager",
-#     ).to(DEVICE)
-#     whisper_processor = AutoProcessor.from_pretrained(MODEL_ID)
-#     whisper_pipe = pipeline(
-#         "automatic-speech-recognition",
-#         model=whisper_model,
-#         tokenizer=whisper_processor.tokenizer,
-#         feature_extractor=whisper_processor.feature_extractor,
-#         torch_dtype=TORCH_DTYPE,
-#         device=DEVICE,
-#         chunk_length_s=30,
-#         batch_size=1
-#     )
-# except Exception as e:
-#     print("Ошибка при загрузке Whisper-модели:", e)
-#     whisper_pipe = None
+def append_log(job, message):
+    job.log = f"{job.log}\n{message}" if job.log else message
 
-@shared_task(bind=True)
-def process_video_job(self, job_id):
-    job = VideoJob.objects.get(id=job_id)
-    job.status = 'RUNNING'
-    job.started_at = timezone.now()
-    job.save()
-    DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
-    TORCH_DTYPE = torch.float16 if torch.cuda.is_available() else torch.float32
 
-    MODEL_ID = "openai/whisper-large-v3-turbo"
-
-    try:
-        whisper_model = AutoModelForSpeechSeq2Seq.from_pretrained(
-            MODEL_ID,
-            torch_dtype=TORCH_DTYPE,
-            low_cpu_mem_usage=True,
-            use_safetensors=True,
-            attn_implementation="eager",
-        ).to(DEVICE)
-        whisper_processor = AutoProcessor.from_pretrained(MODEL_ID)
-        whisper_pipe = pipeline(
-            "automatic-speech-recognition",
-            model=whisper_model,
-            tokenizer=whisper_processor.tokenizer,
-            feature_extractor=whisper_processor.feature_extractor,
-            torch_dtype=TORCH_DTYPE,
-            device=DEVICE,
-            chunk_length_s=30,
-            batch_size=1
-        )
-    except Exception as e:
-        print("Ошибка при загрузке Whisper-модели:", e)
-        whisper_pipe = None
+def index_for_search(job):
+    # Индекс обновляется при завершении задачи; его сбой не должен ронять готовый результат
     try:
-        recording = job.recording
-        input_path = recording.video_file.path
-
-        # Извлечение аудио
-        audio_path = input_path.rsplit('.', 1)[0] + '.wav'
-        subprocess.run([
-            'ffmpeg', '-i', input_path, '-vn',
-            '-acodec', 'pcm_s16le', '-ar', '16000', '-ac', '1', audio_path
-        ], check=True)
-
-        # Транскрипция через Whisper
-        text = ""
-        timestamps = []
-        if whisper_pipe is None:
-            raise RuntimeError("Whisper-пайплайн не загружен")
-        generate_kwargs = {
-            "language": "russian",
-            "task": "transcribe",
+        append_log(job, f"Поиск: проиндексировано отрывков: {index_job(job)}")
+    except Exception:
+        logger.exception("Не удалось обновить поисковый индекс задачи %s", job.id)
+        append_log(job, "Поиск: не удалось обновить индекс")
+
+
+def call_llama_concurrently(prompts, call=None):
+    """
+    prompts: {name: (prompt, max_tokens)}. Запросы идут одновременно, ошибки
+    собираются по каждому отдельно: возвращает (results, errors) по тем же именам.
+    """
+    call = call or call_llama
+    with ThreadPoolExecutor(max_workers=len(prompts)) as executor:
+        futures = {
+            name: executor.submit(call, prompt, max_tokens=max_tokens)
+            for name, (prompt, max_tokens) in prompts.items()
         }
+    results = {}
+    errors = {}
+    for name, future in futures.items():
         try:
-            result = whisper_pipe(audio_path, return_timestamps="word", generate_kwargs=generate_kwargs)
-            text = result.get("text", "")
-            raw_chunks = result.get("chunks", [])
-        except RuntimeError as e:
-            print("Word-level timestamps failed, fallback to sentence-level:", e)
-            result = whisper_pipe(audio_path, return_timestamps=True, generate_kwargs=generate_kwargs)
-            text = result.get("text", "")
-            raw_chunks = result.get("chunks", [])
-        for c in raw_chunks or []:
-            start = None
-            end = None
-            if isinstance(c, dict):
-                if "start" in c and "end" in c:
-                    start = c.get("start")
-                    end = c.get("end")
-                elif "timestamp" in c:
-                    ts = c.get("timestamp")
-                    if isinstance(ts, (list, tuple)) and len(ts) >= 1:
-                        start = ts[0]
-                        if len(ts) >= 2:
-                            end = ts[1]
-            if start is not None:
-                ts_dict = {
-                    "start": format_timestamp(start),
-                    "end": format_timestamp(end) if end is not None else None,
-                    "text": c.get("text", "").strip()
-                }
-                timestamps.append(ts_dict)
-
-        Transcript.objects.create(job=job, text=text, timestamps=timestamps)
-
-        # Генерация краткого пересказа
-        summary_prompt = (
-            "Ты — ассистент, который помогает студентам. Прочитай лекцию ниже и сгенерируй краткий пересказ по таймкодам. "
-            "Формат: '00:00 - 06:30: краткий пересказ момента'. Если тайминги отсутствуют, раздели текст логически."
-            f"\n\n{text}"
-        )
-        try:
-            summary_text = call_llama(summary_prompt, max_tokens=1500)
+            results[name] = future.result()
         except Exception as e:
-            raise Exception(f"Ошибка генерации краткого пересказа: {e}")
+            errors[name] = e
+    return results, errors
+
+
+def scratch_path(job_id, suffix):
+    # Общее для пулов воркеров хранилище промежуточного аудио между стадиями
+    root = Path(settings.PROCESSING_SCRATCH_ROOT)
+    root.mkdir(parents=True, exist_ok=True)
+    return root / f"job_{job_id}{suffix}"
+
+
+def remove_scratch(job_id):
+    for suffix in SCRATCH_SUFFIXES:
+        scratch_path(job_id, suffix).unlink(missing_ok=True)
 
-        Summary.objects.create(job=job, text=summary_text)
 
-        # Генерация конспекта
-        notes_prompt = (
-            "Прочитай лекцию ниже и создай подробный текстовый конспект с сохранением структуры: формулы, определения, ключевые примеры и выводы. "
-            f"\n\n{text}"
+def extract_speech(job, input_path):
+    # Аудио читается из пайпа ffmpeg окнами; VAD отбрасывает тишину, сохраняя
+    # смещения фрагментов на таймлайне. На диск попадает только речь в s16le.
+    parallel = settings.ASR_PARALLEL_WORKERS > 1
+    windows = stream_pcm_windows(input_path, settings.ASR_WINDOW_SECONDS)
+    vad_stats = VADStats()
+    if settings.ASR_VAD_ENABLED or parallel:
+        # в параллельном режиме по паузам VAD запись режется на сегменты
+        windows = speech_windows(windows, stats=vad_stats, min_silence_s=settings.ASR_VAD_MIN_SILENCE_S)
+
+    index = write_pcm_pieces(windows, scratch_path(job.id, '.pcm'))
+    with open(scratch_path(job.id, '.json'), 'w') as f:
+        json.dump(index, f)
+
+    if settings.ASR_VAD_ENABLED or parallel:
+        logger.info("Job %s: %s", job.id, vad_stats)
+        append_log(job, str(vad_stats))
+
+
+def transcribe_speech(job):
+    pcm_path = scratch_path(job.id, '.pcm')
+    index_path = scratch_path(job.id, '.json')
+    with open(index_path) as f:
+        index = json.load(f)
+    progress = ProgressReporter(job, sum(count for _offset, _start, count in index))
+    pieces = progress.track(read_pcm_pieces(pcm_path, index))
+
+    engine = get_engine(job.asr_engine)
+    stats = TranscriptionStats()
+    asr_started = time.monotonic()
+    if settings.ASR_PARALLEL_WORKERS > 1:
+        batch_size = max(1, engine.batch_size() // settings.ASR_PARALLEL_WORKERS)
+        text, timestamps, audio_seconds = transcribe_parallel(
+            pieces, get_asr_pool(), settings.ASR_PARALLEL_SEGMENT_SECONDS,
+            batch_size=batch_size, engine_name=engine.name, stats=stats
         )
-        try:
-            notes_text = call_llama(notes_prompt, max_tokens=5000)
-        except Exception as e:
-            raise Exception(f"Ошибка генерации конспекта: {e}")
+    else:
+        batch_size = engine.batch_size()
+        text, timestamps, audio_seconds = engine.transcribe_stream(pieces, batch_size=batch_size, stats=stats)
 
-        Notes.objects.create(job=job, text=notes_text)
+    throughput = format_throughput(audio_seconds, time.monotonic() - asr_started, batch_size)
+    logger.info("Job %s: %s; %s", job.id, throughput, stats)
+    append_log(job, throughput)
+    append_log(job, str(stats))
+
+    remove_scratch(job.id)
+    return text, timestamps
+
+
+def transcribe_in_memory(windows, engine_name, shift_s=0):
+    """
+    Распознаёт короткое аудио целиком в памяти, без промежуточного файла: (text, таймкоды
+    со сдвигом shift_s, длительность аудио до VAD в секундах).
+    """
+    end = [0.0]
+
+    def measured(windows):
+        for offset, samples in windows:
+            end[0] = max(end[0], offset + len(samples) / SAMPLE_RATE)
+            yield offset, samples
+
+    windows = measured(windows)
+    if settings.ASR_VAD_ENABLED:
+        windows = speech_windows(windows, min_silence_s=settings.ASR_VAD_MIN_SILENCE_S)
+    pieces = ((shift_s + offset, samples) for offset, samples in windows)
+    engine = get_engine(engine_name)
+    text, timestamps, _audio_seconds = engine.transcribe_stream(pieces, batch_size=engine.batch_size())
+    return text, timestamps, end[0]
+
+
+def transcribe_session_segment_media(segment):
+    """
+    Распознаёт фрагмент живой сессии: фрагменты короткие, промежуточный файл не нужен.
+    Таймкоды сдвигаются на смещение фрагмента от начала записи.
+    """
+    windows = stream_pcm_windows(segment.media.path, settings.ASR_WINDOW_SECONDS)
+    session = segment.session
+    return transcribe_in_memory(windows, session.asr_engine or session.group.asr_engine,
+                                shift_s=segment.offset_seconds)
+
+
+def transcribe_session_tail(job, covered_s):
+    """
+    Хвост записи после последнего фрагмента сессии (бот не прислал конец): распознаётся
+    из полного файла начиная с covered_s. None, если фрагменты покрывают запись целиком.
+    """
+    path = job.recording.video_file.path
+    duration = media_duration(path)
+    # без длительности в контейнере хвост всё равно читается: ffmpeg за концом файла отдаст пустоту
+    if duration is not None and duration - covered_s <= SESSION_TAIL_TOLERANCE_S:
+        return None
+    windows = stream_pcm_windows(path, settings.ASR_WINDOW_SECONDS, start_s=covered_s)
+    text, timestamps, _end = transcribe_in_memory(windows, job.asr_engine)
+    return text, timestamps
 
-        job.status = 'SUCCESS'
 
+def transcribe_segment(segment):
+    try:
+        segment.text, segment.timestamps, segment.duration_seconds = transcribe_session_segment_media(segment)
+    except Exception as e:
+        logger.exception("Не удалось распознать %s", segment)
+        segment.status = 'FAILED'
+        segment.error = str(e)
+        segment.save(update_fields=['status', 'error'])
+        return False
+    segment.status = 'SUCCESS'
+    segment.error = ''
+    segment.transcribed_at = timezone.now()
+    # Медиа фрагмента больше не нужно: полная запись придёт отдельно
+    segment.media.delete(save=False)
+    segment.save(update_fields=['text', 'timestamps', 'duration_seconds', 'status', 'error', 'transcribed_at',
+                                'media'])
+    return True
+
+
+@contextmanager
+def job_stage(job_id, stage):
+    """
+    Выполняет стадию задачи: выставляет VideoJob.stage, а при ошибке помечает задачу
+    FAILED. Исключение не пробрасывается — следующие стадии цепочки видят FAILED и
+    ничего не делают.
+    """
+    job = VideoJob.objects.select_related('recording').get(id=job_id)
+    if job.status != 'RUNNING':
+        yield None
+        return
+    job.stage = stage
+    job.heartbeat_at = timezone.now()
+    job.save(update_fields=['stage', 'heartbeat_at'])
+    publish_job_event(job, 'stage')
+    try:
+        yield job
     except Exception as e:
         job.status = 'FAILED'
-        job.log = f"{str(e)}\n{traceback.format_exc()}"
+        append_log(job, f"{str(e)}\n{traceback.format_exc()}")
+        job.finished_at = timezone.now()
+    if not VideoJob.objects.filter(id=job.id, status='RUNNING').exists():
+        # Пока стадия шла, задачу сняли как потерянную или перезапустили — результат не записывается
+        logger.warning("Задача %s больше не RUNNING, стадия %s не сохраняется", job.id, stage)
+        return
+    job.heartbeat_at = timezone.now()
+    job.save()
+    if job.status == 'SUCCESS':
+        remove_scratch(job.id)
+    if job.status != 'RUNNING':
+        publish_job_event(job, 'done' if job.status == 'SUCCESS' else 'failed')
+        # освободился слот — следующая задача из очереди
+        dispatch_jobs.delay()
+
+
+@worker_process_init.connect
+def preload_asr_model(**kwargs):
+    # Модель грузится при старте процесса воркера, а не в первой задаче
+    if not settings.ASR_PRELOAD:
+        return
+    try:
+        if settings.ASR_PARALLEL_WORKERS > 1:
+            get_asr_pool()
+        else:
+            get_engine().warmup()
+    except Exception:
+        logger.exception("Не удалось предзагрузить ASR-модель")
+
+
+@inspect_command()
+def asr_status(state):
+    # celery -A config inspect asr_status: состояние моделей всех движков процесса
+    return {name: engine.status() for name, engine in ENGINES.items()}
 
-    finally:
+
+@inspect_command()
+def llm_cache_status(state):
+    # celery -A config inspect llm_cache_status
+    return llm_cache.status()
+
+
+@inspect_command()
+def llm_client_status(state):
+    # celery -A config inspect llm_client_status: гистограмма задержек и повторы
+    return get_llm_client().status()
+
+
+def resolve_asr_engine(job):
+    # Движок задачи важнее движка сессии записи, тот — движка группы, тот — настройки по умолчанию
+    session = job.recording.session
+    return (job.asr_engine or (session.asr_engine if session else '')
+            or job.recording.group.asr_engine or settings.ASR_ENGINE)
+
+
+def ensure_content_hash(recording):
+    # Для записей, загруженных до появления хеша, он считается один раз при первой обработке
+    if not recording.content_hash and recording.video_file:
+        try:
+            with recording.video_file.open('rb') as f:
+                recording.content_hash = file_content_hash(f)
+        except OSError:
+            # файла нет — стадия extract упадёт с понятной ошибкой
+            logger.warning("Не удалось посчитать хеш записи %s", recording.id, exc_info=True)
+            return ''
+        recording.save(update_fields=['content_hash'])
+    return recording.content_hash
+
+
+def find_reusable_job(job):
+    content_hash = ensure_content_hash(job.recording)
+    if not content_hash:
+        return None
+    return (
+        VideoJob.objects
+        .filter(status='SUCCESS', pipeline_version=job.pipeline_version,
+                recording__content_hash=content_hash,
+                transcript__isnull=False, summary__isnull=False, notes__isnull=False)
+        .exclude(id=job.id)
+        .select_related('transcript', 'summary', 'notes')
+        .order_by('-finished_at')
+        .first()
+    )
+
+
+def clone_results(source, job):
+    transcript = source.transcript
+    Transcript.objects.create(job=job, text=transcript.text, timestamps=transcript.timestamps,
+                              starts=transcript.starts, ends=transcript.ends, spans=transcript.spans,
+                              unaligned_words=transcript.unaligned_words)
+    Summary.objects.create(job=job, text=source.summary.text)
+    Notes.objects.create(job=job, text=source.notes.text)
+
+
+def expire_stale_jobs(now):
+    expired = []
+    for job in stale_jobs(now).select_related('recording'):
+        job.status = 'FAILED'
+        job.finished_at = now
+        append_log(job, f"Задача не подавала признаков жизни {settings.PROCESSING_STALE_JOB_SECONDS} с "
+                        f"(воркер убит или перезапущен) и снята; её можно продолжить через resume")
+        job.save(update_fields=['status', 'log', 'finished_at'])
+        expired.append(job)
+    return expired
+
+
+@shared_task
+def dispatch_jobs():
+    """
+    Снимает потерянные задачи и отправляет в Celery ожидающие, пока есть свободные слоты
+    PROCESSING_MAX_ACTIVE_JOBS: по приоритету, а внутри приоритета — по кругу между группами.
+    """
+    dispatched = []
+    with transaction.atomic():
+        # Блокировка активных и ожидающих задач: параллельные диспетчеры идут по очереди
+        list(VideoJob.objects.select_for_update().filter(ACTIVE_JOBS | WAITING_JOBS).values_list('id', flat=True))
+        now = timezone.now()
+        expired = expire_stale_jobs(now)
+        if expired:
+            logger.warning("Диспетчер: сняты потерянные задачи %s", [job.id for job in expired])
+            transaction.on_commit(lambda: [publish_job_event(job, 'failed') for job in expired])
+        slots = free_slots()
+        order = dispatch_order()
+        for job_id in order[:slots]:
+            if VideoJob.objects.filter(WAITING_JOBS, id=job_id).update(dispatched_at=now):
+                dispatched.append(job_id)
+        transaction.on_commit(lambda: [process_video_job.delay(job_id) for job_id in dispatched])
+    if dispatched:
+        logger.info("Диспетчер: запущены задачи %s, в очереди %s", dispatched, len(order) - len(dispatched))
+    return dispatched
+
+
+@shared_task
+def cleanup_scratch():
+    """
+    Удаляет промежуточное аудио задач, которым оно уже не понадобится: успешных, удалённых
+    и упавших раньше PROCESSING_SCRATCH_TTL_SECONDS (их resume начнётся со стадии extract).
+    """
+    root = Path(settings.PROCESSING_SCRATCH_ROOT)
+    if not root.is_dir():
+        return 0
+    files = {}
+    for path in root.iterdir():
+        match = SCRATCH_NAME_RE.match(path.name)
+        if match:
+            files.setdefault(int(match.group(1)), []).append(path)
+    cutoff = timezone.now() - timedelta(seconds=settings.PROCESSING_SCRATCH_TTL_SECONDS)
+    keep = set(
+        VideoJob.objects.filter(id__in=files)
+        .exclude(status='SUCCESS').exclude(status='FAILED', finished_at__lt=cutoff)
+        .values_list('id', flat=True)
+    )
+    removed = 0
+    for job_id, paths in files.items():
+        if job_id in keep:
+            continue
+        for path in paths:
+            path.unlink(missing_ok=True)
+            removed += 1
+    if removed:
+        logger.info("Удалено промежуточных файлов: %s", removed)
+    return removed
+
+
+@shared_task(bind=True)
+def process_video_job(self, job_id):
+    # Точка входа: задача запускает цепочку стадий, каждая идёт в свою очередь
+    # Запускает только тот, кто перевёл задачу из PENDING: повторно доставленное сообщение
+    # (воркер упал до ack, диспетчер отправил дважды) не перезапускает идущую задачу
+    now = timezone.now()
+    claimed = VideoJob.objects.filter(id=job_id, status='PENDING').update(
+        status='RUNNING', stage='queued', started_at=now, heartbeat_at=now, finished_at=None,
+        # задача, отправленная в обход диспетчера, тоже занимает слот
+        dispatched_at=Coalesce('dispatched_at', Value(now)),
+    )
+    if not claimed:
+        logger.warning("Задача %s уже не PENDING, повторное сообщение пропущено", job_id)
+        return
+    job = VideoJob.objects.select_related('recording').get(id=job_id)
+    job.asr_engine = resolve_asr_engine(job)
+    job.pipeline_version = pipeline_version(job.asr_engine)
+    job.save(update_fields=['asr_engine', 'pipeline_version'])
+    publish_job_event(job, 'stage')
+
+    session = job.recording.session
+    # Запись уже транскрибировалась по ходу сессии: осталось добрать хвост и LLM
+    # (фрагменты годятся, только если распознаны тем же движком, что выбран для задачи)
+    from_session = (session is not None and session.segments_contiguous()
+                    and session.asr_engine in ('', job.asr_engine))
+    stages = ['transcribe', 'summarize'] if from_session else ['extract', 'transcribe', 'summarize']
+    tasks = {
+        'extract': extract_audio,
+        'transcribe': assemble_session_transcript if from_session else transcribe_audio,
+        'summarize': generate_summary_and_notes,
+    }
+    # Перезапуск упавшей задачи продолжается с первой стадии без чекпоинта текущей версии
+    stage = resume_stage(job, stages, scratch_path(job.id, '.pcm').exists()) or stages[-1]
+    reset_from(job, stage)
+    if stage != stages[0]:
+        append_log(job, f"Продолжение со стадии {stage}: результаты предыдущих стадий взяты из чекпоинтов")
+        job.save(update_fields=['log'])
+        return chain(*[tasks[name].si(job_id) for name in stages[stages.index(stage):]]).apply_async()
+
+    # Тот же файл уже обработан той же версией конвейера — копируем результаты
+    source = find_reusable_job(job)
+    if source is not None:
+        clone_results(source, job)
+        append_log(job, f"Результаты скопированы из задачи #{source.id} (совпадает содержимое файла)")
+        index_for_search(job)
+        job.status = 'SUCCESS'
+        job.stage = 'done'
         job.finished_at = timezone.now()
         job.save()
+        remove_scratch(job.id)
+        publish_job_event(job, 'done')
+        dispatch_jobs.delay()
+        return None
+
+    return chain(*[tasks[name].si(job_id) for name in stages]).apply_async()
+
+
+@shared_task(bind=True)
+def extract_audio(self, job_id):
+    with job_stage(job_id, 'extract') as job:
+        if job is not None:
+            extract_speech(job, job.recording.video_file.path)
+            save_checkpoint(job, 'extract')
+
+
+@shared_task(bind=True)
+def transcribe_audio(self, job_id):
+    with job_stage(job_id, 'transcribe') as job:
+        if job is not None:
+            text, timestamps = transcribe_speech(job)
+            Transcript.objects.create(job=job, **Transcript.columns(text, timestamps))
+            save_checkpoint(job, 'transcribe')
+
+
+@shared_task(bind=True)
+def transcribe_session_segment(self, segment_id):
+    segment = SessionSegment.objects.get(id=segment_id)
+    if segment.status != 'SUCCESS':
+        transcribe_segment(segment)
+
+
+@shared_task(bind=True)
+def assemble_session_transcript(self, job_id):
+    with job_stage(job_id, 'transcribe') as job:
+        if job is None:
+            return
+        session = job.recording.session
+        # Хвост сессии и фрагменты, упавшие при живом распознавании, распознаются здесь
+        late = [segment for segment in session.segments.all() if segment.status != 'SUCCESS']
+        for segment in late:
+            if not transcribe_segment(segment):
+                raise Exception(f"Ошибка распознавания фрагмента {segment.index}: {segment.error}")
+        text, timestamps, _pending = session.live_transcript()
+        append_log(job, f"Транскрипт собран из {session.segments.count()} фрагментов сессии, "
+                        f"распознано при сборке: {len(late)}")
+        covered = session.covered_seconds()
+        tail = transcribe_session_tail(job, covered)
+        if tail is not None:
+            tail_text, tail_timestamps = tail
+            text = " ".join(part for part in (text, tail_text) if part)
+            timestamps = timestamps + tail_timestamps
+            append_log(job, f"Фрагменты сессии обрываются на {format_timestamp(covered)}: "
+                            f"хвост распознан из полного файла")
+        Transcript.objects.create(job=job, **Transcript.columns(text, timestamps))
+        save_checkpoint(job, 'transcribe')
+
+
+@shared_task(bind=True)
+def generate_summary_and_notes(self, job_id):
+    with job_stage(job_id, 'summarize') as job:
+        if job is None:
+            return
+        # Пересказ и конспект зависят только от транскрипта и запрашиваются параллельно;
+        # длинный транскрипт предварительно сворачивается map-reduce по фрагментам
+        # При продолжении после сбоя промпты и уже готовые результаты берутся из чекпоинтов
+        # Попадания в кеш считаются по вызовам этой задачи: общие счётчики процесса
+        # растут и от задач, параллельно идущих в других потоках
+        cache_stats = CacheStats()
+        call = partial(call_llama, cache_stats=cache_stats)
+        prompts = load_checkpoint(job, 'prompts')
+        if prompts is None:
+            prompts = build_llm_prompts(job.transcript.text, job.transcript.segments(), call)
+            save_checkpoint(job, 'prompts', prompts)
+        done = completed_steps(job)
+        pending = {name: prompt for name, prompt in prompts.items() if name not in done}
+        results, errors = call_llama_concurrently(pending, call) if pending else ({}, {})
+        if llm_cache.enabled:
+            append_log(job, f"LLM-кеш: попаданий {cache_stats.hits}, промахов {cache_stats.misses}")
+
+        # Успешный результат сохраняется, даже если второй запрос упал
+        if 'summary' in results:
+            Summary.objects.create(job=job, text=results['summary'])
+            save_checkpoint(job, 'summary')
+        if 'notes' in results:
+            Notes.objects.create(job=job, text=results['notes'])
+            save_checkpoint(job, 'notes')
+
+        if errors:
+            messages = []
+            if 'summary' in errors:
+                messages.append(f"Ошибка генерации краткого пересказа: {errors['summary']}")
+            if 'notes' in errors:
+                messages.append(f"Ошибка генерации конспекта: {errors['notes']}")
+            raise Exception("\n".join(messages))
+
+        job.status = 'SUCCESS'
+        job.stage = 'done'
+        job.finished_at = timezone.now()
+        index_for_search(job)
@@ -5,13 +5,53 @@ from django.contrib.auth import get_user_model
 from django.utils import timezone
 from rest_framework_simplejwt.tokens import RefreshToken
 from apps.recordings.models import Recording
+from apps.recordingsessions.models import RecordingSession, SessionSegment
+from django.core.files.uploadedfile import SimpleUploadedFile
 from apps.groups.models import Group
-from apps.processing.models import VideoJob, Transcript, Summary, Notes
-from apps.processing.tasks import process_video_job
-from unittest.mock import patch
+from apps.processing.models import VideoJob, Transcript, Summary, Notes, LLMCacheEntry
+from apps.processing.tasks import call_llama, dispatch_jobs, process_video_job
+from apps.processing.llm_cache import llm_cache
+from apps.processing.llm_backends import OpenAICompatibleBackend, OpenRouterBackend, get_llm_backend
+from apps.processing.llm_standin import start_standin_server
+from apps.processing.llm_client import LLMClient, LLMRequestError, LatencyHistogram, LocalTokenBucket
+from apps.processing.transcription import TranscriptionStats, transcribe_stream
+from apps.processing.parallel import plan_segments, transcribe_parallel
+from apps.processing.vad import VADStats, detect_speech, speech_windows
+from apps.processing.scheduling import fair_order
+from apps.processing import events
+from apps.processing.events import InMemoryEventBackend, ProgressReporter, publish_job_event
+from apps.processing.search import index_job, text_passages, transcript_passages
+from apps.processing.serializers import VideoJobSerializer
+from apps.processing.summarization import build_llm_prompts, chunk_transcript, estimate_tokens
+from apps.processing.engines import NemoCTCEngine, get_engine, nemo_result
+from apps.processing.asr import ASRModelRegistry, auto_batch_size, resolve_dtype
+from apps.processing.benchmark import load_corpus, normalize_text
+from apps.processing.audio import stream_pcm_windows
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from config.celery import app as celery_app
+from unittest import skipUnless
+from unittest.mock import MagicMock, patch
+from multiprocessing.pool import ThreadPool
+from datetime import timedelta
+import asyncio
+import io
+import json
+import sys
+import tempfile
+import threading
+import numpy as np
 
 User = get_user_model()
 
+
+def tone(seconds, amplitude=0.5):
+    return (amplitude * np.sin(np.arange(int(16000 * seconds)) * 0.3)).astype(np.float32)
+
+
+def silence(seconds):
+    return np.zeros(int(16000 * seconds), dtype=np.float32)
+
 class VideoJobTests(APITestCase):
     def setUp(self):
         # пользователи
@@ -38,6 +78,15 @@ class VideoJobTests(APITestCase):
         self.token_member = token_for(self.member)
         self.token_other = token_for(self.other)
 
+        # цепочка стадий выполняется синхронно, промежуточное аудио — во временном каталоге
+        self.addCleanup(setattr, celery_app.conf, 'task_always_eager', celery_app.conf.task_always_eager)
+        celery_app.conf.task_always_eager = True
+        scratch = tempfile.TemporaryDirectory()
+        self.addCleanup(scratch.cleanup)
+        scratch_settings = override_settings(PROCESSING_SCRATCH_ROOT=scratch.name)
+        scratch_settings.enable()
+        self.addCleanup(scratch_settings.disable)
+
     def auth(self, token):
         self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
 
@@ -49,6 +98,19 @@ class VideoJobTests(APITestCase):
         self.assertEqual(job.recording, self.recording)
         self.assertEqual(job.status, 'PENDING')
 
+    def test_rerun_is_interactive_priority(self):
+        self.auth(self.token_member)
+        first = self.client.post(self.list_url, {'recording': self.recording.id})
+        rerun = self.client.post(self.list_url, {'recording': self.recording.id})
+        backlog = self.client.post(self.list_url,
+                                   {'recording': self.recording.id, 'priority': VideoJob.PRIORITY_BACKLOG})
+        self.assertEqual([r.data['priority'] for r in (first, rerun, backlog)],
+                         [VideoJob.PRIORITY_UPLOAD, VideoJob.PRIORITY_INTERACTIVE, VideoJob.PRIORITY_BACKLOG])
+        # вне очереди пользователь встать не может
+        jump = self.client.post(self.list_url,
+                                {'recording': self.recording.id, 'priority': VideoJob.PRIORITY_INTERACTIVE})
+        self.assertEqual(jump.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_create_job_unauthorized(self):
         self.auth(self.token_other)
         resp = self.client.post(self.list_url, {'recording': self.recording.id})
@@ -106,22 +168,117 @@ class VideoJobTests(APITestCase):
             for k,v in expected.items():
                 self.assertEqual(resp.data[k], v)
 
-    @patch('apps.processing.tasks.subprocess.run', lambda *args, **kwargs: None)
-    @patch('apps.processing.tasks.EncDecCTCModelBPE')
-    def test_process_video_job_task_success(self, MockModel):
-        # подменим модель и subprocess чтобы не запускать внешние зависимости
+    def test_transcript_timestamps_legacy_and_compact(self):
+        job = VideoJob.objects.create(recording=self.recording)
+        Transcript.objects.create(job=job, **Transcript.columns('привет мир', [
+            {'start': 61.25, 'end': 61.5, 'text': 'привет'},
+            {'start': 62.0, 'end': None, 'text': 'мир'},
+        ]))
+        url = reverse('videojob-transcript', args=[job.id])
+        self.auth(self.token_member)
+
+        resp = self.client.get(url)
+        self.assertEqual(resp.data['timestamps'], [
+            {'start': '01:01', 'end': '01:01', 'text': 'привет'},
+            {'start': '01:02', 'end': None, 'text': 'мир'},
+        ])
+
+        resp = self.client.get(url, {'timestamps': 'compact'})
+        self.assertEqual(resp.data['timestamps'], {
+            'start': [61.25, 62.0], 'end': [61.5, None], 'offset': [0, 7], 'length': [6, 3], 'unaligned': {},
+        })
+
+    def test_transcript_range_with_cursor(self):
         job = VideoJob.objects.create(recording=self.recording)
-        class DummyModel:
-            @staticmethod
-            def restore_from(p): return DummyModel()
-            def transcribe(self, lst): return ["hello world"]
-        MockModel.restore_from = DummyModel.restore_from
+        words = [{'start': float(i), 'end': i + 0.5, 'text': f'w{i}'} for i in range(100)]
+        Transcript.objects.create(job=job, **Transcript.columns(" ".join(w['text'] for w in words), words))
+        url = reverse('videojob-transcript-range', args=[job.id])
+        self.auth(self.token_member)
+
+        resp = self.client.get(url, {'from': 10, 'to': 20, 'limit': 6})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual([w['text'] for w in resp.data['segments']], [f'w{i}' for i in range(10, 16)])
+        self.assertEqual(resp.data['segments'][0], {'index': 10, 'start': 10.0, 'end': 10.5, 'text': 'w10'})
+
+        resp = self.client.get(url, {'from': 10, 'to': 20, 'limit': 6, 'cursor': resp.data['next_cursor']})
+        self.assertEqual([w['text'] for w in resp.data['segments']], [f'w{i}' for i in range(16, 20)])
+        self.assertIsNone(resp.data['next_cursor'])
+
+        resp = self.client.get(url, {'from': 'abc'})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_transcript_range_reads_legacy_rows(self):
+        job = VideoJob.objects.create(recording=self.recording)
+        Transcript.objects.create(job=job, text='раз два три', timestamps=[
+            {'start': '00:01', 'end': '00:02', 'text': 'раз'},
+            {'start': '01:00', 'end': '01:01', 'text': 'два'},
+            {'start': '02:00', 'end': None, 'text': 'три'},
+        ])
+        self.auth(self.token_member)
+        resp = self.client.get(reverse('videojob-transcript-range', args=[job.id]), {'from': 30})
+        self.assertEqual([w['text'] for w in resp.data['segments']], ['два', 'три'])
+        self.assertIsNone(resp.data['to'])
+
+    def indexed_job(self, recording):
+        job = VideoJob.objects.create(recording=recording, status='SUCCESS')
+        words = [{'start': 90.0 + i, 'end': 90.5 + i, 'text': w}
+                 for i, w in enumerate("Лектор дал определение предела".split())]
+        Transcript.objects.create(job=job, **Transcript.columns(" ".join(w['text'] for w in words), words))
+        Summary.objects.create(job=job, text="00:00 - 01:30: введение\n\n01:30 - 03:00: определение предела")
+        Notes.objects.create(job=job, text="Конспект без таймкодов")
+        index_job(job)
+        return job
+
+    def test_search_scoped_to_user_groups(self):
+        job = self.indexed_job(self.recording)
+        foreign_group = Group.objects.create(title='G2', owner=self.other)
+        foreign_group.members.add(self.other)
+        self.indexed_job(Recording.objects.create(owner=self.other, group=foreign_group, video_file='b.mp4'))
+        url = reverse('processing-search')
+
+        self.auth(self.token_member)
+        resp = self.client.get(url, {'q': 'определение'})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual({(r['job'], r['kind'], r['timestamp']) for r in resp.data['results']},
+                         {(job.id, 'transcript', '01:30'), (job.id, 'summary', '01:30')})
+        self.assertIn('определение', resp.data['results'][0]['headline'])
+
+        resp = self.client.get(url, {'q': 'определение', 'kind': 'notes'})
+        self.assertEqual(resp.data['results'], [])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_headline_escapes_stored_text(self):
+        job = self.indexed_job(self.recording)
+        Notes.objects.filter(job=job).update(text='Предел <img src=x onerror=alert(1)> функции')
+        index_job(VideoJob.objects.get(id=job.id))
+        self.auth(self.token_member)
+        resp = self.client.get(reverse('processing-search'), {'q': 'функции', 'kind': 'notes'})
+        headline = resp.data['results'][0]['headline']
+        self.assertNotIn('<img', headline)
+        self.assertIn('<b>функции</b>', headline)
+
+    @skipUnless(connection.vendor == 'postgresql', "морфология и ранжирование есть только в PostgreSQL")
+    def test_search_matches_word_forms(self):
+        job = self.indexed_job(self.recording)
+        self.auth(self.token_member)
+        resp = self.client.get(reverse('processing-search'), {'q': 'определения пределов'})
+        self.assertEqual(resp.data['results'][0]['job'], job.id)
+        self.assertIn('<b>', resp.data['results'][0]['headline'])
+
+    @patch('apps.processing.tasks.stream_pcm_windows', lambda *args, **kwargs: [(0.0, tone(1.0))])
+    @patch('apps.processing.tasks.call_llama', return_value='llm text')
+    @patch('apps.processing.engines.asr_registry')
+    def test_process_video_job_task_success(self, mock_registry, mock_llama):
+        # подменим модель и ffmpeg чтобы не запускать внешние зависимости
+        mock_registry.get.return_value = lambda *args, **kwargs: {"text": "hello world", "chunks": []}
+        mock_registry.batch_size.return_value = 1
 
         job = VideoJob.objects.create(recording=self.recording)
         process_video_job(job.id)
         job.refresh_from_db()
 
         self.assertEqual(job.status, 'SUCCESS')
+        self.assertEqual(job.stage, 'done')
         self.assertIsNotNone(job.started_at)
         self.assertIsNotNone(job.finished_at)
         # и дочерние объекты созданы
@@ -129,17 +286,1086 @@ class VideoJobTests(APITestCase):
         self.assertEqual(job.transcript.text, "hello world")
         self.assertTrue(hasattr(job, 'summary'))
         self.assertTrue(hasattr(job, 'notes'))
+        # по завершении задача попадает в поисковый индекс
+        self.assertEqual(sorted(job.search_entries.values_list('kind', flat=True)),
+                         ['notes', 'summary', 'transcript'])
 
-    @patch('apps.processing.tasks.subprocess.run', side_effect=RuntimeError("ffmpeg err"))
-    def test_process_video_job_task_failure(self, mock_run):
+    @patch('apps.processing.engines.asr_registry')
+    @patch('apps.processing.audio.subprocess.Popen', side_effect=RuntimeError("ffmpeg err"))
+    def test_process_video_job_task_failure(self, mock_run, mock_registry):
         """
         Если ffmpeg упадёт, задача должна пометиться FAILED,
         в логе появится текст ошибки, и finished_at заполнится.
         """
+        mock_registry.batch_size.return_value = 1
         job = VideoJob.objects.create(recording=self.recording)
         process_video_job(job.id)
         job.refresh_from_db()
 
         self.assertEqual(job.status, 'FAILED')
+        self.assertEqual(job.stage, 'extract')
         self.assertIn("ffmpeg err", job.log)
         self.assertIsNotNone(job.finished_at)
+
+    @patch('apps.processing.tasks.stream_pcm_windows', lambda *args, **kwargs: [(0.0, tone(1.0))])
+    @patch('apps.processing.tasks.call_llama', side_effect=RuntimeError("llm down"))
+    @patch('apps.processing.engines.asr_registry')
+    def test_llm_stage_failure_keeps_transcript(self, mock_registry, mock_llama):
+        mock_registry.get.return_value = lambda *args, **kwargs: {"text": "hello world", "chunks": []}
+        mock_registry.batch_size.return_value = 1
+
+        job = VideoJob.objects.create(recording=self.recording)
+        process_video_job(job.id)
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, 'FAILED')
+        self.assertEqual(job.stage, 'summarize')
+        self.assertIn("llm down", job.log)
+        self.assertEqual(job.transcript.text, "hello world")
+        self.assertFalse(Summary.objects.filter(job=job).exists())
+
+    def resume(self, job):
+        self.auth(self.token_member)
+        resp = self.client.post(reverse('videojob-resume', args=[job.id]))
+        if resp.status_code == status.HTTP_200_OK:
+            # диспетчер в тестах не запущен — задача, которую он бы отправил
+            process_video_job(job.id)
+            job.refresh_from_db()
+        return resp
+
+    @patch('apps.processing.tasks.stream_pcm_windows', lambda *args, **kwargs: [(0.0, tone(1.0))])
+    @patch('apps.processing.engines.asr_registry')
+    def test_resume_after_notes_failure_costs_one_llm_call(self, mock_registry):
+        asr = MagicMock(return_value={"text": "hello world", "chunks": []})
+        mock_registry.get.return_value = asr
+        mock_registry.batch_size.return_value = 1
+        notes_calls = []
+
+        def flaky_llama(prompt, max_tokens, cache_stats=None):
+            if max_tokens == 5000:
+                notes_calls.append(prompt)
+                if len(notes_calls) == 1:
+                    raise RuntimeError("llm down")
+                return 'notes text'
+            return 'summary text'
+
+        job = VideoJob.objects.create(recording=self.recording)
+        with patch('apps.processing.tasks.call_llama', side_effect=flaky_llama) as mock_llama:
+            process_video_job(job.id)
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.stage), ('FAILED', 'summarize'))
+            self.assertEqual(job.summary.text, 'summary text')
+            asr_calls = asr.call_count
+
+            resp = self.resume(job)
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            self.assertEqual(resp.data['priority'], VideoJob.PRIORITY_INTERACTIVE)
+
+        self.assertEqual(job.status, 'SUCCESS')
+        self.assertEqual((job.summary.text, job.notes.text), ('summary text', 'notes text'))
+        self.assertEqual(asr.call_count, asr_calls)
+        # первый запуск: пересказ и конспект; продолжение — только конспект
+        self.assertEqual(mock_llama.call_count, 3)
+        self.assertEqual(notes_calls[0], notes_calls[1])
+        self.assertIn("Продолжение со стадии summarize", job.log)
+
+    @patch('apps.processing.tasks.call_llama', return_value='llm text')
+    @patch('apps.processing.engines.asr_registry')
+    def test_resume_after_asr_failure_keeps_extracted_audio(self, mock_registry, mock_llama):
+        mock_registry.get.return_value = MagicMock(
+            side_effect=[RuntimeError("cuda oom")] * 2 + [{"text": "hello world", "chunks": []}] * 2)
+        mock_registry.batch_size.return_value = 1
+
+        job = VideoJob.objects.create(recording=self.recording)
+        with patch('apps.processing.tasks.stream_pcm_windows', return_value=[(0.0, tone(1.0))]) as mock_stream:
+            process_video_job(job.id)
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.stage), ('FAILED', 'transcribe'))
+            self.resume(job)
+
+        self.assertEqual(job.status, 'SUCCESS')
+        self.assertEqual(job.transcript.text, 'hello world')
+        # ffmpeg не запускался повторно
+        self.assertEqual(mock_stream.call_count, 1)
+        self.assertEqual(set(job.checkpoints.values_list('step', flat=True)),
+                         {'extract', 'transcribe', 'prompts', 'summary', 'notes'})
+
+    @patch('apps.processing.tasks.chain')
+    def test_redelivered_message_does_not_restart_job(self, mock_chain):
+        job = VideoJob.objects.create(recording=self.recording, status='RUNNING', stage='transcribe',
+                                      started_at=timezone.now())
+        process_video_job(job.id)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.stage), ('RUNNING', 'transcribe'))
+        mock_chain.assert_not_called()
+
+    @override_settings(PROCESSING_STALE_JOB_SECONDS=3600)
+    @patch('apps.processing.tasks.stream_pcm_windows', lambda *args, **kwargs: [(0.0, tone(1.0))])
+    @patch('apps.processing.tasks.call_llama', return_value='llm text')
+    @patch('apps.processing.engines.asr_registry')
+    def test_resume_job_left_running_by_killed_worker(self, mock_registry, mock_llama):
+        mock_registry.get.return_value = lambda *args, **kwargs: {"text": "hello world", "chunks": []}
+        mock_registry.batch_size.return_value = 1
+        started = timezone.now() - timedelta(minutes=10)
+        job = VideoJob.objects.create(recording=self.recording, status='RUNNING', stage='transcribe',
+                                      dispatched_at=started, started_at=started, heartbeat_at=started)
+        # воркер ещё может быть жив — до истечения срока задачу не трогаем
+        self.assertEqual(self.resume(job).status_code, status.HTTP_409_CONFLICT)
+
+        VideoJob.objects.filter(id=job.id).update(heartbeat_at=timezone.now() - timedelta(hours=2))
+        resp = self.client.post(reverse('videojob-resume', args=[job.id]))
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual((resp.data['status'], resp.data['dispatched_at']), ('PENDING', None))
+        process_video_job(job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'SUCCESS')
+
+    def test_cleanup_scratch_keeps_audio_of_resumable_jobs(self):
+        from apps.processing.tasks import cleanup_scratch, scratch_path
+        long_ago = timezone.now() - timedelta(days=30)
+        jobs = {
+            'success': VideoJob.objects.create(recording=self.recording, status='SUCCESS'),
+            'old_failed': VideoJob.objects.create(recording=self.recording, status='FAILED', finished_at=long_ago),
+            'failed': VideoJob.objects.create(recording=self.recording, status='FAILED', finished_at=timezone.now()),
+            'running': VideoJob.objects.create(recording=self.recording, status='RUNNING'),
+        }
+        ids = {name: job.id for name, job in jobs.items()}
+        ids['deleted'] = max(ids.values()) + 100
+        for job_id in ids.values():
+            scratch_path(job_id, '.pcm').write_bytes(b'\0\0')
+            scratch_path(job_id, '.json').write_text('[]')
+
+        self.assertEqual(cleanup_scratch(), 6)
+        kept = sorted(name for name, job_id in ids.items() if scratch_path(job_id, '.pcm').exists())
+        self.assertEqual(kept, ['failed', 'running'])
+
+    def test_resume_only_failed_jobs(self):
+        job = VideoJob.objects.create(recording=self.recording, status='SUCCESS')
+        resp = self.resume(job)
+        self.assertEqual(resp.status_code, status.HTTP_409_CONFLICT)
+        self.auth(self.token_other)
+        failed = VideoJob.objects.create(recording=self.recording, status='FAILED')
+        resp = self.client.post(reverse('videojob-resume', args=[failed.id]))
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+
+    @patch('apps.processing.tasks.stream_pcm_windows', lambda *args, **kwargs: [(0.0, tone(1.0))])
+    @patch('apps.processing.engines.asr_registry')
+    def test_summary_and_notes_requested_concurrently(self, mock_registry):
+        mock_registry.get.return_value = lambda *args, **kwargs: {"text": "hello world", "chunks": []}
+        mock_registry.batch_size.return_value = 1
+        # оба запроса должны одновременно дойти до барьера, иначе он сломается по таймауту
+        barrier = threading.Barrier(2, timeout=5)
+
+        def fake_llama(prompt, max_tokens=1000, cache_stats=None):
+            barrier.wait()
+            if max_tokens == 1500:
+                raise RuntimeError("summary quota")
+            return 'notes text'
+
+        job = VideoJob.objects.create(recording=self.recording)
+        with patch('apps.processing.tasks.call_llama', side_effect=fake_llama):
+            process_video_job(job.id)
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, 'FAILED')
+        self.assertIn("summary quota", job.log)
+        self.assertEqual(job.notes.text, 'notes text')
+        self.assertFalse(Summary.objects.filter(job=job).exists())
+
+
+    def finished_job(self, recording, version):
+        job = VideoJob.objects.create(recording=recording, status='SUCCESS', pipeline_version=version,
+                                      finished_at=timezone.now())
+        Transcript.objects.create(job=job, text='old transcript', timestamps=[])
+        Summary.objects.create(job=job, text='old summary')
+        Notes.objects.create(job=job, text='old notes')
+        return job
+
+    @patch('apps.processing.tasks.call_llama')
+    @patch('apps.processing.engines.asr_registry')
+    def test_identical_upload_reuses_results(self, mock_registry, mock_llama):
+        from apps.processing.tasks import pipeline_version
+        self.recording.content_hash = 'a' * 64
+        self.recording.save()
+        duplicate = Recording.objects.create(owner=self.owner, group=self.group,
+                                             video_file='copy.mp4', content_hash='a' * 64)
+        source = self.finished_job(self.recording, pipeline_version())
+
+        job = VideoJob.objects.create(recording=duplicate)
+        process_video_job(job.id)
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, 'SUCCESS')
+        self.assertEqual(job.stage, 'done')
+        self.assertIn(f"#{source.id}", job.log)
+        self.assertEqual(job.transcript.text, 'old transcript')
+        self.assertEqual(job.summary.text, 'old summary')
+        self.assertEqual(job.notes.text, 'old notes')
+        mock_registry.get.assert_not_called()
+        mock_llama.assert_not_called()
+
+    @patch('apps.processing.tasks.stream_pcm_windows', lambda *args, **kwargs: [(0.0, tone(1.0))])
+    @patch('apps.processing.tasks.call_llama', return_value='llm text')
+    @patch('apps.processing.engines.asr_registry')
+    def test_other_pipeline_version_is_reprocessed(self, mock_registry, mock_llama):
+        mock_registry.get.return_value = lambda *args, **kwargs: {"text": "hello world", "chunks": []}
+        mock_registry.batch_size.return_value = 1
+        self.recording.content_hash = 'a' * 64
+        self.recording.save()
+        self.finished_job(self.recording, 'old-version')
+
+        job = VideoJob.objects.create(recording=self.recording)
+        process_video_job(job.id)
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, 'SUCCESS')
+        self.assertEqual(job.transcript.text, 'hello world')
+
+    def session_segment(self, session, index, **kwargs):
+        return SessionSegment.objects.create(
+            session=session, index=index, offset_seconds=index * 60,
+            media=SimpleUploadedFile(f'part{index}.webm', b'\x00'), **kwargs
+        )
+
+    @patch('apps.processing.tasks.stream_pcm_windows', lambda *args, **kwargs: [(0.0, tone(1.0))])
+    @patch('apps.processing.engines.asr_registry')
+    def test_session_segment_transcribed_on_timeline(self, mock_registry):
+        mock_registry.get.return_value = FakeWhisperPipe()
+        mock_registry.batch_size.return_value = 1
+        session = RecordingSession.objects.create(owner=self.owner, group=self.group)
+        segment = self.session_segment(session, 2)
+
+        from apps.processing.tasks import transcribe_session_segment
+        transcribe_session_segment(segment.id)
+        segment.refresh_from_db()
+
+        self.assertEqual(segment.status, 'SUCCESS')
+        self.assertEqual(segment.text, 'w0')
+        self.assertEqual(segment.timestamps[0]['start'], 120.0)
+        self.assertFalse(segment.media)
+
+    @patch('apps.processing.tasks.call_llama', return_value='llm text')
+    @patch('apps.processing.engines.asr_registry')
+    def test_session_recording_only_transcribes_tail(self, mock_registry, mock_llama):
+        mock_registry.get.return_value = lambda *args, **kwargs: {"text": "хвост", "chunks": []}
+        mock_registry.batch_size.return_value = 1
+        session = RecordingSession.objects.create(owner=self.owner, group=self.group, status='stopped')
+        self.session_segment(session, 0, status='SUCCESS', text='начало', timestamps=[])
+        self.session_segment(session, 1)
+        self.recording.session = session
+        self.recording.save()
+
+        job = VideoJob.objects.create(recording=self.recording)
+        with patch('apps.processing.tasks.stream_pcm_windows', return_value=[(0.0, tone(1.0))]) as mock_stream, \
+                patch('apps.processing.tasks.media_duration', return_value=61.5):
+            process_video_job(job.id)
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, 'SUCCESS')
+        self.assertEqual(job.transcript.text, 'начало хвост')
+        # полная запись не перекодируется, только хвостовой фрагмент
+        self.assertEqual(mock_stream.call_count, 1)
+        self.assertIn('part1', mock_stream.call_args.args[0])
+        self.assertEqual(job.summary.text, 'llm text')
+        self.assertEqual(session.segments.get(index=1).duration_seconds, 1.0)
+
+    @patch('apps.processing.tasks.call_llama', return_value='llm text')
+    @patch('apps.processing.engines.asr_registry')
+    def test_session_missing_tail_segment_transcribed_from_full_file(self, mock_registry, mock_llama):
+        mock_registry.get.return_value = lambda *args, **kwargs: {"text": "конец", "chunks": []}
+        mock_registry.batch_size.return_value = 1
+        session = RecordingSession.objects.create(owner=self.owner, group=self.group, status='stopped')
+        self.session_segment(session, 0, status='SUCCESS', text='начало', duration_seconds=60.0,
+                             timestamps=[{'start': 0.0, 'end': 1.0, 'text': 'начало'}])
+        self.recording.session = session
+        self.recording.save()
+
+        # бот не прислал последний фрагмент: запись идёт 90 с, а фрагменты — только 60
+        job = VideoJob.objects.create(recording=self.recording)
+        with patch('apps.processing.tasks.stream_pcm_windows', return_value=[(60.0, tone(1.0))]) as mock_stream, \
+                patch('apps.processing.tasks.media_duration', return_value=90.0):
+            process_video_job(job.id)
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, 'SUCCESS')
+        self.assertEqual(job.transcript.text, 'начало конец')
+        self.assertEqual(mock_stream.call_count, 1)
+        self.assertEqual(mock_stream.call_args.args[0], self.recording.video_file.path)
+        self.assertEqual(mock_stream.call_args.kwargs['start_s'], 60.0)
+        self.assertIn("хвост распознан из полного файла", job.log)
+
+    @patch('apps.processing.tasks.call_llama', return_value='llm text')
+    @patch('apps.processing.tasks.get_engine')
+    def test_session_keeps_engine_chosen_at_start(self, mock_get_engine, mock_llama):
+        engine = mock_get_engine.return_value
+        engine.batch_size.return_value = 1
+        engine.transcribe_stream.return_value = ("часть", [], 1.0)
+        session = RecordingSession.objects.create(owner=self.owner, group=self.group, asr_engine='nemo_ctc')
+        segment = self.session_segment(session, 0)
+        # движок группы сменили посреди записи
+        self.group.asr_engine = 'whisper'
+        self.group.save()
+        self.recording.session = session
+        self.recording.save()
+
+        from apps.processing.tasks import transcribe_session_segment
+        with patch('apps.processing.tasks.stream_pcm_windows', return_value=[(0.0, tone(1.0))]):
+            transcribe_session_segment(segment.id)
+            job = VideoJob.objects.create(recording=self.recording)
+            with patch('apps.processing.tasks.media_duration', return_value=90.0):
+                process_video_job(job.id)
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, 'SUCCESS')
+        self.assertEqual(job.asr_engine, 'nemo_ctc')
+        # фрагмент и хвост из полного файла распознаны одним движком
+        self.assertEqual({c.args[0] for c in mock_get_engine.call_args_list}, {'nemo_ctc'})
+        self.assertEqual(mock_get_engine.call_count, 2)
+
+    @patch('apps.processing.tasks.call_llama', return_value='llm text')
+    @patch('apps.processing.tasks.get_engine')
+    def test_asr_engine_resolved_from_job_then_group(self, mock_get_engine, mock_llama):
+        engine = mock_get_engine.return_value
+        engine.name = 'nemo_ctc'
+        engine.batch_size.return_value = 1
+        engine.transcribe_stream.return_value = ("привет", [], 1.0)
+        self.group.asr_engine = 'nemo_ctc'
+        self.group.save()
+
+        job = VideoJob.objects.create(recording=self.recording)
+        with patch('apps.processing.tasks.stream_pcm_windows', return_value=[(0.0, tone(1.0))]):
+            process_video_job(job.id)
+        job.refresh_from_db()
+
+        self.assertEqual(job.asr_engine, 'nemo_ctc')
+        self.assertIn('nemo_ctc:', job.pipeline_version)
+        mock_get_engine.assert_called_with('nemo_ctc')
+        self.assertEqual(job.transcript.text, "привет")
+
+        job = VideoJob.objects.create(recording=self.recording, asr_engine='whisper')
+        with patch('apps.processing.tasks.stream_pcm_windows', return_value=[(0.0, tone(1.0))]):
+            process_video_job(job.id)
+        mock_get_engine.assert_called_with('whisper')
+
+class ASRModelRegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.loads = []
+
+        def loader(model_id, dtype, device):
+            self.loads.append((model_id, dtype, device))
+            return object()
+
+        self.registry = ASRModelRegistry(loader=loader)
+
+    def test_model_loaded_once_per_key(self):
+        self.assertFalse(self.registry.is_ready())
+        first = self.registry.get('m1', 'float32', 'cpu')
+        second = self.registry.get('m1', 'float32', 'cpu')
+        self.assertIs(first, second)
+        self.assertEqual(self.loads, [('m1', 'float32', 'cpu')])
+        self.assertTrue(self.registry.is_ready('m1', 'float32', 'cpu'))
+        self.assertEqual(self.registry.status()['state'], ASRModelRegistry.READY)
+
+    def test_other_model_evicts_current(self):
+        first = self.registry.get('m1', 'float32', 'cpu')
+        second = self.registry.get('m2', 'float32', 'cpu')
+        self.assertIsNot(first, second)
+        self.assertEqual(len(self.loads), 2)
+        self.assertFalse(self.registry.is_ready('m1', 'float32', 'cpu'))
+        self.assertEqual(self.registry.status()['model_id'], 'm2')
+
+    def test_failed_load_is_observable(self):
+        def broken_loader(*key):
+            raise OSError("no weights")
+
+        registry = ASRModelRegistry(loader=broken_loader)
+        with self.assertRaises(OSError):
+            registry.get('m1', 'float32', 'cpu')
+        self.assertEqual(registry.status()['state'], ASRModelRegistry.FAILED)
+        self.assertEqual(registry.status()['error'], "no weights")
+
+
+    def test_precision_modes(self):
+        self.assertEqual(resolve_dtype('cpu', 'auto'), 'float32')
+        self.assertEqual(resolve_dtype('cuda', None), 'float16')
+        self.assertEqual(resolve_dtype('cpu', 'fp32'), 'float32')
+        self.assertEqual(resolve_dtype('cpu', 'int8'), 'int8')
+        self.assertEqual(resolve_dtype('cuda', 'bf16'), 'bfloat16')
+        with self.assertRaises(ValueError):
+            resolve_dtype('cuda', 'int8')
+
+    def test_bf16_falls_back_without_cpu_support(self):
+        with patch('apps.processing.asr.cpu_supports_bf16', return_value=False):
+            self.assertEqual(resolve_dtype('cpu', 'bf16'), 'float32')
+        with patch('apps.processing.asr.cpu_supports_bf16', return_value=True):
+            self.assertEqual(resolve_dtype('cpu', 'bf16'), 'bfloat16')
+
+    def test_precision_benchmark_corpus(self):
+        with tempfile.TemporaryDirectory() as corpus_dir:
+            for name in ('a.wav', 'a.txt', 'b.mp3', 'c.txt'):
+                with open(f"{corpus_dir}/{name}", 'w', encoding='utf-8') as f:
+                    f.write("Ёжик, привет!")
+            corpus = load_corpus(corpus_dir)
+        self.assertEqual([path.rsplit('/', 1)[1] for path, _ in corpus], ['a.wav'])
+        self.assertEqual(normalize_text(corpus[0][1]), "ежик привет")
+
+class FakeFFmpeg:
+    def __init__(self, pcm, returncode=0, stderr=b''):
+        self.stdout = io.BytesIO(pcm)
+        self.stderr = stderr
+        self.returncode = returncode
+        self.killed = False
+
+    def popen(self, command, stdout=None, stderr=None):
+        stderr.write(self.stderr)
+        return self
+
+    def kill(self):
+        self.killed = True
+
+    def wait(self):
+        return self.returncode
+
+
+class AudioStreamTests(SimpleTestCase):
+    def test_windows_are_bounded_float32_with_offsets(self):
+        pcm = (np.arange(16000 * 5) % 100).astype('<i2').tobytes()
+        with patch('apps.processing.audio.subprocess.Popen', FakeFFmpeg(pcm).popen):
+            windows = list(stream_pcm_windows('lecture.mp4', window_s=2))
+
+        self.assertEqual([offset for offset, _ in windows], [0.0, 2.0, 4.0])
+        self.assertEqual([w.size for _, w in windows], [32000, 32000, 16000])
+        self.assertTrue(all(w.dtype == np.float32 for _, w in windows))
+        self.assertLess(max(float(w.max()) for _, w in windows), 1.0)
+
+    def test_ffmpeg_error_is_raised(self):
+        fake = FakeFFmpeg(b'', returncode=1, stderr=b'Invalid data')
+        with patch('apps.processing.audio.subprocess.Popen', fake.popen):
+            with self.assertRaisesMessage(RuntimeError, 'Invalid data'):
+                list(stream_pcm_windows('broken.mp4', window_s=30))
+
+    def test_verbose_stderr_does_not_block_audio(self):
+        # «ffmpeg» сначала пишет в stderr больше буфера пайпа (~64 КБ) и только потом аудио
+        script = ("import sys; sys.stderr.write('decode error\\n' * 50000); sys.stderr.flush(); "
+                  "sys.stdout.buffer.write(b'\\0\\0' * 32000); sys.exit(1)")
+        with patch('apps.processing.audio.ffmpeg_pcm_command', return_value=[sys.executable, '-c', script]):
+            windows = []
+            with self.assertRaisesMessage(RuntimeError, 'decode error'):
+                for window in stream_pcm_windows('broken.mp4', window_s=1):
+                    windows.append(window)
+        self.assertEqual([offset for offset, _ in windows], [0.0, 1.0])
+
+
+class FakeWhisperPipe:
+    """Возвращает по слову на каждую секунду окна; запоминает размеры вызовов."""
+    def __init__(self):
+        self.calls = []
+
+    def transcribe(self, item):
+        seconds = len(item["raw"]) // 16000
+        words = [{"text": f" w{i}", "timestamp": (float(i), float(i + 1))} for i in range(seconds)]
+        return {"text": "".join(w["text"] for w in words), "chunks": words}
+
+    def __call__(self, inputs, **kwargs):
+        self.calls.append((len(inputs) if isinstance(inputs, list) else 1, kwargs.get("batch_size")))
+        if isinstance(inputs, list):
+            return [self.transcribe(item) for item in inputs]
+        return self.transcribe(inputs)
+
+
+class BatchedTranscriptionTests(SimpleTestCase):
+    def test_auto_batch_size_bounded_by_cores_and_memory(self):
+        with patch('apps.processing.asr.available_cores', return_value=16), \
+                patch('apps.processing.asr.available_memory_mb', return_value=100000):
+            self.assertEqual(auto_batch_size('cpu', item_mb=512, max_batch=32), 8)
+        with patch('apps.processing.asr.available_cores', return_value=16), \
+                patch('apps.processing.asr.available_memory_mb', return_value=1500):
+            self.assertEqual(auto_batch_size('cpu', item_mb=512, max_batch=32), 2)
+        with patch('apps.processing.asr.available_cores', return_value=1), \
+                patch('apps.processing.asr.available_memory_mb', return_value=100):
+            self.assertEqual(auto_batch_size('cpu', item_mb=512, max_batch=32), 1)
+
+    def test_windows_grouped_into_one_call_with_offsets(self):
+        pipe = FakeWhisperPipe()
+        windows = [(float(i * 30), np.zeros(16000 * 30, dtype=np.float32)) for i in range(4)]
+        text, timestamps, audio_seconds = transcribe_stream(pipe, windows, batch_size=2)
+
+        self.assertEqual(pipe.calls, [(2, 2), (2, 2)])
+        self.assertEqual(audio_seconds, 120.0)
+        self.assertEqual(len(timestamps), 120)
+        self.assertEqual(timestamps[30]['start'], 30.0)
+        self.assertEqual(timestamps[-1]['end'], 120.0)
+        self.assertEqual(len(text.split()), 120)
+
+
+class VADTests(SimpleTestCase):
+    def test_detects_speech_regions_and_skips_silence(self):
+        samples = np.concatenate([silence(2), tone(3), silence(5), tone(2), silence(1)])
+        regions = detect_speech(samples, min_silence_s=2.0, padding_s=0.2)
+
+        self.assertEqual(len(regions), 2)
+        self.assertAlmostEqual(regions[0][0], 1.8, delta=0.05)
+        self.assertAlmostEqual(regions[0][1], 5.2, delta=0.05)
+        self.assertAlmostEqual(regions[1][0], 9.8, delta=0.05)
+        self.assertAlmostEqual(regions[1][1], 12.2, delta=0.05)
+
+    def test_speech_windows_keep_timeline_offsets(self):
+        # речь пересекает границу окон 10 с: фрагмент должен склеиться
+        first = np.concatenate([silence(6), tone(4)])
+        second = np.concatenate([tone(3), silence(7)])
+        stats = VADStats()
+        pieces = list(speech_windows([(0.0, first), (10.0, second)], stats=stats, padding_s=0.0))
+
+        self.assertEqual(len(pieces), 1)
+        offset, samples = pieces[0]
+        self.assertAlmostEqual(offset, 6.0, delta=0.05)
+        self.assertAlmostEqual(len(samples) / 16000, 7.0, delta=0.1)
+        self.assertAlmostEqual(stats.skipped_seconds, 13.0, delta=0.1)
+        self.assertAlmostEqual(stats.skipped_ratio, 0.65, delta=0.01)
+
+    def test_long_speech_split_at_quietest_frame(self):
+        # речь без пауз дольше max_carry_s; тише всего — на 13-13.5 с
+        second = np.concatenate([tone(3), tone(0.5, amplitude=0.1), tone(6.5)])
+        pieces = list(speech_windows([(0.0, tone(10)), (10.0, second)], max_carry_s=12, padding_s=0.0))
+
+        self.assertEqual(len(pieces), 2)
+        first_len = len(pieces[0][1]) / 16000
+        self.assertTrue(13.0 < first_len < 13.5)
+        self.assertAlmostEqual(pieces[1][0], first_len)
+        self.assertAlmostEqual(sum(len(samples) for _offset, samples in pieces) / 16000, 20.0, delta=0.05)
+
+
+class ParallelTranscriptionTests(SimpleTestCase):
+    def lecture_pieces(self):
+        # 6 фраз по 4 с, разделённых паузами по 3 с, нарезанные окнами по 7 с
+        audio = np.concatenate([np.concatenate([tone(4), silence(3)]) for _ in range(6)])
+        windows = [(i / 16000, audio[i:i + 16000 * 7]) for i in range(0, len(audio), 16000 * 7)]
+        return list(speech_windows(windows, padding_s=0.0))
+
+    def test_segments_split_only_between_speech_pieces(self):
+        pieces = self.lecture_pieces()
+        segments = list(plan_segments(pieces, segment_seconds=8))
+        self.assertGreater(len(segments), 1)
+        self.assertEqual([p for segment in segments for p in segment], pieces)
+
+    def test_parallel_result_matches_serial_without_lost_or_duplicated_words(self):
+        pieces = self.lecture_pieces()
+        pipe = FakeWhisperPipe()
+        serial = transcribe_stream(pipe, pieces, batch_size=1)
+
+        with patch('apps.processing.engines.asr_registry') as mock_registry, ThreadPool(3) as pool:
+            mock_registry.get.return_value = pipe
+            parallel = transcribe_parallel(pieces, pool, segment_seconds=8, batch_size=1, max_in_flight=2)
+
+        text, timestamps, audio_seconds = parallel
+        self.assertEqual((text, timestamps), serial[:2])
+        self.assertAlmostEqual(audio_seconds, serial[2])
+        # по слову на секунду каждой из 6 фраз
+        self.assertEqual(len(text.split()), 24)
+        starts = [t['start'] for t in timestamps]
+        self.assertEqual(starts, sorted(starts))
+        self.assertEqual(starts[4], 7.0)
+
+
+def word_timestamps(count):
+    words = []
+    for i in range(count):
+        word = f"слово{i}." if i % 10 == 9 else f"слово{i}"
+        words.append({"start": f"{i // 60:02}:{i % 60:02}", "end": f"{(i + 1) // 60:02}:{(i + 1) % 60:02}", "text": word})
+    return words
+
+
+@override_settings(LLM_CHUNK_TOKENS=200, LLM_MAP_PARALLELISM=3, LLM_CHARS_PER_TOKEN=3.0)
+class MapReduceSummarizationTests(SimpleTestCase):
+    def test_chunks_follow_timestamps_without_losing_words(self):
+        timestamps = word_timestamps(600)
+        text = " ".join(w["text"] for w in timestamps)
+        chunks = chunk_transcript(text, timestamps, max_tokens=200)
+
+        self.assertGreater(len(chunks), 1)
+        words = [w for c in chunks for w in c['text'].split() if not w.startswith('[') and not w.endswith(']')]
+        self.assertEqual(words, text.split())
+        for chunk in chunks:
+            self.assertLessEqual(estimate_tokens(chunk['text']), 200 + len(chunk['text'].split()))
+            # фрагмент начинается с метки своего начала
+            self.assertTrue(chunk['text'].startswith(f"[{chunk['start']}]"))
+        for previous, current in zip(chunks, chunks[1:]):
+            self.assertEqual(previous['end'], current['start'])
+
+    def test_short_transcript_sent_in_one_request(self):
+        calls = []
+        prompts = build_llm_prompts("короткая лекция", [], lambda *a, **kw: calls.append(a))
+        self.assertEqual(calls, [])
+        self.assertIn("короткая лекция", prompts['summary'][0])
+
+    def test_long_transcript_map_reduce_keeps_time_ranges(self):
+        timestamps = word_timestamps(600)
+        text = " ".join(w["text"] for w in timestamps)
+        map_calls = []
+
+        def fake_call(prompt, max_tokens=1000):
+            map_calls.append(prompt)
+            return "конспект"
+
+        prompts = build_llm_prompts(text, timestamps, fake_call)
+
+        self.assertEqual(len(map_calls), len(chunk_transcript(text, timestamps, max_tokens=200)))
+        summary_prompt, summary_tokens = prompts['summary']
+        self.assertEqual(summary_tokens, 1500)
+        self.assertIn("[00:00 - ", summary_prompt)
+        self.assertIn(" - 10:00]", summary_prompt)
+        self.assertNotIn("слово1 ", summary_prompt)
+        self.assertEqual(prompts['notes'][1], 5000)
+
+
+class FairOrderTests(SimpleTestCase):
+    def test_groups_take_turns_within_priority(self):
+        t = [timezone.now() + timedelta(seconds=i) for i in range(6)]
+        waiting = [
+            (1, 'a', 1, t[0]), (2, 'a', 1, t[1]), (3, 'a', 1, t[2]),
+            (4, 'b', 1, t[3]),
+            (5, 'c', 2, t[0]),
+            (6, 'b', 0, t[5]),
+        ]
+        self.assertEqual(fair_order(waiting, {}, {}), [6, 1, 4, 2, 3, 5])
+        # у группы a уже идёт задача — в первом круге её обгоняют остальные
+        self.assertEqual(fair_order(waiting, {'a': 1}, {}), [6, 4, 1, 2, 3, 5])
+        # в одном круге первой идёт группа, которую обслуживали давнее всего
+        self.assertEqual(fair_order(waiting[:4], {}, {'a': t[5], 'b': t[0]}), [4, 1, 2, 3])
+
+
+@override_settings(PROCESSING_MAX_ACTIVE_JOBS=2)
+class DispatcherTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user('owner', 'owner@example.com', 'pass')
+        self.recordings = {}
+        for title in ('a', 'b'):
+            group = Group.objects.create(title=title, owner=owner)
+            self.recordings[title] = Recording.objects.create(owner=owner, group=group, video_file=f'{title}.mp4')
+
+    def dispatch(self):
+        with patch('apps.processing.tasks.process_video_job.delay') as mock_delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                dispatch_jobs()
+        return [c.args[0] for c in mock_delay.call_args_list]
+
+    def test_backlog_of_one_group_does_not_starve_another(self):
+        backlog = [VideoJob.objects.create(recording=self.recordings['a']) for _ in range(3)]
+        fresh = VideoJob.objects.create(recording=self.recordings['b'])
+
+        self.assertEqual(self.dispatch(), [backlog[0].id, fresh.id])
+        # слотов нет — новые задачи не запускаются, а ожидающие видят своё место в очереди
+        self.assertEqual(self.dispatch(), [])
+        data = VideoJobSerializer(VideoJob.objects.filter(dispatched_at__isnull=True), many=True).data
+        self.assertEqual([(d['id'], d['queue_position']) for d in data], [(backlog[1].id, 1), (backlog[2].id, 2)])
+        self.assertIsNone(data[0]['eta_seconds'])
+
+        VideoJob.objects.filter(id=fresh.id).update(
+            status='SUCCESS', started_at=timezone.now() - timedelta(seconds=100), finished_at=timezone.now())
+        self.assertEqual(self.dispatch(), [backlog[1].id])
+        waiting = VideoJobSerializer(VideoJob.objects.get(id=backlog[2].id)).data
+        self.assertEqual((waiting['queue_position'], waiting['eta_seconds']), (1, 100))
+
+    @override_settings(PROCESSING_STALE_JOB_SECONDS=3600)
+    def test_lost_jobs_release_their_slots(self):
+        long_ago = timezone.now() - timedelta(hours=2)
+        lost = [
+            VideoJob.objects.create(recording=self.recordings['a'], status='RUNNING',
+                                    dispatched_at=long_ago, started_at=long_ago),
+            VideoJob.objects.create(recording=self.recordings['a'], dispatched_at=long_ago),
+        ]
+        # долгая задача, которая продолжает отчитываться о прогрессе, не теряется
+        alive = VideoJob.objects.create(recording=self.recordings['b'], status='RUNNING', dispatched_at=long_ago,
+                                        started_at=long_ago, heartbeat_at=timezone.now())
+        waiting = VideoJob.objects.create(recording=self.recordings['b'])
+
+        self.assertEqual(self.dispatch(), [waiting.id])
+        self.assertEqual([VideoJob.objects.get(id=job.id).status for job in lost], ['FAILED', 'FAILED'])
+        self.assertIn("воркер убит или перезапущен", VideoJob.objects.get(id=lost[0].id).log)
+        self.assertEqual(VideoJob.objects.get(id=alive.id).status, 'RUNNING')
+
+
+@override_settings(PROCESSING_EVENTS_BACKEND='memory', PROCESSING_EVENTS_PROGRESS_INTERVAL=10)
+class JobEventsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('viewer', 'viewer@example.com', 'pass')
+        self.group = Group.objects.create(title='g', owner=self.user)
+        self.group.members.add(self.user)
+        self.recording = Recording.objects.create(owner=self.user, group=self.group, video_file='a.mp4')
+        self.job = VideoJob.objects.create(recording=self.recording, status='RUNNING', stage='transcribe')
+        patcher = patch.object(events, '_backend', InMemoryEventBackend())
+        self.backend = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_progress_is_throttled(self):
+        now = [0.0]
+        with patch('apps.processing.events.publish_job_event') as mock_publish:
+            reporter = ProgressReporter(self.job, 100, start=0, end=100, clock=lambda: now[0])
+            reporter.advance(10)
+            reporter.advance(10)
+            now[0] = 11.0
+            reporter.advance(0)
+            reporter.advance(80)
+        self.assertEqual([c.args[2] for c in mock_publish.call_args_list], [10, 20])
+        self.job.refresh_from_db()
+        self.assertIsNotNone(self.job.heartbeat_at)
+
+    async def read_events(self, stream, count):
+        chunks = []
+        while len(chunks) < count:
+            chunk = (await asyncio.wait_for(anext(stream), 5)).decode()
+            if not chunk.startswith(':'):
+                chunks.append(chunk)
+        return [(chunk.split('\n')[0][len('event: '):], json.loads(chunk.split('\n')[1][len('data: '):]))
+                for chunk in chunks]
+
+    async def test_stream_sends_snapshot_then_worker_events(self):
+        token = str(RefreshToken.for_user(self.user).access_token)
+        unauthorized = await self.async_client.get(reverse('processing-events'))
+        self.assertEqual(unauthorized.status_code, 401)
+
+        response = await self.async_client.get(reverse('processing-events'), {'access_token': token})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        [(name, snapshot)] = await self.read_events(stream, 1)
+        self.assertEqual(name, 'snapshot')
+        self.assertEqual([(j['job'], j['stage']) for j in snapshot['jobs']], [(self.job.id, 'transcribe')])
+
+        self.job.status, self.job.stage = 'SUCCESS', 'done'
+        await asyncio.to_thread(publish_job_event, self.job, 'progress', 40)
+        await asyncio.to_thread(publish_job_event, self.job, 'done')
+        received = await self.read_events(stream, 2)
+        self.assertEqual([(name, e['progress']) for name, e in received], [('progress', 40), ('done', 100)])
+        # отключение клиента: ASGI-сервер отменяет задачу, ожидающую следующего события
+        waiting = asyncio.create_task(anext(stream))
+        await asyncio.sleep(0.05)
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+        self.assertEqual(self.backend._subscribers[self.group.id], set())
+
+class SearchPassagesTests(SimpleTestCase):
+    def test_transcript_split_into_timed_passages(self):
+        words = [{'start': float(i * 10), 'end': None, 'text': f'w{i}'} for i in range(15)]
+        transcript = Transcript(**Transcript.columns(" ".join(w['text'] for w in words), words))
+        passages = transcript_passages(transcript, passage_s=60)
+        self.assertEqual([start for start, _ in passages], [0.0, 60.0, 120.0])
+        self.assertEqual(passages[1][1], "w6 w7 w8 w9 w10 w11")
+
+    def test_paragraphs_keep_leading_timestamp(self):
+        passages = text_passages("**06:30 - 12:00**: интегралы\n\nБез времени\n\n")
+        self.assertEqual(passages, [(390.0, "**06:30 - 12:00**: интегралы"), (None, "Без времени")])
+
+
+class TimestampColumnsTests(TestCase):
+    def test_columns_round_trip_with_unaligned_words(self):
+        segments = [
+            {'start': 0.5, 'end': 0.9, 'text': 'раз'},
+            {'start': 1.0, 'end': 1.4, 'text': 'лишнее'},
+            {'start': 5432.125, 'end': None, 'text': 'два'},
+        ]
+        transcript = Transcript(**Transcript.columns('раз два', segments))
+
+        self.assertEqual(transcript.segments(), segments)
+        self.assertEqual(transcript.unaligned_words, {'1': 'лишнее'})
+        # по 4 байта на начало, конец, смещение и длину слова
+        self.assertEqual(len(transcript.starts) + len(transcript.ends) + len(transcript.spans), 3 * 16)
+
+    def test_out_of_order_starts_are_sorted_for_window_search(self):
+        # таймкоды модели иногда идут не по порядку: третье слово начинается раньше второго
+        segments = [
+            {'start': 0.0, 'end': 1.0, 'text': 'раз'},
+            {'start': 5.0, 'end': 6.0, 'text': 'два'},
+            {'start': 2.0, 'end': 3.0, 'text': 'лишнее'},
+            {'start': 3.0, 'end': 4.0, 'text': 'три'},
+        ]
+        transcript = Transcript(**Transcript.columns('раз два три', segments))
+
+        starts = [s['start'] for s in transcript.segments()]
+        self.assertEqual(starts, sorted(starts))
+        self.assertEqual(sorted(map(str, transcript.segments())), sorted(map(str, segments)))
+        words, _cursor = transcript.window(2.0, 5.0)
+        self.assertEqual([w['text'] for w in words], ['лишнее', 'три'])
+        words, _cursor = transcript.window(4.0, 10.0)
+        self.assertEqual([w['text'] for w in words], ['два'])
+
+    def test_migration_converts_legacy_rows(self):
+        from importlib import import_module
+        from django.apps import apps as django_apps
+        migration = import_module('apps.processing.migrations.0008_transcript_timestamps_to_columns')
+
+        legacy = Transcript.objects.create(text='раз два', timestamps=[
+            {'start': '00:01', 'end': '00:02', 'text': 'раз'},
+            {'start': '01:00', 'end': None, 'text': 'два'},
+        ])
+        broken = Transcript.objects.create(text='txt', timestamps=[0, 1, 2])
+        migration.timestamps_to_columns(django_apps, None)
+        legacy.refresh_from_db()
+        broken.refresh_from_db()
+
+        self.assertIsNone(legacy.timestamps)
+        self.assertEqual(legacy.segments(), [
+            {'start': 1.0, 'end': 2.0, 'text': 'раз'},
+            {'start': 60.0, 'end': None, 'text': 'два'},
+        ])
+        self.assertEqual(legacy.legacy_timestamps()[1], {'start': '01:00', 'end': None, 'text': 'два'})
+        self.assertEqual(broken.timestamps, [0, 1, 2])
+
+
+@override_settings(LLM_CACHE_ENABLED=True, LLM_CACHE_TTL_SECONDS=3600, LLM_CACHE_MAX_MB=1)
+class LLMCacheTests(TestCase):
+    def setUp(self):
+        self.stats = llm_cache.stats()
+        self.backend = MagicMock(model_id='m')
+        self.backend.complete.return_value = 'ответ'
+        backend_patch = patch('apps.processing.tasks.get_llm_backend', return_value=self.backend)
+        backend_patch.start()
+        self.addCleanup(backend_patch.stop)
+
+    def delta(self):
+        stats = llm_cache.stats()
+        return stats['hits'] - self.stats['hits'], stats['misses'] - self.stats['misses']
+
+    def test_repeated_prompt_served_from_cache(self):
+        self.assertEqual(call_llama("лекция", max_tokens=100), 'ответ')
+        self.assertEqual(call_llama("лекция", max_tokens=100), 'ответ')
+        self.assertEqual(self.backend.complete.call_count, 1)
+        self.assertEqual(self.delta(), (1, 1))
+        self.assertEqual(LLMCacheEntry.objects.get().hits, 1)
+
+    def test_per_call_stats_ignore_other_callers(self):
+        from apps.processing.llm_cache import CacheStats
+        call_llama("лекция")
+        job_stats = CacheStats()
+        call_llama("лекция", cache_stats=job_stats)
+        call_llama("другая лекция", cache_stats=job_stats)
+        # вызов без счётчика (другая задача) в счётчик задачи не попадает
+        call_llama("третья лекция")
+        self.assertEqual((job_stats.hits, job_stats.misses), (1, 1))
+        self.assertEqual(self.delta(), (1, 3))
+
+    def test_eviction_runs_after_threshold_of_writes(self):
+        with patch.object(llm_cache, 'evict') as mock_evict, patch.object(llm_cache, '_written', 0):
+            llm_cache.put(llm_cache.make_key('m', 'a'), 'm', "x" * 1024)
+            mock_evict.assert_not_called()
+            llm_cache.put(llm_cache.make_key('m', 'b'), 'm', "x" * (64 * 1024))
+            mock_evict.assert_called_once()
+
+    def test_generation_params_are_part_of_key(self):
+        call_llama("лекция", max_tokens=100)
+        call_llama("лекция", max_tokens=200)
+        self.assertEqual(self.backend.complete.call_count, 2)
+
+    def test_bypass(self):
+        call_llama("лекция", use_cache=False)
+        with override_settings(LLM_CACHE_ENABLED=False):
+            call_llama("лекция")
+        self.assertEqual(self.backend.complete.call_count, 2)
+        self.assertFalse(LLMCacheEntry.objects.exists())
+
+    def test_expired_entry_is_refetched(self):
+        call_llama("лекция")
+        LLMCacheEntry.objects.update(created_at=timezone.now() - timedelta(hours=2))
+        call_llama("лекция")
+        self.assertEqual(self.backend.complete.call_count, 2)
+        self.assertEqual(self.delta(), (0, 2))
+
+    def test_size_bound_evicts_least_recently_used(self):
+        big = "x" * (400 * 1024)
+        for name in ('a', 'b'):
+            llm_cache.put(llm_cache.make_key('m', name), 'm', big)
+        llm_cache.get(llm_cache.make_key('m', 'a'))
+        llm_cache.put(llm_cache.make_key('m', 'c'), 'm', big)
+
+        self.assertIsNone(llm_cache.get(llm_cache.make_key('m', 'b')))
+        self.assertEqual(llm_cache.get(llm_cache.make_key('m', 'a')), big)
+        self.assertLessEqual(llm_cache.status()['size'], 1024 * 1024)
+
+
+def http_response(status_code, data=None, headers=None):
+    response = MagicMock(status_code=status_code, headers=headers or {}, text=str(data))
+    response.json.return_value = data
+    return response
+
+
+@override_settings(LLM_MAX_RETRIES=2, LLM_RETRY_BACKOFF=1.0, LLM_RETRY_BACKOFF_MAX=10.0, LLM_HTTP_POOL_SIZE=4)
+class LLMClientTests(SimpleTestCase):
+    def setUp(self):
+        self.sleeps = []
+        self.client = LLMClient(sleep=self.sleeps.append)
+        self.client.session.post = MagicMock()
+
+    def test_retries_rate_limited_and_server_errors(self):
+        self.client.session.post.side_effect = [
+            http_response(429, headers={'Retry-After': '3'}),
+            http_response(502),
+            http_response(200, {'ok': True}),
+        ]
+        self.assertEqual(self.client.post_json('http://llm', {}), {'ok': True})
+        self.assertEqual(self.client.session.post.call_count, 3)
+        self.assertEqual(self.sleeps[0], 3.0)
+        self.assertLessEqual(self.sleeps[1], 2.0)
+        self.assertEqual(self.client.status()['retries'], 2)
+        self.assertEqual(self.client.status()['latency']['count'], 3)
+
+    def test_long_retry_after_fails_without_waiting(self):
+        self.client.session.post.return_value = http_response(429, headers={'Retry-After': '3600'})
+        with self.assertRaises(LLMRequestError) as ctx:
+            self.client.post_json('http://llm', {})
+        self.assertEqual(ctx.exception.status_code, 429)
+        self.assertEqual(self.client.session.post.call_count, 1)
+        self.assertEqual(self.sleeps, [])
+
+    def test_non_json_success_raises_client_error(self):
+        page = http_response(200, '<html>Bad gateway</html>')
+        page.json.side_effect = ValueError("Expecting value")
+        self.client.session.post.return_value = page
+        with self.assertRaises(LLMRequestError) as ctx:
+            self.client.post_json('http://llm', {})
+        self.assertEqual(ctx.exception.status_code, 200)
+        self.assertEqual(self.client.session.post.call_count, 3)
+
+        self.client.session.post.reset_mock()
+        self.client.session.post.side_effect = [page, http_response(200, {'ok': True})]
+        self.assertEqual(self.client.post_json('http://llm', {}), {'ok': True})
+
+    def test_client_error_not_retried(self):
+        self.client.session.post.return_value = http_response(400, 'bad request')
+        with self.assertRaises(LLMRequestError) as ctx:
+            self.client.post_json('http://llm', {})
+        self.assertEqual(ctx.exception.status_code, 400)
+        self.assertEqual(self.client.session.post.call_count, 1)
+
+    def test_gives_up_after_max_retries(self):
+        import requests
+        self.client.session.post.side_effect = requests.ConnectionError("reset")
+        with self.assertRaises(LLMRequestError):
+            self.client.post_json('http://llm', {})
+        self.assertEqual(self.client.session.post.call_count, 3)
+        self.assertEqual(self.client.status()['failures'], 1)
+
+    def test_timeout_passed_to_session(self):
+        self.client.session.post.return_value = http_response(200, {})
+        with override_settings(LLM_CONNECT_TIMEOUT=5, LLM_READ_TIMEOUT=60):
+            self.client.post_json('http://llm', {})
+        self.assertEqual(self.client.session.post.call_args.kwargs['timeout'], (5, 60))
+
+    def test_token_bucket_limits_rate(self):
+        now = [0.0]
+        bucket = LocalTokenBucket(rate=2, burst=2, clock=lambda: now[0])
+        self.assertEqual(bucket.try_acquire(), 0)
+        self.assertEqual(bucket.try_acquire(), 0)
+        self.assertAlmostEqual(bucket.try_acquire(), 0.5)
+        now[0] = 0.5
+        self.assertEqual(bucket.try_acquire(), 0)
+
+    def test_latency_histogram_is_cumulative(self):
+        histogram = LatencyHistogram(buckets=(1, 5))
+        for seconds in (0.2, 3, 3, 100):
+            histogram.observe(seconds)
+        self.assertEqual(histogram.snapshot()['buckets'], {'1': 1, '5': 3, '+Inf': 4})
+
+
+@override_settings(LLM_MAX_RETRIES=2, LLM_RETRY_BACKOFF=0.01, LLM_HTTP_POOL_SIZE=4)
+class LLMBackendTests(SimpleTestCase):
+    def setUp(self):
+        client_patch = patch('apps.processing.llm_backends.get_llm_client', return_value=LLMClient())
+        client_patch.start()
+        self.addCleanup(client_patch.stop)
+
+    def start_standin(self, **kwargs):
+        server, url = start_standin_server(latency=0, tokens_per_second=10000, **kwargs)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server, url
+
+    def test_backend_selected_from_settings(self):
+        with override_settings(LLM_BACKEND='openai', LLM_API_URL='http://local/v1/chat/completions',
+                               LLM_MODEL_ID='local-model', LLM_API_KEY=''):
+            backend = get_llm_backend()
+        self.assertIsInstance(backend, OpenAICompatibleBackend)
+        self.assertEqual(backend.model_id, 'local-model')
+        with override_settings(LLM_BACKEND='unknown'):
+            with self.assertRaises(ValueError):
+                get_llm_backend()
+
+    def test_openrouter_requires_key(self):
+        with self.assertRaises(EnvironmentError):
+            OpenRouterBackend('http://llm', 'model', api_key='').complete("привет")
+
+    def test_completion_through_standin_server(self):
+        server, url = self.start_standin()
+        answer = OpenAICompatibleBackend(url, 'standin').complete("привет", max_tokens=5)
+        self.assertEqual(answer.split(), ["токен"] * 5)
+        self.assertEqual(server.requests, 1)
+
+    def test_standin_overload_is_retried(self):
+        server, url = self.start_standin(fail_every=2)
+        backend = OpenAICompatibleBackend(url, 'standin')
+        backend.complete("первый", max_tokens=1)
+        backend.complete("второй", max_tokens=1)
+        self.assertEqual(server.requests, 3)
+
+
+class FakeHypothesis:
+    def __init__(self, seconds):
+        self.text = " ".join(f"n{i}" for i in range(seconds))
+        self.timestamp = {'word': [{'word': f"n{i}", 'start': float(i), 'end': i + 0.5} for i in range(seconds)]}
+
+
+class ASREngineTests(SimpleTestCase):
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            get_engine('missing')
+        with override_settings(ASR_ENGINE='nemo_ctc'):
+            self.assertEqual(get_engine().name, 'nemo_ctc')
+
+    def test_nemo_result_normalized(self):
+        result = nemo_result(FakeHypothesis(2), 10.0)
+        self.assertEqual(result['text'], "n0 n1")
+        self.assertEqual(result['segments'][1], {'start': 11.0, 'end': 11.5, 'text': 'n1'})
+
+    def test_nemo_engine_splits_long_windows(self):
+        model = MagicMock()
+        model.transcribe.side_effect = lambda audio, **kwargs: [FakeHypothesis(len(a) // 16000) for a in audio]
+        samples = np.concatenate([tone(29.0), silence(0.5), tone(15.5)])
+        with patch('apps.processing.engines.nemo_registry') as mock_registry:
+            mock_registry.get.return_value = model
+            text, timestamps, audio_seconds = NemoCTCEngine().transcribe_stream([(60.0, samples)], batch_size=4)
+
+        # окно 45 с режется в паузе около 29 с, таймкоды второго куска сдвинуты на его начало
+        first, second = model.transcribe.call_args.args[0]
+        self.assertAlmostEqual(len(first) / 16000, 29.0, delta=0.1)
+        self.assertEqual(len(first) + len(second), len(samples))
+        self.assertAlmostEqual(timestamps[0]['start'], 60.0)
+        self.assertAlmostEqual(timestamps[29]['start'], 89.0, delta=0.1)
+        self.assertAlmostEqual(audio_seconds, 45.0)
+
+
+class FlakyWordTimestampsPipe(FakeWhisperPipe):
+    """Пословные таймкоды падают, если во входе есть «плохой» участок (амплитуда 0.9)."""
+    def __call__(self, inputs, **kwargs):
+        items = inputs if isinstance(inputs, list) else [inputs]
+        if kwargs.get("return_timestamps") == "word" and any(np.max(np.abs(i["raw"])) > 0.8 for i in items):
+            self.calls.append(("failed", len(items)))
+            raise RuntimeError("cross attention alignment failed")
+        self.calls.append((kwargs.get("return_timestamps"), len(items)))
+        return super().__call__(inputs, **kwargs)
+
+
+class ChunkFallbackTests(SimpleTestCase):
+    def test_only_failing_chunk_falls_back_to_sentences(self):
+        pipe = FlakyWordTimestampsPipe()
+        bad_window = np.concatenate([tone(29.0), silence(0.5), tone(28.0, amplitude=0.9), silence(1.0), tone(20.0)])
+        windows = [(0.0, tone(30.0)), (100.0, bad_window)]
+        stats = TranscriptionStats()
+
+        text, timestamps, _ = transcribe_stream(pipe, windows, batch_size=8, stats=stats)
+
+        self.assertEqual(stats.chunks, 4)
+        self.assertEqual(stats.degraded_chunks, 1)
+        self.assertIn("1 из 4", str(stats))
+        # пересчитан по предложениям только плохой чанк; хорошее окно не распознавалось повторно
+        self.assertEqual([c for c in pipe.calls if c[0] is True], [(True, 1)])
+        self.assertGreater(len(text.split()), 30 + 70)
+        self.assertEqual(timestamps[30]['start'], 100.0)
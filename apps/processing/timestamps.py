@@ -0,0 +1,134 @@
+import bisect
+import math
+import sys
+from array import array
+
+
+def format_timestamp(seconds: float) -> str:
+    mins, secs = divmod(int(seconds), 60)
+    return f"{mins:02}:{secs:02}"
+
+
+def parse_timestamp(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    seconds = 0
+    for part in str(value).split(':'):
+        seconds = seconds * 60 + int(part)
+    return float(seconds)
+
+
+def format_segments(segments):
+    """Пословные таймкоды в прежнем формате API: start/end строками MM:SS."""
+    return [{
+        "start": format_timestamp(s["start"]),
+        "end": format_timestamp(s["end"]) if s["end"] is not None else None,
+        "text": s["text"],
+    } for s in segments]
+
+
+def normalize_segments(items):
+    """
+    Приводит таймкоды любого из сохранявшихся форматов (MM:SS или секунды)
+    к [{'start', 'end', 'text'}] в секундах; нераспознанные элементы пропускаются.
+    """
+    segments = []
+    for item in items or []:
+        if not isinstance(item, dict):
+            continue
+        try:
+            start = parse_timestamp(item.get('start'))
+            end = parse_timestamp(item.get('end'))
+        except ValueError:
+            continue
+        if start is not None:
+            segments.append({'start': start, 'end': end, 'text': item.get('text') or ''})
+    return segments
+
+
+def pack(typecode, values):
+    # Колонки хранятся в little-endian независимо от платформы
+    data = array(typecode, values)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    return data.tobytes()
+
+
+def unpack(typecode, blob):
+    data = array(typecode)
+    data.frombytes(bytes(blob or b''))
+    if sys.byteorder != 'little':
+        data.byteswap()
+    return data
+
+
+def align_words(text, words):
+    """
+    Ищет слова по порядку в тексте: (spans, unaligned), где spans — плоский список
+    пар (смещение, длина), а слова, которых в тексте нет, — {индекс: слово} с парой (-1, 0).
+    """
+    spans = []
+    unaligned = {}
+    cursor = 0
+    for i, word in enumerate(words):
+        position = text.find(word, cursor) if word else -1
+        if position < 0:
+            spans.extend((-1, 0))
+            if word:
+                unaligned[str(i)] = word
+            continue
+        spans.extend((position, len(word)))
+        cursor = position + len(word)
+    return spans, unaligned
+
+
+def encode_segments(text, segments):
+    """
+    Колоночное представление таймкодов для Transcript: начала и концы float32
+    (NaN — конец неизвестен) и пары int32 (смещение, длина) слова в text.
+    Слова упорядочиваются по началу (устойчиво), чтобы word_range мог искать бинарно.
+    """
+    spans, unaligned = align_words(text, [s['text'] for s in segments])
+    # Слова сопоставляются с текстом в его порядке, а сортируются уже вместе со своими смещениями
+    order = sorted(range(len(segments)), key=lambda i: segments[i]['start'])
+    return {
+        'starts': pack('f', [segments[i]['start'] for i in order]),
+        'ends': pack('f', [math.nan if segments[i]['end'] is None else segments[i]['end'] for i in order]),
+        'spans': pack('i', [value for i in order for value in spans[2 * i:2 * i + 2]]),
+        'unaligned_words': {str(row): unaligned[str(i)] for row, i in enumerate(order) if str(i) in unaligned},
+    }
+
+
+def decode_columns(starts, ends, spans, first=0, stop=None):
+    """
+    Колонки таймкодов слов [first, stop): (starts, ends, offsets, lengths);
+    секунды округлены до миллисекунд.
+    """
+    pairs = unpack('i', spans)[2 * first:None if stop is None else 2 * stop]
+    return (
+        [round(value, 3) for value in unpack('f', starts)[first:stop]],
+        [None if math.isnan(value) else round(value, 3) for value in unpack('f', ends)[first:stop]],
+        list(pairs[0::2]),
+        list(pairs[1::2]),
+    )
+
+
+def word_range(starts, start, end):
+    """
+    Индексы [first, stop) слов, начинающихся в [start, end) секунд. Начала слов
+    идут по возрастанию (см. encode_segments), поэтому хватает бинарного поиска по колонке starts.
+    """
+    values = unpack('f', starts)
+    return bisect.bisect_left(values, start), bisect.bisect_left(values, end)
+
+
+def decode_segments(text, starts, ends, spans, unaligned_words=None):
+    unaligned_words = unaligned_words or {}
+    starts, ends, offsets, lengths = decode_columns(starts, ends, spans)
+    segments = []
+    for i, (start, end, offset, length) in enumerate(zip(starts, ends, offsets, lengths)):
+        word = text[offset:offset + length] if offset >= 0 else unaligned_words.get(str(i), '')
+        segments.append({'start': start, 'end': end, 'text': word})
+    return segments
@@ -0,0 +1,171 @@
+import logging
+import math
+
+import numpy as np
+
+from .asr import CHUNK_LENGTH_S
+from .audio import SAMPLE_RATE
+from .vad import FRAME_S, frame_energy_db
+
+logger = logging.getLogger(__name__)
+
+ASR_GENERATE_KWARGS = {
+    "language": "russian",
+    "task": "transcribe",
+}
+
+
+class TranscriptionStats:
+    def __init__(self):
+        self.chunks = 0
+        self.degraded_chunks = 0
+
+    def add(self, other):
+        self.chunks += other.chunks
+        self.degraded_chunks += other.degraded_chunks
+
+    def __str__(self):
+        return (f"ASR: таймкоды по предложениям вместо пословных в {self.degraded_chunks} "
+                f"из {self.chunks} чанков")
+
+
+def chunk_bounds(chunk):
+    start = None
+    end = None
+    if isinstance(chunk, dict):
+        if "start" in chunk and "end" in chunk:
+            start = chunk.get("start")
+            end = chunk.get("end")
+        elif "timestamp" in chunk:
+            ts = chunk.get("timestamp")
+            if isinstance(ts, (list, tuple)) and len(ts) >= 1:
+                start = ts[0]
+                if len(ts) >= 2:
+                    end = ts[1]
+    return start, end
+
+
+def window_result(result, offset):
+    """
+    Приводит ответ пайплайна к общему виду движков ASR: {'text', 'segments'}, где
+    segments — [{'start', 'end', 'text'}] в секундах от начала записи.
+    """
+    segments = []
+    for c in result.get("chunks", []) or []:
+        start, end = chunk_bounds(c)
+        if start is not None:
+            segments.append({
+                "start": start + offset,
+                "end": end + offset if end is not None else None,
+                "text": c.get("text", "").strip()
+            })
+    return {"text": result.get("text", "").strip(), "segments": segments}
+
+
+def merge_results(results):
+    return {
+        "text": " ".join(r["text"] for r in results if r["text"]),
+        "segments": [segment for r in results for segment in r["segments"]],
+    }
+
+
+def run_pipe(whisper_pipe, items, batch_size, return_timestamps):
+    inputs = [{"raw": samples, "sampling_rate": SAMPLE_RATE} for _, samples in items]
+    results = whisper_pipe(inputs if len(inputs) > 1 else inputs[0], return_timestamps=return_timestamps,
+                           batch_size=batch_size, generate_kwargs=ASR_GENERATE_KWARGS)
+    return results if len(inputs) > 1 else [results]
+
+
+def transcribe_windows(whisper_pipe, windows, batch_size=1, stats=None):
+    """
+    Транскрибирует группу окон (offset, samples) одним вызовом пайплайна: 30-секундные
+    чанки всех окон собираются в батчи по batch_size. Окна могут принадлежать разным
+    записям — смещения считаются для каждого окна отдельно.
+
+    Если пословные таймкоды падают, группа делится пополам, а окно — на 30-секундные
+    чанки, пока ошибка не локализуется в одном чанке. Только он пересчитывается
+    с таймкодами по предложениям, остальные сохраняют пословные.
+    """
+    try:
+        results = run_pipe(whisper_pipe, windows, batch_size, "word")
+    except RuntimeError as e:
+        if len(windows) > 1:
+            middle = len(windows) // 2
+            return (transcribe_windows(whisper_pipe, windows[:middle], batch_size, stats)
+                    + transcribe_windows(whisper_pipe, windows[middle:], batch_size, stats))
+        offset, samples = windows[0]
+        if window_chunks(samples) > 1:
+            chunks = list(split_chunks(offset, samples))
+            return [merge_results(transcribe_windows(whisper_pipe, chunks, batch_size, stats))]
+        logger.warning("Word-level timestamps failed for chunk at %.1f s, fallback to sentence-level: %s",
+                       offset, e)
+        if stats is not None:
+            stats.degraded_chunks += 1
+        results = run_pipe(whisper_pipe, windows, batch_size, True)
+    return [window_result(result, offset) for result, (offset, _) in zip(results, windows)]
+
+
+def window_chunks(samples):
+    return max(1, math.ceil(len(samples) / (SAMPLE_RATE * CHUNK_LENGTH_S)))
+
+
+def split_chunks(offset, samples, chunk_s=CHUNK_LENGTH_S, search_s=3.0):
+    """
+    Делит окно на куски не длиннее chunk_s. Разрез ставится в самый тихий кадр
+    последних search_s секунд куска, чтобы не резать слово пополам.
+    """
+    chunk = int(chunk_s * SAMPLE_RATE)
+    search = int(search_s * SAMPLE_RATE)
+    frame = int(FRAME_S * SAMPLE_RATE)
+    start = 0
+    while len(samples) - start > chunk:
+        lookup = start + chunk - search
+        energies = frame_energy_db(samples[lookup:start + chunk])
+        cut = lookup + int(np.argmin(energies)) * frame if energies.size else start + chunk
+        yield offset + start / SAMPLE_RATE, samples[start:cut]
+        start = cut
+    yield offset + start / SAMPLE_RATE, samples[start:]
+
+
+def group_windows(windows, batch_size):
+    # Окна объединяются в вызов, пока их 30-секундные чанки не заполнят батч
+    group = []
+    chunks = 0
+    for window in windows:
+        group.append(window)
+        chunks += window_chunks(window[1])
+        if chunks >= batch_size:
+            yield group
+            group = []
+            chunks = 0
+    if group:
+        yield group
+
+
+def collect_stream(transcribe_group, windows, batch_size=1, stats=None):
+    """
+    Прогоняет поток окон через transcribe_group(group) -> [{'text', 'segments'}] и
+    склеивает результат: (text, пословные таймкоды в секундах, секунд аудио).
+    """
+    texts = []
+    timestamps = []
+    audio_seconds = 0.0
+    for group in group_windows(windows, batch_size):
+        audio_seconds += sum(len(samples) for _, samples in group) / SAMPLE_RATE
+        if stats is not None:
+            stats.chunks += sum(window_chunks(samples) for _, samples in group)
+        for result in transcribe_group(group):
+            texts.append(result["text"])
+            timestamps.extend(result["segments"])
+    return " ".join(t for t in texts if t), timestamps, audio_seconds
+
+
+def transcribe_stream(whisper_pipe, windows, batch_size=1, stats=None):
+    return collect_stream(lambda group: transcribe_windows(whisper_pipe, group, batch_size, stats),
+                          windows, batch_size, stats)
+
+
+def format_throughput(audio_seconds, wall_seconds, batch_size):
+    speed = audio_seconds / wall_seconds if wall_seconds > 0 else 0.0
+    return (f"ASR: {audio_seconds:.1f} с аудио за {wall_seconds:.1f} с "
+            f"({speed:.2f} audio-s/wall-s), batch_size={batch_size}")
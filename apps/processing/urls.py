@@ -1,7 +1,11 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import VideoJobViewSet
+from .views import SearchAPIView, VideoJobViewSet, job_events
 
 router = DefaultRouter()
 router.register(r'jobs', VideoJobViewSet, basename='videojob')
 
-urlpatterns = router.urls
+urlpatterns = [
+    path('search/', SearchAPIView.as_view(), name='processing-search'),
+    path('events/', job_events, name='processing-events'),
+] + router.urls
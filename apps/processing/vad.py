@@ -0,0 +1,126 @@
+import numpy as np
+
+from .audio import SAMPLE_RATE
+
+FRAME_S = 0.03
+# Порог речи адаптируется к шумовому фону окна, но остаётся в этих пределах (dBFS)
+MARGIN_DB = 12.0
+MIN_THRESHOLD_DB = -50.0
+MAX_THRESHOLD_DB = -35.0
+
+
+class VADStats:
+    def __init__(self):
+        self.total_seconds = 0.0
+        self.speech_seconds = 0.0
+
+    def add(self, total_seconds, speech_seconds):
+        self.total_seconds += total_seconds
+        self.speech_seconds += speech_seconds
+
+    @property
+    def skipped_seconds(self):
+        return max(0.0, self.total_seconds - self.speech_seconds)
+
+    @property
+    def skipped_ratio(self):
+        return self.skipped_seconds / self.total_seconds if self.total_seconds else 0.0
+
+    def __str__(self):
+        return (f"VAD: речь {self.speech_seconds:.1f} с из {self.total_seconds:.1f} с, "
+                f"пропущено {self.skipped_seconds:.1f} с ({self.skipped_ratio:.0%})")
+
+
+def frame_energy_db(samples, sample_rate=SAMPLE_RATE, frame_s=FRAME_S):
+    frame = int(sample_rate * frame_s)
+    count = len(samples) // frame
+    if count == 0:
+        return np.empty(0, dtype=np.float32)
+    frames = np.asarray(samples[:count * frame], dtype=np.float32).reshape(count, frame)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20 * np.log10(rms + 1e-10)
+
+
+def detect_speech(samples, sample_rate=SAMPLE_RATE, min_silence_s=2.0, min_speech_s=0.25, padding_s=0.2):
+    """
+    Энергетический VAD: возвращает отсортированные интервалы речи [(start_s, end_s)]
+    относительно начала samples. Паузы короче min_silence_s не разрывают интервал.
+    """
+    energies = frame_energy_db(samples, sample_rate)
+    if not energies.size:
+        return []
+    noise_floor = float(np.percentile(energies, 10))
+    threshold = min(max(noise_floor + MARGIN_DB, MIN_THRESHOLD_DB), MAX_THRESHOLD_DB)
+    voiced = np.concatenate(([0], (energies > threshold).astype(np.int8), [0]))
+    edges = np.flatnonzero(np.diff(voiced))
+
+    duration = len(samples) / sample_rate
+    regions = []
+    for start_frame, end_frame in zip(edges[::2], edges[1::2]):
+        start = start_frame * FRAME_S
+        # хвост короче кадра относится к последнему интервалу
+        end = duration if end_frame == len(energies) else end_frame * FRAME_S
+        if regions and start - regions[-1][1] < min_silence_s:
+            regions[-1][1] = end
+        else:
+            regions.append([start, end])
+
+    speech = []
+    for start, end in regions:
+        if end - start < min_speech_s:
+            continue
+        start = max(0.0, start - padding_s)
+        end = min(duration, end + padding_s)
+        if speech and start <= speech[-1][1]:
+            speech[-1] = (speech[-1][0], end)
+        else:
+            speech.append((start, end))
+    return speech
+
+
+def quietest_split(samples, sample_rate=SAMPLE_RATE):
+    """Позиция (в сэмплах) середины самого тихого кадра внутри samples, кроме крайних."""
+    energies = frame_energy_db(samples, sample_rate)
+    if energies.size < 3:
+        return len(samples) // 2
+    frame = int(sample_rate * FRAME_S)
+    return (int(np.argmin(energies[1:-1])) + 1) * frame + frame // 2
+
+
+def speech_windows(windows, stats=None, sample_rate=SAMPLE_RATE, max_carry_s=600, **vad_kwargs):
+    """
+    Оставляет из потока окон (offset, samples) только речь: отдаёт фрагменты
+    (offset + start, samples[start:end]) с исходными смещениями на таймлайне.
+    Речь, упирающаяся в границу окна, склеивается с началом следующего окна;
+    накопленная без пауз дольше max_carry_s режется по самому тихому месту.
+    """
+    carry = None
+    for offset, samples in windows:
+        duration = len(samples) / sample_rate
+        regions = detect_speech(samples, sample_rate, **vad_kwargs)
+        if stats is not None:
+            stats.add(duration, sum(end - start for start, end in regions))
+
+        if carry is not None and (not regions or regions[0][0] > 0):
+            yield carry
+            carry = None
+
+        for start, end in regions:
+            piece = samples[int(start * sample_rate):int(end * sample_rate)]
+            piece_offset = offset + start
+            if carry is not None:
+                piece_offset = carry[0]
+                piece = np.concatenate([carry[1], piece])
+                carry = None
+            if end < duration:
+                yield piece_offset, piece
+                continue
+            if len(piece) >= max_carry_s * sample_rate:
+                # Разрез по границе окна пришёлся бы на середину слова; остаток копится дальше
+                split = quietest_split(piece, sample_rate)
+                yield piece_offset, piece[:split]
+                piece_offset, piece = piece_offset + split / sample_rate, piece[split:]
+            carry = (piece_offset, piece)
+
+    if carry is not None:
+        yield carry
@@ -1,15 +1,30 @@
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse
 from rest_framework import viewsets, status, permissions
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
 
-from .models import VideoJob
+from .models import VideoJob, Transcript, SearchEntry
 from .serializers import (
     VideoJobSerializer,
     TranscriptSerializer,
     SummarySerializer,
-    NotesSerializer
+    NotesSerializer,
+    SearchResultSerializer,
 )
-from .tasks import process_video_job
+from .events import get_event_backend, job_event, publish_job_event
+from .scheduling import stale_filter
+from .search import search_entries
+from .signatures import dispatch_jobs
 
 
 class CanAccessJob(permissions.BasePermission):
@@ -44,19 +59,79 @@ class VideoJobViewSet(viewsets.ModelViewSet):
         user = request.user
         if recording.owner != user and not recording.group.members.filter(id=user.id).exists():
             return Response({'detail': 'Нет доступа к этой записи.'}, status=status.HTTP_403_FORBIDDEN)
-        job = serializer.save()
-        process_video_job.delay(job.id)
+        # Повторный запуск по уже обработанной записи — интерактивный, вне очереди бэклога.
+        # Сам пользователь может только уступить очередь (priority=2), но не обогнать другие группы
+        requested = request.data.get('priority')
+        if requested is not None and str(requested) != str(VideoJob.PRIORITY_BACKLOG):
+            return Response({'detail': 'Можно указать только priority=2 (бэклог).'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if requested is not None:
+            priority = VideoJob.PRIORITY_BACKLOG
+        elif recording.jobs.exists():
+            priority = VideoJob.PRIORITY_INTERACTIVE
+        else:
+            priority = VideoJob.PRIORITY_UPLOAD
+        job = serializer.save(priority=priority)
+        dispatch_jobs.delay()
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
+    @action(detail=True, methods=['post'])
+    def resume(self, request, pk=None):
+        """
+        Перезапуск упавшей или потерянной (воркер убит, см. scheduling.stale_filter) задачи:
+        готовые стадии не повторяются, см. apps.processing.checkpoints.
+        """
+        job = self.get_object()
+        resumed = VideoJob.objects.filter(Q(status='FAILED') | stale_filter(), id=job.id).update(
+            status='PENDING', stage='queued', dispatched_at=None, finished_at=None,
+            priority=VideoJob.PRIORITY_INTERACTIVE,
+        )
+        if not resumed:
+            return Response({'detail': 'Продолжить можно только задачу, завершившуюся ошибкой или потерянную.'},
+                            status=status.HTTP_409_CONFLICT)
+        job.refresh_from_db()
+        publish_job_event(job, 'stage')
+        dispatch_jobs.delay()
+        return Response(self.get_serializer(job).data)
+
     @action(detail=True, methods=['get'])
     def transcript(self, request, pk=None):
         job = self.get_object()
         if hasattr(job, 'transcript'):
-            serializer = TranscriptSerializer(job.transcript)
+            serializer = TranscriptSerializer(
+                job.transcript, context={'timestamps': request.query_params.get('timestamps')})
             return Response(serializer.data)
         return Response(status=status.HTTP_404_NOT_FOUND)
 
+    @action(detail=True, methods=['get'], url_path='transcript/range')
+    def transcript_range(self, request, pk=None):
+        """Слова транскрипта в окне ?from=&to= (секунды) с продолжением по ?cursor=."""
+        job = self.get_object()
+        transcript = Transcript.objects.filter(job=job).defer('text').first()
+        if transcript is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        params = request.query_params
+        try:
+            start = float(params.get('from', 0))
+            end = float(params.get('to', math.inf))
+            cursor = int(params.get('cursor', 0))
+            limit = int(params.get('limit', settings.TRANSCRIPT_RANGE_MAX_WORDS))
+        except ValueError:
+            return Response({'detail': 'from и to — секунды, cursor и limit — целые числа.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if math.isnan(start) or math.isnan(end) or cursor < 0 or limit < 1:
+            return Response({'detail': 'Некорректные параметры окна.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        segments, next_cursor = transcript.window(start, end, cursor,
+                                                  min(limit, settings.TRANSCRIPT_RANGE_MAX_WORDS))
+        return Response({
+            'from': start,
+            'to': None if math.isinf(end) else end,
+            'segments': segments,
+            'next_cursor': next_cursor,
+        })
+
     @action(detail=True, methods=['get'])
     def summary(self, request, pk=None):
         job = self.get_object()
@@ -72,3 +147,77 @@ class VideoJobViewSet(viewsets.ModelViewSet):
             serializer = NotesSerializer(job.notes)
             return Response(serializer.data)
         return Response(status=status.HTTP_404_NOT_FOUND)
+
+
+class SearchAPIView(APIView):
+    """Полнотекстовый поиск по транскриптам, пересказам и конспектам групп пользователя."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'detail': 'Укажите поисковый запрос в параметре q.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        kind = request.query_params.get('kind')
+        if kind and kind not in dict(SearchEntry.KIND_CHOICES):
+            return Response({'detail': 'kind: transcript, summary или notes.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            group_id = int(request.query_params['group']) if request.query_params.get('group') else None
+            limit = min(int(request.query_params.get('limit', 20)), 100)
+        except ValueError:
+            return Response({'detail': 'group и limit — целые числа.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = search_entries(request.user, query, group_id=group_id, kind=kind, limit=max(limit, 1))
+        return Response({'query': query, 'results': SearchResultSerializer(results, many=True).data})
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def event_stream_user(request):
+    """
+    Пользователь потока событий: JWT из Authorization или из ?access_token= —
+    EventSource в браузере не умеет передавать заголовки.
+    """
+    auth = JWTAuthentication()
+    try:
+        result = auth.authenticate(request)
+        if result is None and request.GET.get('access_token'):
+            token = auth.get_validated_token(request.GET['access_token'])
+            result = auth.get_user(token), token
+    except (AuthenticationFailed, InvalidToken):
+        return None
+    return result[0] if result else None
+
+
+def active_jobs_snapshot(user):
+    jobs = (VideoJob.objects.filter(recording__group__members=user, status__in=['PENDING', 'RUNNING'])
+            .distinct().order_by('id'))
+    return [job_event(job, 'snapshot') for job in jobs]
+
+
+async def job_events(request):
+    """
+    Поток событий задач групп пользователя (text/event-stream): сначала снимок незавершённых
+    задач, затем stage/progress/done/failed из воркеров. Заменяет опрос списка задач;
+    требует ASGI-сервера (uvicorn config.asgi:application).
+    """
+    user = await sync_to_async(event_stream_user)(request)
+    if user is None:
+        return JsonResponse({'detail': 'Требуется авторизация.'}, status=401)
+    group_ids = await sync_to_async(lambda: list(user.member_groups.values_list('id', flat=True)))()
+
+    async def stream():
+        # Подписка до снимка: событие между ними не потеряется, в худшем случае придёт дважды
+        async with get_event_backend().subscribe(group_ids) as next_event:
+            yield sse('snapshot', {'jobs': await sync_to_async(active_jobs_snapshot)(user)})
+            while True:
+                event = await next_event(settings.PROCESSING_EVENTS_HEARTBEAT)
+                # комментарий-пинг не даёт прокси закрыть простаивающее соединение
+                yield ': ping\n\n' if event is None else sse(event['event'], event)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,97 @@
+import mimetypes
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core import signing
+from django.http import HttpResponse, StreamingHttpResponse
+
+MEDIA_TOKEN_SALT = 'recordings.media'
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+STREAM_BLOCK_SIZE = 64 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def sign_media_token(recording, user):
+    # Тег <video> не умеет слать Authorization, поэтому доступ к файлу передаётся подписанной ссылкой
+    return signing.dumps({'r': recording.pk, 'u': user.pk}, salt=MEDIA_TOKEN_SALT, compress=True)
+
+
+def media_token_user_id(token, recording):
+    """id пользователя из подписанной ссылки на файл записи или None, если подпись неверна или истекла."""
+    try:
+        payload = signing.loads(token, salt=MEDIA_TOKEN_SALT, max_age=settings.MEDIA_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    return payload.get('u') if payload.get('r') == recording.pk else None
+
+
+def parse_range(header, size):
+    """
+    Диапазон из заголовка Range: (start, end) включительно или None, если отдавать файл целиком
+    (заголовка нет, он не разобран или диапазонов несколько).
+    """
+    match = RANGE_RE.match((header or '').replace(' ', ''))
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if size == 0:
+        # у пустого файла нет ни одного байта, который можно вернуть
+        raise RangeNotSatisfiable()
+    if not first:
+        # bytes=-N — последние N байт
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable()
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        raise RangeNotSatisfiable()
+    return start, end
+
+
+def read_range(path, start, end):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            block = f.read(min(STREAM_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+def media_response(request, field_file):
+    """
+    Ответ с файлом записи. Если задан MEDIA_ACCEL_REDIRECT_PREFIX, байты отдаёт фронтовой
+    веб-сервер (nginx, X-Accel-Redirect) вместе с Range; иначе Django сам отвечает 200/206.
+    """
+    content_type = mimetypes.guess_type(field_file.name)[0] or 'application/octet-stream'
+    if settings.MEDIA_ACCEL_REDIRECT_PREFIX:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(field_file.name)
+        return response
+
+    size = field_file.size
+    try:
+        byte_range = parse_range(request.headers.get('Range'), size)
+    except RangeNotSatisfiable:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    start, end = byte_range or (0, size - 1)
+    response = StreamingHttpResponse(read_range(field_file.path, start, end),
+                                     status=206 if byte_range else 200, content_type=content_type)
+    response['Content-Length'] = str(end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    if byte_range:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
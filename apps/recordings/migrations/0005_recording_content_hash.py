@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 21:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recordings', '0004_delete_recordingsession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recording',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-17 21:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recordings', '0005_recording_content_hash'),
+        ('recordingsessions', '0003_sessionsegment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recording',
+            name='session',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recordings', to='recordingsessions.recordingsession'),
+        ),
+    ]
@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from django.conf import settings
 
@@ -13,8 +15,39 @@ class Recording(models.Model):
         related_name='recordings'
     )
     video_file = models.FileField(upload_to='videos/')
+    # sha256 содержимого: одинаковые загрузки не обрабатываются повторно
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    # сессия, во время которой запись транскрибировалась по фрагментам
+    session = models.ForeignKey(
+        'recordingsessions.RecordingSession',
+        on_delete=models.SET_NULL,
+        related_name='recordings',
+        null=True,
+        blank=True
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"{self.owner.username} - {self.created_at.strftime('%d.%m.%Y')}"
-    
\ No newline at end of file
+    
+
+class UploadSession(models.Model):
+    """
+    Загрузка записи по частям: чанки дописываются по порядку прямо в file_name,
+    после завершения создаются Recording и VideoJob, как при загрузке ботом.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='upload_sessions')
+    group = models.ForeignKey('groups.Group', on_delete=models.CASCADE, related_name='upload_sessions')
+    session = models.ForeignKey('recordingsessions.RecordingSession', on_delete=models.SET_NULL,
+                                related_name='upload_sessions', null=True, blank=True)
+    # загрузку начал бот по X-API-KEY: продолжать её можно только с тем же ключом
+    via_bot = models.BooleanField(default=False)
+    filename = models.CharField(max_length=255)
+    file_name = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    recording = models.OneToOneField(Recording, on_delete=models.SET_NULL, related_name='upload_session',
+                                     null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
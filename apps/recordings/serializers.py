@@ -1,4 +1,6 @@
+from django.urls import reverse
 from rest_framework import serializers
+from .media import sign_media_token
 from .models import Recording
 from apps.processing.models import VideoJob
 from apps.processing.models import Notes, Summary
@@ -32,9 +34,11 @@ class RecordingDetailSerializer(serializers.ModelSerializer):
         return obj.group.title if obj.group else None
 
     def get_video_file_url(self, obj):
+        # Файл отдаётся через проверку доступа, см. RecordingMediaView
         request = self.context.get('request')
-        if obj.video_file and request:
-            return request.build_absolute_uri(obj.video_file.url)
+        if obj.video_file and request and request.user.is_authenticated:
+            url = reverse('recording-media', args=[obj.pk])
+            return request.build_absolute_uri(f"{url}?token={sign_media_token(obj, request.user)}")
         return None
 
     def get_status(self, obj):
@@ -61,5 +65,18 @@ class BotUploadSerializer(serializers.Serializer):
     username = serializers.CharField()
     group_id = serializers.IntegerField()
     video_file = serializers.FileField()
+    # сессия, фрагменты которой уже распознаны по ходу записи
+    session_id = serializers.IntegerField(required=False)
+    # 2 — бэклог, например при массовой загрузке прошлых лекций
+    priority = serializers.ChoiceField(choices=VideoJob.PRIORITY_CHOICES, default=VideoJob.PRIORITY_UPLOAD)
 
 
+
+
+class UploadSessionCreateSerializer(serializers.Serializer):
+    filename = serializers.CharField(max_length=200)
+    size = serializers.IntegerField(min_value=1)
+    group_id = serializers.IntegerField()
+    # только для бота: от чьего имени загружается запись
+    username = serializers.CharField(required=False)
+    session_id = serializers.IntegerField(required=False)
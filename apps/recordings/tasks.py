@@ -0,0 +1,30 @@
+import logging
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from .models import UploadSession
+from .uploads import upload_hashers
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def expire_upload_sessions():
+    """
+    Удаляет незавершённые загрузки по частям, в которые не приходили чанки дольше
+    UPLOAD_SESSION_TTL_SECONDS, вместе с недописанным файлом в videos/.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.UPLOAD_SESSION_TTL_SECONDS)
+    expired = 0
+    for upload in UploadSession.objects.filter(recording__isnull=True, updated_at__lt=cutoff):
+        default_storage.delete(upload.file_name)
+        upload_hashers.discard(upload.id)
+        upload.delete()
+        expired += 1
+    if expired:
+        logger.info("Удалено брошенных загрузок: %s", expired)
+    return expired
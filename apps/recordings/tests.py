@@ -1,19 +1,29 @@
 # apps/recordings/tests.py
+import hashlib
 import io
+from datetime import timedelta
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.conf import settings
+from django.test import override_settings
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 from apps.groups.models import Group
-from apps.recordings.models import Recording
+from django.core.files.storage import default_storage
+from apps.recordings.models import Recording, UploadSession
+from apps.recordings.uploads import upload_hashers
 from apps.processing.models import VideoJob
+from config.celery import app as celery_app
 
 User = get_user_model()
 
 class RecordingTests(APITestCase):
     def setUp(self):
+        # диспетчер задач выполняется на месте, без брокера
+        self.addCleanup(setattr, celery_app.conf, 'task_always_eager', celery_app.conf.task_always_eager)
+        celery_app.conf.task_always_eager = True
         # Пользователи
         self.owner = User.objects.create_user('owner', 'owner@example.com', 'pass')
         self.member = User.objects.create_user('member', 'member@example.com', 'pass')
@@ -109,6 +119,66 @@ class RecordingTests(APITestCase):
         self.assertIn('status', resp.data)
         self.assertEqual(resp.data['status'], 'NOT_PROCESSED')
 
+    def media_recording(self):
+        content = bytes(range(256)) * 4
+        rec = Recording.objects.create(owner=self.owner, group=self.group,
+                                       video_file=SimpleUploadedFile('lecture.mp4', content))
+        self.addCleanup(rec.video_file.delete, save=False)
+        return rec, content
+
+    def test_media_url_streams_byte_ranges(self):
+        rec, content = self.media_recording()
+        self.client.force_authenticate(user=self.member)
+        url = self.client.get(reverse('recording-detail', args=[rec.id])).data['video_file_url']
+        self.assertIn('/media/?token=', url)
+
+        # ссылка работает без JWT: так её открывает тег <video>
+        self.client.force_authenticate(user=None)
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(resp.streaming_content), content)
+        self.assertEqual(resp['Accept-Ranges'], 'bytes')
+
+        resp = self.client.get(url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(resp.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b''.join(resp.streaming_content), content[10:20])
+        self.assertEqual(resp['Content-Range'], f'bytes 10-19/{len(content)}')
+
+        resp = self.client.get(url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(resp.streaming_content), content[-5:])
+
+        resp = self.client.get(url, HTTP_RANGE='bytes=5000-')
+        self.assertEqual(resp.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(resp['Content-Range'], f'bytes */{len(content)}')
+
+    def test_range_of_empty_file_not_satisfiable(self):
+        from apps.recordings.media import RangeNotSatisfiable, parse_range
+        self.assertEqual(parse_range('bytes=-5', 100), (95, 99))
+        self.assertIsNone(parse_range(None, 0))
+        for header in ('bytes=-5', 'bytes=0-', 'bytes=0-9'):
+            with self.assertRaises(RangeNotSatisfiable):
+                parse_range(header, 0)
+
+    def test_media_requires_group_access(self):
+        rec, _content = self.media_recording()
+        url = reverse('recording-media', args=[rec.id])
+
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.get(url, {'token': 'forged'}).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.other)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(MEDIA_ACCEL_REDIRECT_PREFIX='/protected-media/')
+    def test_media_bytes_offloaded_to_web_server(self):
+        rec, _content = self.media_recording()
+        resp = self.client.get(reverse('recording-media', args=[rec.id]), HTTP_RANGE='bytes=0-9')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp['X-Accel-Redirect'], f'/protected-media/{rec.video_file.name}')
+        self.assertEqual(resp['Content-Type'], 'video/mp4')
+        self.assertEqual(resp.content, b'')
+
     def test_bot_upload_missing_api_key(self):
         """Запрет загрузки от бота без ключа"""
         resp = self.client.post(self.bot_url, {
@@ -170,3 +240,108 @@ class RecordingTests(APITestCase):
         rec = Recording.objects.latest('id')
         self.assertEqual(rec.owner, self.owner)
         self.assertTrue(VideoJob.objects.filter(recording=rec).exists())
+        # хеш посчитан при приёме файла
+        self.assertEqual(rec.content_hash, hashlib.sha256(self.video_content).hexdigest())
+
+
+class ChunkedUploadTests(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('owner', 'owner@example.com', 'pass')
+        self.other = User.objects.create_user('other', 'other@example.com', 'pass')
+        self.group = Group.objects.create(title='TestGroup', owner=self.owner)
+        self.group.members.add(self.owner)
+        self.content = bytes(range(256)) * 40
+        self.bot_headers = {'HTTP_X_API_KEY': settings.BOT_API_KEY}
+        # диспетчер задач выполняется на месте, без брокера
+        self.addCleanup(setattr, celery_app.conf, 'task_always_eager', celery_app.conf.task_always_eager)
+        celery_app.conf.task_always_eager = True
+
+    def start(self, **headers):
+        data = {'filename': 'лекция 1.mp4', 'size': len(self.content), 'group_id': self.group.id}
+        if headers:
+            data['username'] = self.owner.username
+        resp = self.client.post(reverse('upload-create'), data, format='json', **headers)
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        upload = UploadSession.objects.get(id=resp.data['id'])
+        self.addCleanup(default_storage.delete, upload.file_name)
+        return reverse('upload-detail', args=[upload.id]), reverse('upload-finalize', args=[upload.id])
+
+    def put_chunk(self, url, offset, data, **headers):
+        return self.client.put(url, data, content_type='application/octet-stream',
+                               HTTP_UPLOAD_OFFSET=str(offset), **headers)
+
+    def test_resumable_upload_creates_recording_and_job(self):
+        self.client.force_authenticate(user=self.owner)
+        url, finalize_url = self.start()
+
+        self.assertEqual(self.put_chunk(url, 0, self.content[:4000]).data['offset'], 4000)
+        # повтор уже принятого чанка — конфликт с текущим смещением
+        resp = self.put_chunk(url, 0, self.content[:4000])
+        self.assertEqual(resp.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(resp.data['offset'], 4000)
+        self.assertEqual(self.client.post(finalize_url).status_code, status.HTTP_409_CONFLICT)
+
+        # следующий чанк попал в другой процесс: хеш дочитывается с диска при завершении
+        upload_hashers._hashers.clear()
+        self.assertEqual(self.put_chunk(url, 4000, self.content[4000:]).data['offset'], len(self.content))
+        self.assertEqual(self.client.get(url).data['offset'], len(self.content))
+
+        digest = hashlib.sha256(self.content).hexdigest()
+        resp = self.client.post(finalize_url, {'sha256': digest}, format='json')
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        rec = Recording.objects.get(id=resp.data['recording'])
+        self.assertEqual((rec.owner, rec.group, rec.content_hash), (self.owner, self.group, digest))
+        self.assertTrue(rec.video_file.name.startswith('videos/'))
+        with rec.video_file.open('rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertTrue(VideoJob.objects.filter(recording=rec).exists())
+
+        # повторное завершение не создаёт вторую запись
+        self.assertEqual(self.client.post(finalize_url).data['recording'], rec.id)
+        self.assertEqual(Recording.objects.count(), 1)
+
+    def test_abandoned_uploads_expire(self):
+        from apps.recordings.tasks import expire_upload_sessions
+        self.client.force_authenticate(user=self.owner)
+        abandoned_url, _ = self.start()
+        active_url, _ = self.start()
+        self.put_chunk(abandoned_url, 0, self.content[:1000])
+        abandoned = UploadSession.objects.get(offset=1000)
+        UploadSession.objects.filter(pk=abandoned.pk).update(updated_at=timezone.now() - timedelta(days=3))
+        self.put_chunk(active_url, 0, self.content[:1000])
+
+        self.assertEqual(expire_upload_sessions(), 1)
+        self.assertFalse(UploadSession.objects.filter(pk=abandoned.pk).exists())
+        self.assertFalse(default_storage.exists(abandoned.file_name))
+        self.assertEqual(self.client.get(active_url).data['offset'], 1000)
+
+    def test_incremental_hash_matches_content(self):
+        self.client.force_authenticate(user=self.owner)
+        url, finalize_url = self.start()
+        for offset in range(0, len(self.content), 3000):
+            self.put_chunk(url, offset, self.content[offset:offset + 3000])
+        resp = self.client.post(finalize_url, {'sha256': '0' * 64}, format='json')
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(resp.data['sha256'], hashlib.sha256(self.content).hexdigest())
+        # пользователь не может поставить свою загрузку вне очереди, только в бэклог
+        resp = self.client.post(finalize_url, {'priority': VideoJob.PRIORITY_INTERACTIVE}, format='json')
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        resp = self.client.post(finalize_url, {'priority': VideoJob.PRIORITY_BACKLOG}, format='json')
+        self.assertEqual(VideoJob.objects.get(recording_id=resp.data['recording']).priority, VideoJob.PRIORITY_BACKLOG)
+
+    def test_bot_upload_requires_key_for_every_step(self):
+        url, finalize_url = self.start(**self.bot_headers)
+        self.assertEqual(self.put_chunk(url, 0, self.content).status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(user=self.other)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.assertEqual(self.put_chunk(url, 0, self.content, **self.bot_headers).status_code, status.HTTP_200_OK)
+        resp = self.client.post(finalize_url, **self.bot_headers)
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Recording.objects.get(id=resp.data['recording']).owner, self.owner)
+
+    def test_user_must_be_group_member(self):
+        self.client.force_authenticate(user=self.other)
+        resp = self.client.post(reverse('upload-create'),
+                                {'filename': 'a.mp4', 'size': 10, 'group_id': self.group.id}, format='json')
+        self.assertEqual(resp.status_code, status.HTTP_403_FORBIDDEN)
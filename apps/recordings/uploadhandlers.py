@@ -0,0 +1,40 @@
+import hashlib
+
+from django.core.files.uploadhandler import FileUploadHandler
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """
+    Считает sha256 файла по мере поступления чанков и передаёт данные дальше
+    без изменений. Должен стоять первым в FILE_UPLOAD_HANDLERS: результат
+    кладётся в request.upload_hashes[field_name].
+    """
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        if not hasattr(self.request, 'upload_hashes'):
+            self.request.upload_hashes = {}
+        self.request.upload_hashes[self.field_name] = self.hasher.hexdigest()
+        return None
+
+
+def file_content_hash(file, chunk_size=1 << 20):
+    hasher = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks(chunk_size):
+        hasher.update(chunk)
+    file.seek(0)
+    return hasher.hexdigest()
+
+
+def uploaded_content_hash(request, field_name, file):
+    # Хеш уже посчитан при приёме загрузки; пересчёт — только если обработчик не подключён
+    digest = getattr(request, 'upload_hashes', {}).get(field_name)
+    return digest or file_content_hash(file)
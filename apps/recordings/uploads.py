@@ -0,0 +1,97 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils.text import get_valid_filename
+
+STREAM_BLOCK_SIZE = 1 << 20
+MAX_CACHED_HASHERS = 64
+
+
+class ChunkError(Exception):
+    pass
+
+
+class UploadHashers:
+    """
+    Состояние sha256 загрузок в памяти процесса: {id загрузки: (hasher, сколько байт учтено)}.
+    Состояние hashlib нельзя сохранить в БД, поэтому чанк, попавший в другой процесс,
+    просто сбрасывает кеш, а недостающий префикс дочитывается с диска при завершении.
+    """
+
+    def __init__(self, limit=MAX_CACHED_HASHERS):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._hashers = OrderedDict()
+
+    def take(self, upload_id, offset):
+        # hasher, учитывающий ровно offset байт, или новый, если offset == 0
+        with self._lock:
+            hasher, hashed = self._hashers.pop(upload_id, (None, 0))
+        if hasher is not None and hashed == offset:
+            return hasher
+        return hashlib.sha256() if offset == 0 else None
+
+    def put(self, upload_id, hasher, hashed):
+        with self._lock:
+            self._hashers[upload_id] = (hasher, hashed)
+            self._hashers.move_to_end(upload_id)
+            while len(self._hashers) > self.limit:
+                self._hashers.popitem(last=False)
+
+    def discard(self, upload_id):
+        with self._lock:
+            self._hashers.pop(upload_id, None)
+
+    def digest(self, upload_id, path):
+        with self._lock:
+            hasher, hashed = self._hashers.pop(upload_id, (None, 0))
+        if hasher is None:
+            hasher, hashed = hashlib.sha256(), 0
+        with open(path, 'rb') as f:
+            f.seek(hashed)
+            while block := f.read(STREAM_BLOCK_SIZE):
+                hasher.update(block)
+        return hasher.hexdigest()
+
+
+upload_hashers = UploadHashers()
+
+
+def create_upload_file(upload_id, filename):
+    """Пустой файл в каталоге записей: чанки пишутся сразу в него, без копирования при завершении."""
+    name = f"videos/{upload_id.hex}_{get_valid_filename(filename) or 'upload'}"
+    return default_storage.save(name, ContentFile(b''))
+
+
+def write_chunk(upload, stream, length):
+    """
+    Дописывает чанк длиной length с позиции upload.offset и обновляет sha256.
+    Если тело запроса короче заявленного, файл обрезается обратно — чанк можно повторить.
+    """
+    path = default_storage.path(upload.file_name)
+    hasher = upload_hashers.take(upload.id, upload.offset)
+    written = 0
+    with open(path, 'r+b') as f:
+        f.seek(upload.offset)
+        while written < length:
+            block = stream.read(min(STREAM_BLOCK_SIZE, length - written))
+            if not block:
+                break
+            f.write(block)
+            if hasher is not None:
+                hasher.update(block)
+            written += len(block)
+        if written != length:
+            f.truncate(upload.offset)
+            raise ChunkError(f"Получено {written} байт из {length}")
+        f.truncate(upload.offset + length)
+    if hasher is not None:
+        upload_hashers.put(upload.id, hasher, upload.offset + length)
+    return upload.offset + length
+
+
+def upload_content_hash(upload):
+    return upload_hashers.digest(upload.id, default_storage.path(upload.file_name))
@@ -1,9 +1,22 @@
 from django.urls import path
-from .views import RecordingCreateView, RecordingListView, RecordingDetailView, BotUploadAPIView
+from .views import (
+    RecordingCreateView,
+    RecordingListView,
+    RecordingDetailView,
+    RecordingMediaView,
+    BotUploadAPIView,
+    UploadSessionCreateAPIView,
+    UploadSessionAPIView,
+    UploadSessionFinalizeAPIView,
+)
 
 urlpatterns = [
     path('', RecordingListView.as_view(), name='recording-list'),
     path('upload/', RecordingCreateView.as_view(), name='recording-upload'),
     path('<int:pk>/', RecordingDetailView.as_view(), name='recording-detail'),
+    path('<int:pk>/media/', RecordingMediaView.as_view(), name='recording-media'),
     path('upload-from-bot/', BotUploadAPIView.as_view(), name='bot-upload'),
+    path('uploads/', UploadSessionCreateAPIView.as_view(), name='upload-create'),
+    path('uploads/<uuid:pk>/', UploadSessionAPIView.as_view(), name='upload-detail'),
+    path('uploads/<uuid:pk>/finalize/', UploadSessionFinalizeAPIView.as_view(), name='upload-finalize'),
 ]
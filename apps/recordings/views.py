@@ -5,15 +5,37 @@ from rest_framework.exceptions import PermissionDenied
 from django.db.models import Q
 from django.contrib.auth import get_user_model
 from django.conf import settings
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
 
-from .models import Recording
-from .serializers import RecordingDetailSerializer, BotUploadSerializer
+from .media import media_response, media_token_user_id
+from .models import Recording, UploadSession
+from .serializers import RecordingDetailSerializer, BotUploadSerializer, UploadSessionCreateSerializer
+from .uploadhandlers import uploaded_content_hash
+from .uploads import ChunkError, create_upload_file, upload_content_hash, write_chunk
 from apps.groups.models import Group
+from apps.recordingsessions.models import RecordingSession
 from apps.processing.models import VideoJob
-from apps.processing.tasks import process_video_job
+from apps.processing.signatures import dispatch_jobs
 
 User = get_user_model()
 
+def start_processing(owner, group, video_file, content_hash, session=None, priority=VideoJob.PRIORITY_UPLOAD):
+    """Создаёт запись и ставит её в очередь обработки: общий путь загрузки ботом и загрузки по частям."""
+    recording = Recording.objects.create(
+        owner=owner,
+        group=group,
+        session=session,
+        video_file=video_file,
+        content_hash=content_hash
+    )
+    job = VideoJob.objects.create(recording=recording, priority=priority)
+    # finalize вызывает это внутри транзакции: до коммита диспетчер задачу не увидит
+    transaction.on_commit(dispatch_jobs.delay)
+    return recording, job
+
+
 class RecordingCreateView(generics.CreateAPIView):
     serializer_class = RecordingDetailSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -50,6 +72,29 @@ class RecordingDetailView(generics.RetrieveAPIView):
             Q(owner=user) | Q(group__members=user)
         ).distinct()
 
+class RecordingMediaView(APIView):
+    """
+    Файл записи для плеера: по JWT или подписанной ссылке из video_file_url,
+    только владельцу и участникам группы. Поддерживает Range.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, pk):
+        recording = get_object_or_404(Recording.objects.select_related('group'), pk=pk)
+        user = request.user
+        if not user.is_authenticated:
+            user_id = media_token_user_id(request.query_params.get('token', ''), recording)
+            user = User.objects.filter(id=user_id).first() if user_id else None
+            if user is None:
+                return Response({'detail': 'Недействительная или просроченная ссылка.'},
+                                status=status.HTTP_403_FORBIDDEN)
+        if recording.owner_id != user.id and not recording.group.members.filter(id=user.id).exists():
+            return Response({'detail': 'Нет доступа к этой записи.'}, status=status.HTTP_403_FORBIDDEN)
+        if not recording.video_file:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        return media_response(request, recording.video_file)
+
+
 class BotUploadAPIView(APIView):
     authentication_classes = []
     permission_classes = []
@@ -76,16 +121,161 @@ class BotUploadAPIView(APIView):
 
         # 3) создаём запись и задачу
         video_file = serializer.validated_data['video_file']
+        session = None
+        session_id = serializer.validated_data.get('session_id')
+        if session_id is not None:
+            session = RecordingSession.objects.filter(id=session_id, group=group).first()
+            if session is None:
+                return Response({'detail': 'Сессия не найдена.'}, status=status.HTTP_404_NOT_FOUND)
 
-        recording = Recording.objects.create(
-            owner=user,
-            group=group,
-            video_file=video_file
-        )
-        job = VideoJob.objects.create(recording=recording)
-        process_video_job.delay(job.id)
+        start_processing(user, group, video_file, uploaded_content_hash(request, 'video_file', video_file), session,
+                         serializer.validated_data['priority'])
 
         return Response(
             {'detail': 'Файл успешно загружен и обработка запущена.'},
             status=status.HTTP_201_CREATED
         )
+
+
+def upload_access_error(request, upload):
+    # Загрузку продолжает тот, кто её начал: бот — по ключу, пользователь — по JWT
+    if upload.via_bot:
+        if request.headers.get('X-API-KEY') != settings.BOT_API_KEY:
+            return Response({'detail': 'Недопустимый API-ключ.'}, status=status.HTTP_403_FORBIDDEN)
+    elif request.user != upload.owner:
+        return Response({'detail': 'Нет доступа к этой загрузке.'}, status=status.HTTP_403_FORBIDDEN)
+    return None
+
+
+def upload_status(upload):
+    return {
+        'id': str(upload.id),
+        'offset': upload.offset,
+        'size': upload.size,
+        'chunk_size': settings.UPLOAD_CHUNK_SIZE_MB * 1024 * 1024,
+        'recording': upload.recording_id,
+    }
+
+
+class UploadSessionCreateAPIView(APIView):
+    """
+    Начало загрузки по частям. Бот передаёт X-API-KEY и username, пользователь — JWT.
+    Дальше: PUT чанков с заголовком Upload-Offset, GET — сколько уже принято, finalize.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request):
+        serializer = UploadSessionCreateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+
+        via_bot = 'X-API-KEY' in request.headers
+        if via_bot:
+            if request.headers['X-API-KEY'] != settings.BOT_API_KEY:
+                return Response({'detail': 'Недопустимый API-ключ.'}, status=status.HTTP_403_FORBIDDEN)
+            owner = User.objects.filter(username=data.get('username')).first()
+        elif request.user.is_authenticated:
+            owner = request.user
+        else:
+            return Response({'detail': 'Требуется авторизация.'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        group = Group.objects.filter(id=data['group_id']).first()
+        if owner is None or group is None:
+            return Response({'detail': 'Пользователь или группа не найдены.'}, status=status.HTTP_404_NOT_FOUND)
+        if not via_bot and not group.members.filter(id=owner.id).exists():
+            return Response({'detail': 'Вы не состоите в этой группе.'}, status=status.HTTP_403_FORBIDDEN)
+
+        session = None
+        if data.get('session_id') is not None:
+            session = RecordingSession.objects.filter(id=data['session_id'], group=group).first()
+            if session is None:
+                return Response({'detail': 'Сессия не найдена.'}, status=status.HTTP_404_NOT_FOUND)
+
+        upload = UploadSession(owner=owner, group=group, session=session, via_bot=via_bot,
+                               filename=data['filename'], size=data['size'])
+        upload.file_name = create_upload_file(upload.id, upload.filename)
+        upload.save()
+        return Response(upload_status(upload), status=status.HTTP_201_CREATED)
+
+
+class UploadSessionAPIView(APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, pk):
+        upload = get_object_or_404(UploadSession, pk=pk)
+        return upload_access_error(request, upload) or Response(upload_status(upload))
+
+    def put(self, request, pk):
+        upload = get_object_or_404(UploadSession, pk=pk)
+        error = upload_access_error(request, upload)
+        if error:
+            return error
+        if upload.recording_id:
+            return Response({'detail': 'Загрузка уже завершена.'}, status=status.HTTP_409_CONFLICT)
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.headers['Content-Length'])
+        except (KeyError, ValueError):
+            return Response({'detail': 'Нужны заголовки Upload-Offset и Content-Length.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        # Чанки принимаются строго по порядку: после обрыва клиент спрашивает offset и продолжает с него
+        if offset != upload.offset:
+            return Response({'detail': 'Неверное смещение чанка.', 'offset': upload.offset},
+                            status=status.HTTP_409_CONFLICT)
+        if length <= 0 or offset + length > upload.size:
+            return Response({'detail': 'Чанк выходит за объявленный размер файла.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if length > settings.UPLOAD_CHUNK_MAX_MB * 1024 * 1024:
+            return Response({'detail': 'Слишком большой чанк.'}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        try:
+            new_offset = write_chunk(upload, request.stream, length)
+        except ChunkError as e:
+            return Response({'detail': str(e), 'offset': upload.offset}, status=status.HTTP_400_BAD_REQUEST)
+        # Параллельный чанк с тем же смещением уже продвинул загрузку — этот считается конфликтом
+        # updated_at вручную: update() не трогает auto_now, а по нему истекают брошенные загрузки
+        if not UploadSession.objects.filter(pk=upload.pk, offset=offset).update(
+                offset=new_offset, updated_at=timezone.now()):
+            upload.refresh_from_db()
+            return Response({'detail': 'Неверное смещение чанка.', 'offset': upload.offset},
+                            status=status.HTTP_409_CONFLICT)
+        upload.offset = new_offset
+        return Response(upload_status(upload))
+
+
+class UploadSessionFinalizeAPIView(APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request, pk):
+        with transaction.atomic():
+            upload = get_object_or_404(UploadSession.objects.select_for_update(), pk=pk)
+            error = upload_access_error(request, upload)
+            if error:
+                return error
+            if upload.recording_id:
+                return Response(upload_status(upload))
+            if upload.offset != upload.size:
+                return Response({'detail': 'Файл загружен не полностью.', 'offset': upload.offset},
+                                status=status.HTTP_409_CONFLICT)
+
+            content_hash = upload_content_hash(upload)
+            expected = request.data.get('sha256')
+            if expected and expected.lower() != content_hash:
+                return Response({'detail': 'Контрольная сумма не совпадает.', 'sha256': content_hash},
+                                status=status.HTTP_400_BAD_REQUEST)
+            try:
+                priority = int(request.data.get('priority', VideoJob.PRIORITY_UPLOAD))
+            except (TypeError, ValueError):
+                priority = None
+            if priority not in dict(VideoJob.PRIORITY_CHOICES):
+                return Response({'detail': 'Неизвестный приоритет.'}, status=status.HTTP_400_BAD_REQUEST)
+            # Любой приоритет — только у бота; пользователь может лишь отправить загрузку в бэклог
+            if not upload.via_bot and 'priority' in request.data and priority != VideoJob.PRIORITY_BACKLOG:
+                return Response({'detail': 'Можно указать только priority=2 (бэклог).'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            recording, _job = start_processing(upload.owner, upload.group, upload.file_name, content_hash,
+                                               upload.session, priority)
+            upload.recording = recording
+            upload.save(update_fields=['recording', 'updated_at'])
+        return Response(upload_status(upload), status=status.HTTP_201_CREATED)
@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-17 21:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recordingsessions', '0002_recordingsession_end_time_recordingsession_link_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField()),
+                ('offset_seconds', models.FloatField(default=0)),
+                ('media', models.FileField(blank=True, upload_to='segments/')),
+                ('status', models.CharField(choices=[('PENDING', 'Ожидает'), ('SUCCESS', 'Распознан'), ('FAILED', 'Ошибка')], default='PENDING', max_length=10)),
+                ('text', models.TextField(blank=True)),
+                ('timestamps', models.JSONField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('transcribed_at', models.DateTimeField(blank=True, null=True)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='segments', to='recordingsessions.recordingsession')),
+            ],
+            options={
+                'ordering': ['index'],
+                'unique_together': {('session', 'index')},
+            },
+        ),
+    ]
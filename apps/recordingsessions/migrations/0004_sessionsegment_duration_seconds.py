@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 22:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recordingsessions', '0003_sessionsegment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sessionsegment',
+            name='duration_seconds',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
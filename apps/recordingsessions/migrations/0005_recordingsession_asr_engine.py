@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 22:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recordingsessions', '0004_sessionsegment_duration_seconds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recordingsession',
+            name='asr_engine',
+            field=models.CharField(blank=True, choices=[('whisper', 'Whisper (transformers)'), ('nemo_ctc', 'NeMo Conformer-CTC')], max_length=20),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.conf import settings
 from apps.groups.models import Group
+from apps.processing.models import ASR_ENGINE_CHOICES
+from apps.processing.timestamps import normalize_segments
 
 
 class RecordingSession(models.Model):
@@ -31,9 +33,81 @@ class RecordingSession(models.Model):
         choices=STATUS_CHOICES,
         default='active'
     )
+    # Движок, зафиксированный при старте: им распознаются все фрагменты, хвост и итоговая задача,
+    # даже если у группы его поменяют посреди записи. Пусто — сессия старше поля, берётся движок группы
+    asr_engine = models.CharField(max_length=20, choices=ASR_ENGINE_CHOICES, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     end_time = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f"Сессия {self.id} ({self.group.title}) — {self.status}"
+
+    def live_transcript(self):
+        """Склеивает уже распознанные фрагменты по порядку: (text, таймкоды в секундах, pending_count)."""
+        texts = []
+        timestamps = []
+        pending = 0
+        for segment in self.segments.all():
+            if segment.status != 'SUCCESS':
+                pending += 1
+                continue
+            if segment.text:
+                texts.append(segment.text)
+            timestamps.extend(normalize_segments(segment.timestamps))
+        return " ".join(texts), timestamps, pending
+
+    def segments_contiguous(self):
+        # Фрагменты идут без пропусков, только если индексы подряд с нуля; покрывают ли они
+        # запись до конца, видно лишь по covered_seconds после распознавания последнего
+        indexes = list(self.segments.values_list('index', flat=True))
+        return bool(indexes) and indexes == list(range(len(indexes)))
+
+    def covered_seconds(self):
+        """До какой секунды записи доходят фрагменты (по последнему из них); None, если фрагментов нет."""
+        last = self.segments.order_by('-index').first()
+        if last is None:
+            return None
+        if last.duration_seconds is not None:
+            return last.offset_seconds + last.duration_seconds
+        # фрагменты, распознанные до появления duration_seconds: конец последнего слова
+        ends = [segment['end'] or segment['start'] for segment in normalize_segments(last.timestamps)]
+        return max(ends, default=last.offset_seconds)
+
+
+class SessionSegment(models.Model):
+    """
+    Фрагмент медиа активной сессии, присланный ботом во время записи. Каждый
+    фрагмент декодируется независимо и распознаётся сразу после загрузки.
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Ожидает'),
+        ('SUCCESS', 'Распознан'),
+        ('FAILED', 'Ошибка'),
+    ]
+
+    session = models.ForeignKey(
+        RecordingSession,
+        on_delete=models.CASCADE,
+        related_name='segments'
+    )
+    index = models.PositiveIntegerField()
+    # смещение начала фрагмента от начала записи, секунды
+    offset_seconds = models.FloatField(default=0)
+    # длительность медиа фрагмента, секунды; известна после распознавания
+    duration_seconds = models.FloatField(null=True, blank=True)
+    media = models.FileField(upload_to='segments/', blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    text = models.TextField(blank=True)
+    # [{'start', 'end', 'text'}] в секундах от начала записи (у старых фрагментов — MM:SS)
+    timestamps = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    transcribed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['index']
+        unique_together = [('session', 'index')]
+
+    def __str__(self):
+        return f"Фрагмент {self.index} сессии {self.session_id}"
@@ -1,8 +1,20 @@
 from rest_framework import serializers
-from .models import RecordingSession
+from .models import RecordingSession, SessionSegment
 
 class SessionSerializer(serializers.ModelSerializer):
     class Meta:
         model = RecordingSession
         fields = '__all__'
         read_only_fields = ['owner', 'created_at', 'updated_at', 'status', 'end_time']
+
+
+class SegmentUploadSerializer(serializers.Serializer):
+    index = serializers.IntegerField(min_value=0)
+    offset_seconds = serializers.FloatField(min_value=0)
+    media = serializers.FileField()
+
+
+class SessionSegmentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SessionSegment
+        fields = ['index', 'offset_seconds', 'status', 'transcribed_at']
@@ -4,10 +4,12 @@ from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
 from unittest.mock import patch
 from rest_framework.test import APIClient
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
 
 from django.contrib.auth import get_user_model
 from apps.groups.models import Group
-from apps.recordingsessions.models import RecordingSession
+from apps.recordingsessions.models import RecordingSession, SessionSegment
 
 User = get_user_model()
 
@@ -155,3 +157,62 @@ class RecordingSessionTests(APITestCase):
         self.assertEqual(sess.status, 'stopped')
         self.assertIsNotNone(sess.end_time)
         mock_delay.assert_called_once_with(sess.id)
+
+    #
+    # Живое распознавание: фрагменты от бота и текущий транскрипт
+    #
+
+    def upload_segment(self, session, index, api_key=None):
+        return self.client.post(
+            reverse('session-segment-upload', kwargs={'session_id': session.id}),
+            {'index': index, 'offset_seconds': index * 60,
+             'media': SimpleUploadedFile(f'part{index}.webm', b'\x00' * 32)},
+            format='multipart',
+            HTTP_X_API_KEY=api_key or settings.BOT_API_KEY,
+        )
+
+    @patch('apps.recordingsessions.views.transcribe_session_segment.delay')
+    def test_segment_upload_queues_transcription(self, mock_delay):
+        sess = RecordingSession.objects.create(owner=self.owner, group=self.group)
+        resp = self.upload_segment(sess, 0)
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+
+        segment = SessionSegment.objects.get(session=sess, index=0)
+        self.assertEqual(segment.status, 'PENDING')
+        self.assertEqual(segment.offset_seconds, 0)
+        mock_delay.assert_called_once_with(segment.id)
+
+    @patch('apps.recordingsessions.views.transcribe_session_segment.delay')
+    def test_segment_upload_invalid_key(self, mock_delay):
+        sess = RecordingSession.objects.create(owner=self.owner, group=self.group)
+        resp = self.upload_segment(sess, 0, api_key='wrong')
+        self.assertEqual(resp.status_code, status.HTTP_403_FORBIDDEN)
+        mock_delay.assert_not_called()
+
+    @patch('apps.recordingsessions.views.transcribe_session_segment.delay')
+    def test_segment_retry_after_success_is_ignored(self, mock_delay):
+        sess = RecordingSession.objects.create(owner=self.owner, group=self.group)
+        SessionSegment.objects.create(session=sess, index=0, status='SUCCESS', text='готово')
+        resp = self.upload_segment(sess, 0)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(SessionSegment.objects.get(session=sess, index=0).text, 'готово')
+        mock_delay.assert_not_called()
+
+    def test_live_transcript(self):
+        sess = RecordingSession.objects.create(owner=self.owner, group=self.group)
+        SessionSegment.objects.create(session=sess, index=1, status='SUCCESS', text='вторая',
+                                      timestamps=[{'start': '01:00', 'end': '01:01', 'text': 'вторая'}])
+        SessionSegment.objects.create(session=sess, index=0, status='SUCCESS', text='первая',
+                                      timestamps=[{'start': '00:00', 'end': '00:01', 'text': 'первая'}])
+        SessionSegment.objects.create(session=sess, index=2)
+        url = reverse('session-transcript', kwargs={'session_id': sess.id})
+
+        self.auth(self.token_other)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.auth(self.token_member)
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data['text'], 'первая вторая')
+        self.assertEqual(resp.data['timestamps'][1]['start'], '01:00')
+        self.assertEqual(resp.data['pending_segments'], 1)
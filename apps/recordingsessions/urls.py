@@ -1,6 +1,12 @@
 from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import SessionViewSet, StartRecordingSessionAPIView, StopRecordingSessionAPIView
+from .views import (
+    SessionViewSet,
+    StartRecordingSessionAPIView,
+    StopRecordingSessionAPIView,
+    BotSessionSegmentAPIView,
+    SessionTranscriptAPIView,
+)
 
 router = DefaultRouter()
 router.register(r'', SessionViewSet, basename='session')
@@ -9,6 +15,8 @@ urlpatterns = [
     # сначала «стартер» сессии
     path('start/', StartRecordingSessionAPIView.as_view(), name='start-recording-session'),
     path('<int:session_id>/stop/', StopRecordingSessionAPIView.as_view(), name='stop-session'),
+    path('<int:session_id>/segments/', BotSessionSegmentAPIView.as_view(), name='session-segment-upload'),
+    path('<int:session_id>/transcript/', SessionTranscriptAPIView.as_view(), name='session-transcript'),
     # а затем уже REST-роуты
     *router.urls,
 ]
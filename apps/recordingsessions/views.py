@@ -5,10 +5,13 @@ from rest_framework.generics import GenericAPIView
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django.db.models import Q
+from django.conf import settings
 
-from .models import RecordingSession
-from .serializers import SessionSerializer
+from .models import RecordingSession, SessionSegment
+from .serializers import SessionSerializer, SegmentUploadSerializer, SessionSegmentSerializer
 from apps.groups.models import Group
+from apps.processing.signatures import transcribe_session_segment
+from apps.processing.timestamps import format_segments
 from bot.tasks import start_conference_bot, stop_conference_bot
 
 
@@ -51,6 +54,7 @@ class StartRecordingSessionAPIView(APIView):
             owner=request.user,
             group=group,
             link=link,
+            asr_engine=group.asr_engine or settings.ASR_ENGINE,
         )
 
         start_conference_bot.delay(session.id, link, "Кебабот", request.user.id, group.id)
@@ -81,3 +85,58 @@ class StopRecordingSessionAPIView(APIView):
         session.save()
 
         return Response({'detail': 'Сессия остановлена.'}, status=status.HTTP_200_OK)
+
+
+class BotSessionSegmentAPIView(APIView):
+    """Бот присылает фрагменты записи по ходу сессии; каждый сразу уходит на распознавание."""
+    authentication_classes = []
+    permission_classes = []
+
+    def post(self, request, session_id):
+        api_key = request.headers.get('X-API-KEY')
+        if api_key != settings.BOT_API_KEY:
+            return Response({'detail': 'Недопустимый API-ключ.'}, status=status.HTTP_403_FORBIDDEN)
+
+        session = get_object_or_404(RecordingSession, id=session_id)
+
+        serializer = SegmentUploadSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+
+        # Повторная отправка того же фрагмента после ретрая бота не создаёт дубль
+        segment = SessionSegment.objects.filter(session=session, index=data['index']).first()
+        if segment is not None and segment.status == 'SUCCESS':
+            return Response({'detail': 'Фрагмент уже распознан.'}, status=status.HTTP_200_OK)
+        if segment is None:
+            segment = SessionSegment(session=session, index=data['index'])
+        elif segment.media:
+            segment.media.delete(save=False)
+        segment.offset_seconds = data['offset_seconds']
+        segment.media = data['media']
+        segment.status = 'PENDING'
+        segment.save()
+
+        transcribe_session_segment.delay(segment.id)
+        return Response({'detail': 'Фрагмент принят.', 'segment_id': segment.id}, status=status.HTTP_201_CREATED)
+
+
+class SessionTranscriptAPIView(APIView):
+    """Текущий транскрипт активной сессии: уже распознанные фрагменты по порядку."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, session_id):
+        user = request.user
+        session = get_object_or_404(RecordingSession, id=session_id)
+
+        if not (session.owner == user or user in session.group.members.all()):
+            return Response({'detail': 'У вас нет доступа к этой сессии.'}, status=status.HTTP_403_FORBIDDEN)
+
+        text, timestamps, pending = session.live_transcript()
+        return Response({
+            'status': session.status,
+            'text': text,
+            'timestamps': format_segments(timestamps),
+            'pending_segments': pending,
+            'segments': SessionSegmentSerializer(session.segments.all(), many=True).data,
+        })
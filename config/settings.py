@@ -30,6 +30,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # external libraries
     'rest_framework',
@@ -160,6 +161,24 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Mediafiles
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Видео записей отдаются через /api/recordings/<id>/media/ с проверкой доступа. Если задан префикс,
+# Django отвечает только заголовком X-Accel-Redirect, а байты (и Range) отдаёт nginx из internal-локации
+MEDIA_ACCEL_REDIRECT_PREFIX = config('MEDIA_ACCEL_REDIRECT_PREFIX', default='')
+# Сколько секунд действительна подписанная ссылка на видео из video_file_url
+MEDIA_TOKEN_MAX_AGE = config('MEDIA_TOKEN_MAX_AGE', default=6 * 3600, cast=int)
+
+# Загрузка по частям (/api/recordings/uploads/): рекомендуемый и максимальный размер чанка, МБ
+UPLOAD_CHUNK_SIZE_MB = config('UPLOAD_CHUNK_SIZE_MB', default=16, cast=int)
+UPLOAD_CHUNK_MAX_MB = config('UPLOAD_CHUNK_MAX_MB', default=64, cast=int)
+# Незавершённая загрузка без новых чанков столько секунд удаляется вместе с файлом (expire_upload_sessions)
+UPLOAD_SESSION_TTL_SECONDS = config('UPLOAD_SESSION_TTL_SECONDS', default=2 * 24 * 3600, cast=int)
+
+# sha256 загружаемых файлов считается на лету, до сохранения на диск
+FILE_UPLOAD_HANDLERS = [
+    'apps.recordings.uploadhandlers.HashingUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
 
 CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://redis:6379/0')
 CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND', default='redis://localhost:6379/0')
@@ -167,3 +186,97 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+# Стадии обработки идут в отдельные очереди, чтобы пулы воркеров масштабировались независимо:
+# extract — ffmpeg и VAD, asr — Whisper, llm — запросы к LLM
+CELERY_TASK_ROUTES = {
+    'apps.processing.tasks.extract_audio': {'queue': 'extract'},
+    'apps.processing.tasks.transcribe_audio': {'queue': 'asr'},
+    'apps.processing.tasks.transcribe_session_segment': {'queue': 'asr'},
+    'apps.processing.tasks.assemble_session_transcript': {'queue': 'asr'},
+    'apps.processing.tasks.generate_summary_and_notes': {'queue': 'llm'},
+}
+# Сколько задач обрабатывается одновременно; остальные ждут диспетчера (приоритет, затем
+# по кругу между группами). 0 — без ограничения
+PROCESSING_MAX_ACTIVE_JOBS = config('PROCESSING_MAX_ACTIVE_JOBS', default=4, cast=int)
+# Запущенная задача без heartbeat_at (смена стадии, прогресс) за это время считается потерянной (воркер убит или
+# перезапущен): диспетчер помечает её FAILED и освобождает слот. 0 — не снимать
+PROCESSING_STALE_JOB_SECONDS = config('PROCESSING_STALE_JOB_SECONDS', default=6 * 3600, cast=int)
+# celery -A config beat: диспетчер запускается и по расписанию, чтобы снимать потерянные задачи,
+# даже когда новых нет
+CELERY_BEAT_SCHEDULE = {
+    'dispatch-jobs': {'task': 'apps.processing.tasks.dispatch_jobs', 'schedule': 300.0},
+    'cleanup-scratch': {'task': 'apps.processing.tasks.cleanup_scratch', 'schedule': 3600.0},
+    'expire-upload-sessions': {'task': 'apps.recordings.tasks.expire_upload_sessions', 'schedule': 3600.0},
+}
+# Промежуточное аудио между стадиями extract и asr (должно быть общим для их воркеров).
+# Не внутри MEDIA_ROOT: в DEBUG тот раздаётся без авторизации
+PROCESSING_SCRATCH_ROOT = config('PROCESSING_SCRATCH_ROOT', default=str(BASE_DIR / 'scratch'))
+# Аудио упавших задач хранится для resume столько секунд, затем удаляется cleanup_scratch
+PROCESSING_SCRATCH_TTL_SECONDS = config('PROCESSING_SCRATCH_TTL_SECONDS', default=3 * 24 * 3600, cast=int)
+
+# ASR: модель держится в памяти процесса воркера, см. apps.processing.asr.
+# Движок по умолчанию: whisper или nemo_ctc (лёгкий, для CPU); задача и группа могут его переопределить
+ASR_ENGINE = config('ASR_ENGINE', default='whisper')
+ASR_NEMO_MODEL_ID = config('ASR_NEMO_MODEL_ID', default='nvidia/stt_ru_conformer_ctc_large')
+ASR_MODEL_ID = config('ASR_MODEL_ID', default='openai/whisper-large-v3-turbo')
+ASR_DEVICE = config('ASR_DEVICE', default='auto')
+# Точность: auto, fp32, bf16 (если процессор поддерживает), fp16 (GPU), int8 (динамическая квантизация, CPU)
+ASR_DTYPE = config('ASR_DTYPE', default='auto')
+ASR_PRELOAD = config('ASR_PRELOAD', default=True, cast=bool)
+# Длина окна (с), которым аудио из пайпа ffmpeg подаётся в пайплайн
+ASR_WINDOW_SECONDS = config('ASR_WINDOW_SECONDS', default=300, cast=int)
+# Размер батча чанков: число или 'auto' (по ядрам и свободной памяти)
+ASR_BATCH_SIZE = config('ASR_BATCH_SIZE', default='auto')
+ASR_MAX_BATCH_SIZE = config('ASR_MAX_BATCH_SIZE', default=16, cast=int)
+ASR_BATCH_ITEM_MB = config('ASR_BATCH_ITEM_MB', default=512, cast=int)
+# VAD перед Whisper: паузы длиннее ASR_VAD_MIN_SILENCE_S не транскрибируются
+ASR_VAD_ENABLED = config('ASR_VAD_ENABLED', default=True, cast=bool)
+ASR_VAD_MIN_SILENCE_S = config('ASR_VAD_MIN_SILENCE_S', default=2.0, cast=float)
+# Параллельная транскрипция одной записи: >1 включает пул процессов с моделью в каждом
+ASR_PARALLEL_WORKERS = config('ASR_PARALLEL_WORKERS', default=1, cast=int)
+ASR_PARALLEL_THREADS = config('ASR_PARALLEL_THREADS', default='auto')
+ASR_PARALLEL_SEGMENT_SECONDS = config('ASR_PARALLEL_SEGMENT_SECONDS', default=600, cast=int)
+
+# LLM: транскрипт длиннее LLM_CHUNK_TOKENS обрабатывается map-reduce по фрагментам
+LLM_CHUNK_TOKENS = config('LLM_CHUNK_TOKENS', default=6000, cast=int)
+LLM_MAP_PARALLELISM = config('LLM_MAP_PARALLELISM', default=4, cast=int)
+LLM_CHARS_PER_TOKEN = config('LLM_CHARS_PER_TOKEN', default=3.0, cast=float)
+
+# Кеш ответов LLM в БД; LLM_CACHE_ENABLED=False — всегда ходить в API
+LLM_CACHE_ENABLED = config('LLM_CACHE_ENABLED', default=True, cast=bool)
+LLM_CACHE_TTL_SECONDS = config('LLM_CACHE_TTL_SECONDS', default=30 * 24 * 3600, cast=int)
+LLM_CACHE_MAX_MB = config('LLM_CACHE_MAX_MB', default=256, cast=int)
+
+# HTTP-клиент LLM: таймауты, повторы на 429/5xx и общий для воркеров лимит запросов
+LLM_HTTP_POOL_SIZE = config('LLM_HTTP_POOL_SIZE', default=8, cast=int)
+LLM_CONNECT_TIMEOUT = config('LLM_CONNECT_TIMEOUT', default=10, cast=float)
+LLM_READ_TIMEOUT = config('LLM_READ_TIMEOUT', default=300, cast=float)
+LLM_MAX_RETRIES = config('LLM_MAX_RETRIES', default=4, cast=int)
+LLM_RETRY_BACKOFF = config('LLM_RETRY_BACKOFF', default=1.0, cast=float)
+LLM_RETRY_BACKOFF_MAX = config('LLM_RETRY_BACKOFF_MAX', default=60.0, cast=float)
+LLM_RATE_PER_SECOND = config('LLM_RATE_PER_SECOND', default=2.0, cast=float)
+LLM_RATE_BURST = config('LLM_RATE_BURST', default=4, cast=int)
+LLM_RATE_LIMIT_REDIS_URL = config('LLM_RATE_LIMIT_REDIS_URL', default=CELERY_BROKER_URL)
+
+# Бэкенд LLM: openrouter или openai (любой OpenAI-совместимый сервер, например локальный стенд llm_standin)
+LLM_BACKEND = config('LLM_BACKEND', default='openrouter')
+LLM_API_URL = config('LLM_API_URL', default='https://openrouter.ai/api/v1/chat/completions')
+LLM_MODEL_ID = config('LLM_MODEL_ID', default='meta-llama/llama-4-scout:free')
+LLM_API_KEY = config('LLM_API_KEY', default=config('OPENROUTER_API_KEY', default=''))
+
+# События задач для /api/processing/events/ (SSE): redis — из воркеров во все веб-процессы,
+# memory — только внутри процесса (тесты, eager-задачи)
+PROCESSING_EVENTS_BACKEND = config('PROCESSING_EVENTS_BACKEND', default='redis')
+PROCESSING_EVENTS_REDIS_URL = config('PROCESSING_EVENTS_REDIS_URL', default=CELERY_BROKER_URL)
+PROCESSING_EVENTS_HEARTBEAT = config('PROCESSING_EVENTS_HEARTBEAT', default=15, cast=float)
+PROCESSING_EVENTS_PROGRESS_INTERVAL = config('PROCESSING_EVENTS_PROGRESS_INTERVAL', default=2.0, cast=float)
+
+# Версия конвейера: результаты переиспользуются только между задачами с одинаковой версией.
+# Увеличивайте при изменении обработки, меняющем результат
+PROCESSING_PIPELINE_VERSION = config('PROCESSING_PIPELINE_VERSION', default='1')
+
+# Окно транскрипта для плеера (?from=&to=): сколько слов отдаётся за один запрос
+TRANSCRIPT_RANGE_MAX_WORDS = config('TRANSCRIPT_RANGE_MAX_WORDS', default=500, cast=int)
+
+# Полнотекстовый поиск: транскрипт индексируется отрывками примерно такой длины, секунды
+SEARCH_PASSAGE_SECONDS = config('SEARCH_PASSAGE_SECONDS', default=60, cast=int)
@@ -1,8 +1,9 @@
 try:
     from django.contrib import admin
-    from django.urls import path, include
+    import re
+    from django.urls import path, include, re_path
     from django.conf import settings
-    from django.conf.urls.static import static
+    from django.views.static import serve
 except Exception as e:
     import traceback
     print("Ошибка при импорте в config/urls.py:")
@@ -15,4 +16,9 @@ urlpatterns = [
 ]
 
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    # Записи (videos/) и фрагменты сессий (segments/) отдаются только через
+    # /api/recordings/<id>/media/ с проверкой доступа, поэтому здесь они исключены
+    urlpatterns += [
+        re_path(rf'^{re.escape(settings.MEDIA_URL.lstrip("/"))}(?!(?:videos|segments)/)(?P<path>.*)$', serve,
+                {'document_root': settings.MEDIA_ROOT}),
+    ]